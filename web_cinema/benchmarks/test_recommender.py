@@ -0,0 +1,84 @@
+"""
+Замеры рекомендательных функций для pytest-benchmark.
+
+    pytest benchmarks --ds=web_cinema_config.settings \
+        --benchmark-json=benchmark.json
+
+Размер каталога задает переменная окружения BENCHMARK_SCALE
+(1k, 10k или 100k, по умолчанию 1k). Число запросов и пик памяти
+попадают в extra_info каждого замера.
+"""
+import os
+from itertools import cycle
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from django.contrib.auth import get_user_model  # noqa: E402
+
+from movies.benchmark import (  # noqa: E402
+    BENCHMARK_SCALES,
+    generate_catalog,
+    measure,
+    run_case,
+    sample_cases,
+)
+from movies.models import Genre, Movie  # noqa: E402
+from movies.similarity import rebuild_similarities  # noqa: E402
+from movies.utils import (  # noqa: E402
+    calculate_item_similarity,
+    get_recommendations,
+    get_similar_movies,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(scope="module")
+def catalog(django_db_setup, django_db_blocker):
+    sizes = BENCHMARK_SCALES[os.getenv("BENCHMARK_SCALE", "1k")]
+    with django_db_blocker.unblock():
+        generate_catalog(sizes["movies"], sizes["users"])
+        rebuild_similarities()
+        yield sample_cases()
+        Movie.objects.all().delete()
+        Genre.objects.all().delete()
+        get_user_model().objects.all().delete()
+
+
+def run_benchmark(benchmark, func, cases):
+    benchmark.extra_info.update(
+        {
+            key: value
+            for key, value in measure(func, cases, len(cases)).items()
+            if key in ("queries", "peak_memory_kb")
+        }
+    )
+    cases = cycle(cases)
+    benchmark(lambda: run_case(func, next(cases)))
+
+
+def test_get_recommendations(benchmark, catalog):
+    users, _ = catalog
+    run_benchmark(
+        benchmark, get_recommendations, [(user, 10) for user in users]
+    )
+
+
+def test_get_similar_movies(benchmark, catalog):
+    users, popular = catalog
+    run_benchmark(
+        benchmark,
+        get_similar_movies,
+        [(movie, user, 5) for movie, user in zip(popular, users)],
+    )
+
+
+def test_calculate_item_similarity(benchmark, catalog):
+    _, popular = catalog
+    run_benchmark(
+        benchmark,
+        calculate_item_similarity,
+        list(zip(popular, popular[1:])),
+    )
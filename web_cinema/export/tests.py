@@ -44,3 +44,28 @@ class ExportUtilsTest(TestCase):
             self.assertIsInstance(pdf_content, bytes)
         except Exception as e:
             self.fail(f"PDF export failed: {e}")
+
+
+class ImportMoviesTest(TestCase):
+    def test_duplicates_skipped_by_unique_constraint(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        from export.utils import import_movies_from_csv
+
+        Movie.objects.create(title="Старый", year=1990)
+        rows = [
+            "title;description;year;director;country;image_url;genres",
+            "Новый;;2020;;США;;Драма",
+            "Новый;;2020;;США;;Драма",
+            "Старый;;1990;;;;",
+        ]
+        csv_file = SimpleUploadedFile(
+            "movies.csv", "\n".join(rows).encode("utf-8")
+        )
+
+        results = import_movies_from_csv(csv_file)
+
+        self.assertEqual(results["imported_count"], 1)
+        self.assertEqual(results["skipped_count"], 2)
+        self.assertEqual(results["errors"], [])
+        self.assertEqual(Movie.objects.filter(title="Новый").count(), 1)
@@ -7,7 +7,7 @@ from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
 from reportlab.lib.units import inch
 from reportlab.pdfbase import pdfmetrics
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.platypus import (
     Paragraph,
@@ -123,8 +123,7 @@ def export_recommendations_to_pdf(
         table_data = [["Название", "Год", "Режиссер", "Жанры", "Лайки"]]
 
         for movie in recommendations:
-            # Получаем количество лайков
-            like_count = movie.liked_by.count()
+            like_count = movie.like_count
             genres = ", ".join(
                 [genre.name for genre in movie.genres.all()[:2]]
             )
@@ -263,21 +262,22 @@ def import_movies_from_csv(csv_file):
                     image_url = row[5].strip()
                     genre_names = [g.strip() for g in row[6].split(',') if g.strip()]
 
-                    # Проверяем, существует ли фильм с таким названием и годом
-                    if Movie.objects.filter(title=title, year=year).exists():
+                    # Создаем фильм; фильм с таким названием и годом уже
+                    # есть - отклоняет уникальный индекс, без лишнего запроса
+                    try:
+                        with transaction.atomic():
+                            movie = Movie.objects.create(
+                                title=title,
+                                description=description,
+                                year=year,
+                                director=director,
+                                country=country,
+                                image_url=image_url
+                            )
+                    except IntegrityError:
                         results['skipped_count'] += 1
                         continue
 
-                    # Создаем фильм
-                    movie = Movie.objects.create(
-                        title=title,
-                        description=description,
-                        year=year,
-                        director=director,
-                        country=country,
-                        image_url=image_url
-                    )
-
                     # Обрабатываем жанры
                     for genre_name in genre_names:
                         genre, created = Genre.objects.get_or_create(
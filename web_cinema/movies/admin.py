@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Genre, Movie, UserPreferences, Review
+from .models import Genre, Movie, Rating, UserPreferences, Review
 
 
 @admin.register(Genre)
@@ -18,6 +18,19 @@ class MovieAdmin(admin.ModelAdmin):
     filter_horizontal = ["genres"]
     readonly_fields = ["image_preview_large"]
 
+    def save_model(self, request, obj, form, change):
+        # Счетчики меняются через F() в обход формы: полное сохранение
+        # записало бы поверх них устаревшие значения из obj
+        if change:
+            fields = {field.name for field in obj._meta.concrete_fields}
+            obj.save(
+                update_fields=[
+                    name for name in form.changed_data if name in fields
+                ]
+            )
+        else:
+            obj.save()
+
     fieldsets = (
         (
             "Основная информация",
@@ -36,12 +49,14 @@ class MovieAdmin(admin.ModelAdmin):
     )
 
     def get_like_count(self, obj):
-        return obj.liked_by.count()
+        return obj.like_count
     get_like_count.short_description = "Лайков"
+    get_like_count.admin_order_field = "like_count"
 
     def get_dislike_count(self, obj):
-        return obj.disliked_by.count()
+        return obj.dislike_count
     get_dislike_count.short_description = "Дизлайков"
+    get_dislike_count.admin_order_field = "dislike_count"
 
     def image_preview(self, obj):
         if obj.image_url:
@@ -64,7 +79,7 @@ class MovieAdmin(admin.ModelAdmin):
 @admin.register(UserPreferences)
 class UserPreferencesAdmin(admin.ModelAdmin):
     list_display = ["user", "get_favorite_genres", "get_liked_count", "get_disliked_count"]
-    filter_horizontal = ["favorite_genres", "liked_movies", "disliked_movies"]
+    filter_horizontal = ["favorite_genres"]
 
     def get_favorite_genres(self, obj):
         return ", ".join([genre.name for genre in obj.favorite_genres.all()])
@@ -88,4 +103,12 @@ class ReviewAdmin(admin.ModelAdmin):
 
     def short_text(self, obj):
         return obj.text[:50] + "..." if len(obj.text) > 50 else obj.text
-    short_text.short_description = "Текст отзыва"
\ No newline at end of file
+    short_text.short_description = "Текст отзыва"
+
+
+@admin.register(Rating)
+class RatingAdmin(admin.ModelAdmin):
+    list_display = ("user", "movie", "value", "rated_at")
+    list_filter = ("value", "rated_at")
+    search_fields = ("user__phone", "movie__title")
+    raw_id_fields = ("user", "movie")
@@ -5,3 +5,7 @@ class MoviesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "movies"
     verbose_name = "Фильмы"
+
+    def ready(self):
+        import movies.signals  # noqa: F401
+        import movies.sqlite  # noqa: F401
@@ -0,0 +1,178 @@
+"""
+Подсказки для строки поиска без обращений к базе.
+
+Индекс - отсортированный список нормализованных ключей: название
+фильма целиком и с каждого следующего слова, режиссер, название
+жанра. Поиск префикса - bisect и короткий проход вперед.
+Индекс строится лениво в каждом процессе и помнит версию CONTENT, при
+которой собран (см. movies.conditional): она общая для воркеров через
+кэш COUNTERS и поднимается при изменении фильмов и жанров, так что
+после правки каталога в любом процессе индекс пересобирается везде.
+"""
+import re
+import threading
+from bisect import bisect_left
+
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from movies.conditional import CONTENT, get_versions
+from movies.models import Genre, Movie
+
+
+AUTOCOMPLETE_LIMIT = 8
+# Сколько совпадений префикса просматривается перед сортировкой
+AUTOCOMPLETE_SCAN = 200
+MIN_PREFIX_LENGTH = 2
+
+# Порядок групп в выдаче
+KIND_ORDER = {"genre": 0, "movie": 1, "director": 2}
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize(text):
+    """Нижний регистр, ё -> е, пунктуация -> пробелы"""
+    text = text.lower().replace("ё", "е")
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+class PrefixIndex:
+    def __init__(self, entries, movie_url="{}"):
+        """
+        entries - (текст для индексации, подсказка); подсказка - словарь
+        с kind, label, url (или movie_id) и популярностью weight.
+        movie_url - шаблон ссылки на фильм с {} вместо id
+        """
+        self.movie_url = movie_url
+        keys = []
+        for position, (text, _) in enumerate(entries):
+            words = normalize(text).split()
+            # Ключ с каждого слова: "рыцарь" находит "темный рыцарь"
+            for start in range(len(words)):
+                keys.append((" ".join(words[start:]), start > 0, position))
+        keys.sort()
+        self.keys = [key for key, _, _ in keys]
+        self.refs = [(inner, position) for _, inner, position in keys]
+        self.suggestions = [suggestion for _, suggestion in entries]
+
+    def __len__(self):
+        return len(self.suggestions)
+
+    def search(self, query, limit=AUTOCOMPLETE_LIMIT):
+        prefix = normalize(query)
+        if len(prefix) < MIN_PREFIX_LENGTH:
+            return []
+
+        found = {}
+        index = bisect_left(self.keys, prefix)
+        stop = min(index + AUTOCOMPLETE_SCAN, len(self.keys))
+        while index < stop and self.keys[index].startswith(prefix):
+            inner, position = self.refs[index]
+            # Совпадение с начала строки лучше совпадения со слова внутри
+            found[position] = min(found.get(position, True), inner)
+            index += 1
+
+        ranked = sorted(
+            found.items(),
+            key=lambda item: (
+                KIND_ORDER[self.suggestions[item[0]]["kind"]],
+                item[1],
+                -self.suggestions[item[0]]["weight"],
+                self.suggestions[item[0]]["label"],
+            ),
+        )
+        return [
+            self.render(self.suggestions[position])
+            for position, _ in ranked[:limit]
+        ]
+
+    def render(self, suggestion):
+        # Ссылки на фильмы строятся только для попавших в выдачу,
+        # по шаблону: reverse() на каждую подсказку заметно дороже
+        url = suggestion.get("url") or self.movie_url.format(
+            suggestion["movie_id"]
+        )
+        return {
+            "kind": suggestion["kind"],
+            "label": suggestion["label"],
+            "url": url,
+        }
+
+
+def build_index():
+    """Читает фильмы с режиссерами и жанры двумя запросами"""
+    entries = []
+    directors = {}
+    movie_list_url = reverse("movies:movie_list")
+    search_url = reverse("movies:search")
+
+    for movie_id, title, year, director, likes in Movie.objects.values_list(
+        "id", "title", "year", "director", "like_count"
+    ):
+        entries.append(
+            (
+                title,
+                {
+                    "kind": "movie",
+                    "label": f"{title} ({year})",
+                    "movie_id": movie_id,
+                    "weight": likes,
+                },
+            )
+        )
+        if director:
+            directors[director] = directors.get(director, 0) + likes
+
+    for director, likes in directors.items():
+        query = urlencode({"director": director})
+        entries.append(
+            (
+                director,
+                {
+                    "kind": "director",
+                    "label": director,
+                    "url": f"{search_url}?{query}",
+                    "weight": likes,
+                },
+            )
+        )
+
+    for name in Genre.objects.values_list("name", flat=True):
+        query = urlencode({"genre": name})
+        entries.append(
+            (
+                name,
+                {
+                    "kind": "genre",
+                    "label": name,
+                    "url": f"{movie_list_url}?{query}",
+                    "weight": 0,
+                },
+            )
+        )
+
+    head, tail = reverse("movies:movie_detail", args=[0]).rsplit("0", 1)
+    return PrefixIndex(entries, f"{head}{{}}{tail}")
+
+
+_index_lock = threading.Lock()
+_index = {"current": None, "version": None}
+
+
+def get_index():
+    # Версия читается до сборки: если каталог изменится во время нее,
+    # следующий запрос соберет индекс заново
+    version = get_versions([CONTENT])[CONTENT][0]
+    index = _index["current"]
+    if _index["version"] != version:
+        with _index_lock:
+            index = _index["current"]
+            if _index["version"] != version:
+                index = build_index()
+                _index.update(current=index, version=version)
+    return index
+
+
+def suggest(query, limit=AUTOCOMPLETE_LIMIT):
+    return get_index().search(query, limit)
@@ -0,0 +1,413 @@
+"""
+Нагрузочные замеры рекомендательных функций на синтетическом каталоге.
+
+Каталог генерируется пачками через bulk_create: фильмы с жанрами,
+пользователи с любимыми жанрами и оценками, популярность фильмов
+распределена по Ципфу. Для каждой функции замеряются перцентили
+задержки, число SQL-запросов и пик памяти Python (tracemalloc).
+Результат - словарь, пригодный для сохранения в JSON и сравнения
+прогонов до и после изменения.
+"""
+import os
+import platform
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from itertools import cycle, islice
+
+import numpy as np
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.db import OperationalError, connection, connections
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from movies.counters import recount_rating_counters
+from movies.models import Genre, Movie, Rating, UserPreferences
+from movies.recommender import save_model, train_als
+from movies.similarity import rebuild_similarities
+from movies.sqlite import retry_on_lock
+from movies.utils import (
+    calculate_item_similarity,
+    get_recommendations,
+    get_similar_movies,
+)
+from web_cinema_config.caches import cache_settings
+
+
+BENCHMARK_SCALES = {
+    "1k": {"movies": 1000, "users": 1000},
+    "10k": {"movies": 10000, "users": 10000},
+    "100k": {"movies": 100000, "users": 100000},
+}
+BENCHMARK_GENRES = 20
+BENCHMARK_RATINGS_PER_USER = 20
+BENCHMARK_ZIPF_EXPONENT = 1.1
+BENCHMARK_LIKE_SHARE = 0.8
+BENCHMARK_REPEAT = 50
+BENCHMARK_BATCH_SIZE = 5000
+BENCHMARK_WRITE_THREADS = 8
+BENCHMARK_WRITES_PER_THREAD = 100
+
+
+def generate_catalog(
+    movies,
+    users,
+    ratings_per_user=BENCHMARK_RATINGS_PER_USER,
+    genres=BENCHMARK_GENRES,
+    zipf_exponent=BENCHMARK_ZIPF_EXPONENT,
+    like_share=BENCHMARK_LIKE_SHARE,
+    seed=0,
+    batch_size=BENCHMARK_BATCH_SIZE,
+):
+    """
+    Заполняет пустую базу синтетическими данными.
+    Оценки пишутся напрямую, поэтому сигналы не срабатывают -
+    счетчики фильмов пересчитываются в конце.
+    Возвращает число созданных оценок
+    """
+    rng = np.random.default_rng(seed)
+    User = get_user_model()
+
+    genre_objs = Genre.objects.bulk_create(
+        [Genre(name=f"Жанр {i}") for i in range(genres)]
+    )
+    genre_ids = np.array([genre.id for genre in genre_objs])
+
+    Movie.objects.bulk_create(
+        (
+            Movie(title=f"Фильм {i}", year=int(year))
+            for i, year in enumerate(rng.integers(1950, 2026, movies))
+        ),
+        batch_size=batch_size,
+    )
+    movie_ids = np.fromiter(
+        Movie.objects.order_by("id").values_list("id", flat=True),
+        dtype=np.int64,
+    )
+    MovieGenre = Movie.genres.through
+    MovieGenre.objects.bulk_create(
+        (
+            MovieGenre(movie_id=int(movie_id), genre_id=int(genre_id))
+            for movie_id in movie_ids
+            for genre_id in rng.choice(
+                genre_ids, rng.integers(1, 4), replace=False
+            )
+        ),
+        batch_size=batch_size,
+    )
+
+    # Пароль непригоден для входа, хэш один на всех ради скорости
+    password = make_password(None)
+    User.objects.bulk_create(
+        (
+            User(
+                phone=f"bench{i}",
+                first_name="Bench",
+                last_name="User",
+                password=password,
+            )
+            for i in range(users)
+        ),
+        batch_size=batch_size,
+    )
+    user_ids = np.fromiter(
+        User.objects.filter(phone__startswith="bench")
+        .order_by("id")
+        .values_list("id", flat=True),
+        dtype=np.int64,
+    )
+    UserPreferences.objects.bulk_create(
+        (UserPreferences(user_id=int(user_id)) for user_id in user_ids),
+        batch_size=batch_size,
+    )
+    FavoriteGenre = UserPreferences.favorite_genres.through
+    prefs_ids = UserPreferences.objects.order_by("user_id").values_list(
+        "id", flat=True
+    )
+    FavoriteGenre.objects.bulk_create(
+        (
+            FavoriteGenre(userpreferences_id=prefs_id, genre_id=int(genre_id))
+            for prefs_id in prefs_ids
+            for genre_id in rng.choice(genre_ids, 2, replace=False)
+        ),
+        batch_size=batch_size,
+    )
+
+    # Ранг популярности фильма случаен, вероятность ~ 1 / ранг^s
+    popularity = 1.0 / np.arange(1, movies + 1) ** zipf_exponent
+    cdf = np.cumsum(popularity[rng.permutation(movies)])
+    draws = rng.random(users * ratings_per_user) * cdf[-1]
+    picks = np.searchsorted(cdf, draws)
+    pairs = np.unique(
+        np.repeat(np.arange(users), ratings_per_user) * movies + picks
+    )
+    values = np.where(
+        rng.random(len(pairs)) < like_share, Rating.LIKE, Rating.DISLIKE
+    )
+    now = timezone.now()
+    Rating.objects.bulk_create(
+        (
+            Rating(
+                user_id=int(user_ids[pair // movies]),
+                movie_id=int(movie_ids[pair % movies]),
+                value=int(value),
+                rated_at=now,
+            )
+            for pair, value in zip(pairs, values)
+        ),
+        batch_size=batch_size,
+    )
+    recount_rating_counters()
+    return len(pairs)
+
+
+def run_case(func, args):
+    result = func(*args)
+    # Querysets ленивые - результат нужно вычислить
+    if not isinstance(result, float):
+        list(result)
+
+
+def measure(func, cases, repeat=BENCHMARK_REPEAT):
+    """
+    Вызывает func(*args) repeat раз по кругу cases.
+    Задержки и запросы меряются отдельно от памяти: tracemalloc
+    заметно замедляет выполнение
+    """
+    timings, queries = [], []
+    for args in islice(cycle(cases), repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            run_case(func, args)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured.captured_queries))
+
+    tracemalloc.start()
+    try:
+        for args in cases[:5]:
+            run_case(func, args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99]).tolist()
+    return {
+        "calls": len(timings),
+        "latency_ms": {
+            "mean": statistics.fmean(timings),
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
+            "max": max(timings),
+        },
+        "queries": {"min": min(queries), "max": max(queries)},
+        "peak_memory_kb": peak / 1024,
+    }
+
+
+def sample_cases(seed=0, size=20):
+    """Случайные пользователи и самые популярные фильмы для замеров"""
+    rng = np.random.default_rng(seed + 1)
+    User = get_user_model()
+    user_ids = list(User.objects.values_list("id", flat=True))
+    users = list(
+        User.objects.filter(
+            id__in=rng.choice(user_ids, size, replace=False).tolist()
+        )
+    )
+    popular = list(Movie.objects.order_by("-like_count")[:size])
+    return users, popular
+
+
+@contextmanager
+def isolated_caches():
+    """
+    Кэши в памяти процесса на время замера. Синтетические id совпадают
+    с рабочими: в общем кэше (файлы, Redis) замер затер бы настоящие
+    версии, рекомендации и карточки и сам читал бы их
+    """
+    isolated = cache_settings("locmem://", file_root=None)
+    for alias, cache in isolated.items():
+        cache["LOCATION"] = f"benchmark-{alias}"
+    with override_settings(CACHES=isolated):
+        for cache in caches.all():
+            cache.clear()
+        yield
+
+
+def run_benchmarks(
+    scale="1k",
+    repeat=BENCHMARK_REPEAT,
+    ratings_per_user=BENCHMARK_RATINGS_PER_USER,
+    train_model=False,
+    seed=0,
+):
+    """
+    Генерирует каталог размера scale, готовит соседей (и при
+    train_model - ALS-модель) и замеряет функции рекомендаций в
+    отдельных кэшах. Ожидает пустую базу: запускать на тестовой
+    """
+    sizes = BENCHMARK_SCALES[scale]
+    with isolated_caches():
+        started = time.perf_counter()
+        ratings = generate_catalog(
+            sizes["movies"], sizes["users"], ratings_per_user, seed=seed
+        )
+        generated = time.perf_counter() - started
+
+        started = time.perf_counter()
+        rebuild_similarities()
+        with tempfile.TemporaryDirectory() as model_dir:
+            model_path = os.path.join(model_dir, "recommender.npz")
+            if train_model:
+                save_model(train_als(), model_path)
+            prepared = time.perf_counter() - started
+
+            users, popular = sample_cases(seed)
+
+            with override_settings(RECOMMENDER_MODEL_PATH=model_path):
+                results = {
+                    "get_recommendations": measure(
+                        get_recommendations,
+                        [(user, 10) for user in users],
+                        repeat,
+                    ),
+                    "get_similar_movies": measure(
+                        get_similar_movies,
+                        [
+                            (movie, user, 5)
+                            for movie, user in zip(popular, cycle(users))
+                        ],
+                        repeat,
+                    ),
+                    "calculate_item_similarity": measure(
+                        calculate_item_similarity,
+                        list(zip(popular, popular[1:])),
+                        repeat,
+                    ),
+                }
+
+    return {
+        "scale": scale,
+        "movies": sizes["movies"],
+        "users": sizes["users"],
+        "ratings": ratings,
+        "train_model": train_model,
+        "seed": seed,
+        "database": settings.DATABASES["default"]["ENGINE"],
+        "python": platform.python_version(),
+        "created_at": timezone.now().isoformat(),
+        "setup_seconds": {"generate": generated, "prepare": prepared},
+        "results": results,
+    }
+
+
+@retry_on_lock
+def _rate(user_id, movie_id, value):
+    # Та же транзакция, что у views.rate_movie
+    UserPreferences.objects.get_or_create(user_id=user_id)
+    return Rating.objects.set_ratings(user_id, {movie_id: value})
+
+
+def measure_concurrent_writes(
+    threads=BENCHMARK_WRITE_THREADS,
+    writes_per_thread=BENCHMARK_WRITES_PER_THREAD,
+    seed=0,
+):
+    """
+    threads потоков, у каждого свой пользователь и свое соединение,
+    одновременно ставят и меняют оценки случайным фильмам. Возвращает
+    пропускную способность и число записей, упавших на блокировке
+    """
+    User = get_user_model()
+    user_ids = list(
+        User.objects.filter(phone__startswith="bench")
+        .order_by("id")
+        .values_list("id", flat=True)[:threads]
+    )
+    movie_ids = list(Movie.objects.values_list("id", flat=True))
+    errors = [0] * len(user_ids)
+    start = threading.Barrier(len(user_ids) + 1)
+
+    def writer(index, user_id):
+        rng = np.random.default_rng(seed + index)
+        try:
+            start.wait()
+            for _ in range(writes_per_thread):
+                try:
+                    _rate(
+                        user_id,
+                        int(rng.choice(movie_ids)),
+                        int(rng.choice([Rating.LIKE, Rating.DISLIKE, 0])),
+                    )
+                except OperationalError:
+                    errors[index] += 1
+        finally:
+            connections.close_all()
+
+    workers = [
+        threading.Thread(target=writer, args=(index, user_id))
+        for index, user_id in enumerate(user_ids)
+    ]
+    for worker in workers:
+        worker.start()
+    start.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    seconds = time.perf_counter() - started
+
+    writes = len(user_ids) * writes_per_thread
+    return {
+        "threads": len(user_ids),
+        "writes": writes,
+        "seconds": seconds,
+        "writes_per_second": (writes - sum(errors)) / seconds,
+        "errors": sum(errors),
+    }
+
+
+def run_write_benchmark(
+    threads=BENCHMARK_WRITE_THREADS,
+    writes_per_thread=BENCHMARK_WRITES_PER_THREAD,
+    movies=200,
+    seed=0,
+):
+    """
+    Оценки из threads потоков без режима SQLite (журнал отката, без
+    повторов) и с ним в отдельных кэшах. Ожидает пустую базу SQLite в
+    файле
+    """
+    modes = {
+        "before": {"SQLITE_TUNING": False, "SQLITE_WRITE_RETRIES": 0},
+        "after": {},
+    }
+    results = {}
+    with isolated_caches():
+        generate_catalog(movies, threads, ratings_per_user=0, seed=seed)
+        for name, overrides in modes.items():
+            Rating.objects.all().delete()
+            with override_settings(**overrides):
+                if name == "before":
+                    # WAL запоминается в файле базы
+                    with connection.cursor() as cursor:
+                        cursor.execute("PRAGMA journal_mode = DELETE")
+                connections.close_all()
+                results[name] = measure_concurrent_writes(
+                    threads, writes_per_thread, seed
+                )
+
+    return {
+        "threads": threads,
+        "writes_per_thread": writes_per_thread,
+        "python": platform.python_version(),
+        "created_at": timezone.now().isoformat(),
+        "results": results,
+    }
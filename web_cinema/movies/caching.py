@@ -0,0 +1,73 @@
+"""
+Именованные кэши и пространства ключей с версией.
+
+FRAGMENTS - готовый HTML (страницы каталога и карточки фильмов),
+RECOMMENDATIONS - оценки зрителей и выдача рекомендаций, COUNTERS -
+версии пространств и областей каталога (см. movies.conditional).
+Хранилище выбирается в настройках, см. web_cinema_config.caches.
+
+Запись читается с версией своих пространств. Поднять версию - один
+incr в COUNTERS: после него все записи пространства перестают
+читаться и сами доживают свой TTL. Версия заводится от текущего
+времени, поэтому после очистки COUNTERS не совпадет со старой.
+"""
+import time
+
+from django.core.cache import caches
+
+
+FRAGMENTS = "fragments"
+RECOMMENDATIONS = "recommendations"
+COUNTERS = "counters"
+
+
+def fresh_version():
+    return time.time_ns() // 1000
+
+
+def _namespace_key(namespace):
+    return f"movies:namespace:{namespace}"
+
+
+def namespace_versions(namespaces):
+    """{пространство: версия}; недостающие в кэше заводятся заново"""
+    counters = caches[COUNTERS]
+    keys = {_namespace_key(namespace): namespace for namespace in namespaces}
+    found = counters.get_many(list(keys))
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            counters.add(key, fresh_version(), None)
+        found.update(counters.get_many(missing))
+    return {keys[key]: found[key] for key in keys}
+
+
+def bump_namespace(*namespaces):
+    """Делает недействительными все записи пространств"""
+    counters = caches[COUNTERS]
+    for namespace in namespaces:
+        try:
+            counters.incr(_namespace_key(namespace))
+        except ValueError:
+            counters.set(_namespace_key(namespace), fresh_version(), None)
+
+
+def key_version(*namespaces):
+    """Версия записи, которая устаревает с любым из пространств"""
+    versions = namespace_versions(namespaces)
+    return ".".join(str(versions[namespace]) for namespace in namespaces)
+
+
+def get_or_compute(alias, key, compute, timeout, namespaces=()):
+    """
+    Значение key из кэша alias в версии пространств namespaces, при
+    промахе - compute() с записью на timeout секунд. None не кэшируется
+    """
+    cache = caches[alias]
+    version = key_version(*namespaces) if namespaces else None
+    value = cache.get(key, version=version)
+    if value is None:
+        value = compute()
+        if value is not None:
+            cache.set(key, value, timeout, version=version)
+    return value
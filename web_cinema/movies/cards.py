@@ -0,0 +1,69 @@
+"""
+Карточки фильмов с кэшем готового HTML.
+
+Карточка зависит только от полей фильма и его жанров, поэтому ее HTML
+кэшируется в FRAGMENTS по (id, версия карточки). Версия "card:<id>"
+поднимается при изменении фильма или его жанров, см.
+movies.conditional. Страница берет все свои карточки одним get_many и
+рендерит только промахи - жанры для них подгружаются одним запросом.
+Счетчики лайков и отзывов меняются с каждой оценкой, поэтому в кэш не
+входят: при stats=True они подставляются в готовую карточку.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from movies.caching import FRAGMENTS
+from movies.conditional import card_scope, get_versions
+
+
+CARD_TEMPLATE = "movies/includes/movie_card.html"
+STATS_TEMPLATE = "movies/includes/movie_card_stats.html"
+STATS_MARKER = "<!-- stats -->"
+
+
+def _card_key(movie_id, version):
+    return f"movies:card:{movie_id}:{version}"
+
+
+def render_cards(movies, stats=False):
+    """
+    HTML карточек фильмов подряд, в порядке movies; stats - со
+    счетчиками лайков и отзывов
+    """
+    movies = list(movies)
+    if not movies:
+        return ""
+    versions = get_versions([card_scope(movie.id) for movie in movies])
+    keys = [
+        _card_key(movie.id, versions[card_scope(movie.id)][0])
+        for movie in movies
+    ]
+    cards = caches[FRAGMENTS].get_many(keys)
+
+    misses = {
+        key: movie for key, movie in zip(keys, movies) if key not in cards
+    }
+    if misses:
+        prefetch_related_objects(list(misses.values()), "genres")
+        rendered = {
+            key: render_to_string(CARD_TEMPLATE, {"movie": movie})
+            for key, movie in misses.items()
+        }
+        caches[FRAGMENTS].set_many(
+            rendered, settings.MOVIES_CARD_CACHE_TTL
+        )
+        cards.update(rendered)
+    html = [cards[key] for key in keys]
+    if stats:
+        html = [
+            card.replace(
+                STATS_MARKER,
+                render_to_string(STATS_TEMPLATE, {"movie": movie}),
+                1,
+            )
+            for card, movie in zip(html, movies)
+        ]
+    return mark_safe("".join(html))
@@ -0,0 +1,172 @@
+"""
+Условные GET и кэш страниц каталога по версиям.
+
+Версии - счетчики в кэше COUNTERS по областям: CATALOG меняется при
+любом изменении фильмов, жанров, отзывов и оценок, CONTENT - только
+фильмов и жанров (и пересчетов, которые меняют карточки), "movie:<id>"
+- при изменении самого фильма, его отзывов и оценок, "card:<id>" -
+только фильма и его жанров (кэш карточек, см. movies.cards), RANKINGS
+- когда пересчет меняет списки главной (см. movies.rankings). ETag
+страницы собирается из версий ее областей, поэтому неизменившаяся
+страница отвечает 304 без запросов к базе и рендера шаблона, а
+отрендеренная страница лежит в кэше FRAGMENTS под ключом из ETag и URL
+и не требует инвалидации.
+
+Страницы одинаковы для всех: персональные блоки приходят отдельно,
+см. movies.fragments. Поэтому ответы public и без Vary: Cookie, а
+no-cache заставляет браузеры и прокси каждый раз сверять ETag.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from movies.caching import COUNTERS, FRAGMENTS, fresh_version
+from web_cinema_config.routers import primary_reads
+
+
+CATALOG = "catalog"
+CONTENT = "content"
+RANKINGS = "rankings"
+
+
+def movie_scope(movie_id):
+    return f"movie:{movie_id}"
+
+
+def card_scope(movie_id):
+    return f"card:{movie_id}"
+
+
+def _version_key(scope):
+    return f"movies:version:{scope}"
+
+
+def _changed_key(scope):
+    return f"movies:version:{scope}:changed"
+
+
+def get_versions(scopes):
+    """
+    Версии и время последнего изменения областей:
+    {область: (версия, unix-время)}. Недостающие в кэше заводятся заново
+    """
+    defaults = {}
+    for scope in scopes:
+        # Старт от текущего времени, а не с единицы: после очистки кэша
+        # новые версии не совпадут с ETag, выданными раньше
+        defaults[_version_key(scope)] = fresh_version
+        defaults[_changed_key(scope)] = time.time
+    counters = caches[COUNTERS]
+    found = counters.get_many(list(defaults))
+    missing = [key for key in defaults if key not in found]
+    if missing:
+        for key in missing:
+            counters.add(key, defaults[key](), None)
+        found.update(counters.get_many(missing))
+    return {
+        scope: (found[_version_key(scope)], found[_changed_key(scope)])
+        for scope in scopes
+    }
+
+
+def _bump(scopes):
+    counters = caches[COUNTERS]
+    now = time.time()
+    for scope in scopes:
+        try:
+            counters.incr(_version_key(scope))
+        except ValueError:
+            counters.set(_version_key(scope), fresh_version(), None)
+        counters.set(_changed_key(scope), now, None)
+
+
+def bump_catalog_version(movie_ids=(), content=False):
+    """
+    Поднимает общую версию каталога и версии фильмов movie_ids, а при
+    content=True - еще версию содержимого и карточек этих фильмов.
+    Внутри транзакции - после коммита, иначе параллельный запрос выдал
+    бы старую страницу с новым ETag
+    """
+    scopes = [CATALOG]
+    if content:
+        scopes.append(CONTENT)
+    for movie_id in movie_ids:
+        scopes.append(movie_scope(movie_id))
+        if content:
+            scopes.append(card_scope(movie_id))
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+def bump_rankings_version():
+    """Новые ETag страниц со списками, которые изменил пересчет"""
+    transaction.on_commit(lambda: _bump([RANKINGS]))
+
+
+def _page_versions(request, scopes, kwargs):
+    if not hasattr(request, "_catalog_versions"):
+        request._catalog_versions = list(
+            get_versions([scope.format(**kwargs) for scope in scopes]).values()
+        )
+    return request._catalog_versions
+
+
+def _page_key(request, etag):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f"movies:page:{etag}:{path}"
+
+
+def catalog_page(*scopes):
+    """
+    Условный GET и кэш страницы каталога. Области - имена или шаблоны
+    с аргументами URL, например "movie:{movie_id}"
+    """
+
+    def etag(request, *args, **kwargs):
+        versions = _page_versions(request, scopes, kwargs)
+        return "-".join(str(version) for version, _ in versions)
+
+    def last_modified(request, *args, **kwargs):
+        versions = _page_versions(request, scopes, kwargs)
+        return datetime.fromtimestamp(
+            max(changed for _, changed in versions), tz=timezone.utc
+        )
+
+    def decorator(view):
+        def cached_view(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+            key = _page_key(request, etag(request, *args, **kwargs))
+            response = caches[FRAGMENTS].get(key)
+            if response is None:
+                # Версия в ключе - версия основной базы: страница с
+                # отстающей реплики осталась бы в кэше до новой версии
+                with primary_reads():
+                    response = view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    caches[FRAGMENTS].set(
+                        key, response, settings.MOVIES_PAGE_CACHE_TTL
+                    )
+            return response
+
+        conditional_view = condition(
+            etag_func=etag, last_modified_func=last_modified
+        )(cached_view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            # Без max-age: после своей оценки браузер не должен видеть
+            # старую страницу, а перепроверка по ETag стоит ответа 304
+            patch_cache_control(response, public=True, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,63 @@
+"""Денормализованные счетчики лайков, дизлайков и отзывов фильма"""
+from collections import defaultdict
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from movies.conditional import bump_catalog_version
+from movies.models import Movie, Rating, Review
+
+
+COUNTER_FIELDS = {
+    Rating.LIKE: "like_count",
+    Rating.DISLIKE: "dislike_count",
+}
+
+
+def shift_rating_counters(changes):
+    """
+    Атомарно сдвигает счетчики через F() по списку изменений оценок
+    (movie_id, старое, новое): не больше одного UPDATE на поле и знак
+    """
+    shifts = defaultdict(list)
+    for movie_id, old, new in changes:
+        for value, delta in ((old, -1), (new, 1)):
+            if value:
+                shifts[COUNTER_FIELDS[value], delta].append(movie_id)
+
+    for (field, delta), movie_ids in shifts.items():
+        Movie.objects.filter(id__in=movie_ids).update(
+            **{field: F(field) + delta}
+        )
+
+
+def shift_review_count(movie_id, delta):
+    """Атомарно сдвигает счетчик отзывов фильма через F()"""
+    Movie.objects.filter(id=movie_id).update(
+        review_count=F("review_count") + delta
+    )
+
+
+def _count_subquery(queryset):
+    return Coalesce(
+        Subquery(
+            queryset.filter(movie_id=OuterRef("pk"))
+            .values("movie_id")
+            .annotate(total=Count("*"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def recount_rating_counters():
+    """Пересчитывает все счетчики для всего каталога одним UPDATE"""
+    count = Movie.objects.update(
+        like_count=_count_subquery(Rating.objects.filter(value=Rating.LIKE)),
+        dislike_count=_count_subquery(
+            Rating.objects.filter(value=Rating.DISLIKE)
+        ),
+        review_count=_count_subquery(Review.objects.all()),
+    )
+    bump_catalog_version(content=True)
+    return count
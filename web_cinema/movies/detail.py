@@ -0,0 +1,58 @@
+"""
+Данные страницы фильма за фиксированное число запросов.
+
+Общая часть - фильм со счетчиками и жанрами, страница ленты отзывов
+(см. movies.reviews) и похожие фильмы для анонима - одинакова для всех
+и кэшируется вместе со страницей. Оценка и отзыв зрителя и его похожие
+фильмы загружаются отдельно блоками movies.fragments; лайк или дизлайк
+берется из кэша оценок, см. movies.viewer.
+"""
+from django.contrib.auth.models import AnonymousUser
+from django.shortcuts import get_object_or_404
+
+from movies.models import Movie, Review
+from movies.reviews import review_page
+from movies.utils import get_similar_movies
+from movies.viewer import get_rated_movies
+
+
+SIMILAR_MOVIES_LIMIT = 4
+
+
+def load_similar_movies(movie, user):
+    """
+    Похожие фильмы; movie - с prefetch жанров. Жанры самих похожих
+    подгрузит кэш карточек, если понадобится
+    """
+    return get_similar_movies(movie, user, limit=SIMILAR_MOVIES_LIMIT)
+
+
+def load_movie_detail(movie_id, cursor=None):
+    """
+    Контекст шаблона movies/movie_detail.html, общий для всех;
+    cursor - курсор страницы отзывов
+    """
+    movie = get_object_or_404(
+        Movie.objects.prefetch_related("genres"), id=movie_id
+    )
+    reviews, reviews_cursor = review_page(movie.id, cursor)
+
+    return {
+        "movie": movie,
+        "like_count": movie.like_count,
+        "dislike_count": movie.dislike_count,
+        "review_count": movie.review_count,
+        "reviews": reviews,
+        "reviews_cursor": reviews_cursor,
+        "similar_movies": load_similar_movies(movie, AnonymousUser()),
+    }
+
+
+def load_viewer_state(movie, user):
+    """Оценка и отзыв зрителя для movies/includes/movie_actions.html"""
+    rated = get_rated_movies(user.id)
+    return {
+        "user_review": Review.objects.filter(user=user, movie=movie).first(),
+        "user_liked": movie.id in rated["liked"],
+        "user_disliked": movie.id in rated["disliked"],
+    }
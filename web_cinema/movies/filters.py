@@ -0,0 +1,132 @@
+"""
+Фильтры каталога и фасеты к ним.
+
+Фасет - число фильмов по каждому жанру, десятилетию и стране при
+текущих фильтрах. Для каждого фасета его собственный фильтр не
+применяется, чтобы можно было переключиться на соседнее значение.
+Счетчики считаются тремя группирующими запросами и кэшируются по
+хэшу нормализованного набора фильтров на MOVIES_FACETS_TTL секунд.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F
+
+from movies.fulltext import search_movies
+from movies.models import Movie
+
+
+# Параметры, которые сужают выборку; остальные (курсор, порядок)
+# на фасеты не влияют
+FILTER_PARAMS = ("q", "genre", "year", "decade", "country", "director")
+FACET_PARAMS = {
+    "genres": "genre",
+    "decades": "decade",
+    "countries": "country",
+}
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def filter_movies(params, exclude=()):
+    """
+    Фильтры каталога и поиска по GET-параметрам.
+    С запросом q результаты по умолчанию идут по релевантности
+    """
+    movies = Movie.objects.all()
+    params = {
+        name: value
+        for name, value in normalize_params(params).items()
+        if name not in exclude
+    }
+
+    if "q" in params:
+        movies, _ = search_movies(movies, params["q"])
+    if "genre" in params:
+        movies = movies.filter(genres__name=params["genre"])
+    if "year" in params:
+        year = _to_int(params["year"])
+        movies = movies.filter(year=year) if year else movies.none()
+    if "decade" in params:
+        decade = _to_int(params["decade"])
+        movies = (
+            movies.filter(year__gte=decade, year__lt=decade + 10)
+            if decade is not None
+            else movies.none()
+        )
+    if "country" in params:
+        movies = movies.filter(country=params["country"])
+    if "director" in params:
+        movies = movies.filter(director=params["director"])
+
+    return movies
+
+
+def normalize_params(params):
+    """Непустые параметры фильтров без пробелов по краям"""
+    normalized = {}
+    for name in FILTER_PARAMS:
+        value = (params.get(name) or "").strip()
+        if value:
+            normalized[name] = value
+    return normalized
+
+
+def facets_key(params):
+    """
+    Ключ кэша: порядок параметров, лишние пробелы и регистр
+    поискового запроса не важны
+    """
+    normalized = normalize_params(params)
+    if "q" in normalized:
+        normalized["q"] = " ".join(normalized["q"].lower().split())
+    digest = hashlib.sha1(
+        json.dumps(sorted(normalized.items()), ensure_ascii=False).encode()
+    ).hexdigest()
+    return f"movies:facets:{digest}"
+
+
+def compute_facets(params):
+    movie_ids = filter_movies(params, exclude=["genre"]).values("id")
+    genres = (
+        Movie.genres.through.objects.filter(movie_id__in=movie_ids)
+        .values_list("genre__name")
+        .annotate(count=Count("movie_id"))
+        .order_by("genre__name")
+    )
+    decades = (
+        filter_movies(params, exclude=["decade"])
+        .annotate(decade=F("year") / 10 * 10)
+        .values_list("decade")
+        .annotate(count=Count("id", distinct=True))
+        .order_by("-decade")
+    )
+    countries = (
+        filter_movies(params, exclude=["country"])
+        .exclude(country="")
+        .values_list("country")
+        .annotate(count=Count("id", distinct=True))
+        .order_by("-count", "country")
+    )
+    return {
+        "genres": [list(row) for row in genres],
+        "decades": [list(row) for row in decades],
+        "countries": [list(row) for row in countries],
+    }
+
+
+def get_facets(params):
+    """Фасеты для набора фильтров: [значение, число фильмов] по группам"""
+    key = facets_key(params)
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(params)
+        cache.set(key, facets, settings.MOVIES_FACETS_TTL)
+    return facets
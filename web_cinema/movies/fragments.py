@@ -0,0 +1,66 @@
+"""
+Персональные блоки страниц, которые подгружаются после общей страницы.
+
+Страницы каталога одинаковы для всех и кэшируются целиком (см.
+movies.conditional), а то, что зависит от пользователя, приходит одним
+JSON-запросом: {имя блока: html}. Шаблоны блоков смотрят на переменную
+viewer - в общей странице ее нет, и там выводится вариант для анонима.
+Поэтому анониму отдаются только сообщения.
+"""
+from django.contrib.messages import get_messages
+from django.template.loader import render_to_string
+
+from movies.detail import load_similar_movies, load_viewer_state
+from movies.models import Movie
+
+
+SLOT_TEMPLATES = {
+    "header_links": "includes/header_links.html",
+    "header_user": "includes/header_user.html",
+    "hero_actions": "movies/includes/hero_actions.html",
+    "movie_actions": "movies/includes/movie_actions.html",
+    "similar_movies": "movies/includes/similar_movies.html",
+}
+MOVIE_SLOTS = {"movie_actions", "similar_movies"}
+
+
+def _load_movie(movie_id):
+    try:
+        movie_id = int(movie_id)
+    except (TypeError, ValueError):
+        return None
+    return Movie.objects.prefetch_related("genres").filter(id=movie_id).first()
+
+
+def render_fragments(request, slots, movie_id=None):
+    """HTML запрошенных блоков; неизвестные имена пропускаются"""
+    fragments = {}
+    if "messages" in slots:
+        messages = list(get_messages(request))
+        if messages:
+            fragments["messages"] = render_to_string(
+                "includes/messages.html", {"messages": messages}
+            )
+
+    user = request.user
+    if not user.is_authenticated:
+        return fragments
+
+    slots = [slot for slot in dict.fromkeys(slots) if slot in SLOT_TEMPLATES]
+    context = {"viewer": user}
+    if MOVIE_SLOTS.intersection(slots):
+        movie = _load_movie(movie_id)
+        if movie is None:
+            slots = [slot for slot in slots if slot not in MOVIE_SLOTS]
+        else:
+            context["movie"] = movie
+            if "movie_actions" in slots:
+                context.update(load_viewer_state(movie, user))
+            if "similar_movies" in slots:
+                context["similar_movies"] = load_similar_movies(movie, user)
+
+    for slot in slots:
+        fragments[slot] = render_to_string(
+            SLOT_TEMPLATES[slot], context, request=request
+        )
+    return fragments
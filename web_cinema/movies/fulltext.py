@@ -0,0 +1,212 @@
+"""
+Полнотекстовый поиск по названию и описанию фильмов.
+
+SQLite: виртуальная таблица FTS5 с внешним содержимым movies_movie,
+синхронизация - триггерами, ранжирование - bm25. Английские слова
+стеммит токенайзер porter, русские - легкий стеммер запроса ниже,
+основа ищется как префикс.
+
+PostgreSQL: сгенерированная колонка search_vector (tsvector со
+словарями russian и english) с GIN-индексом, ранжирование - ts_rank_cd.
+
+На остальных СУБД - прежний поиск через icontains без ранжирования.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+
+FTS_TABLE = "movies_movie_fts"
+# Вес совпадения в названии относительно описания
+TITLE_WEIGHT = 10.0
+
+_SQLITE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai
+    AFTER INSERT ON movies_movie BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad
+    AFTER DELETE ON movies_movie BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF title, description ON movies_movie BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+_POSTGRES_VECTOR = """
+    setweight(to_tsvector('russian', coalesce(title, '')), 'A')
+    || setweight(to_tsvector('english', coalesce(title, '')), 'A')
+    || setweight(to_tsvector('russian', coalesce(description, '')), 'B')
+    || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+"""
+_POSTGRES_QUERY = (
+    "(websearch_to_tsquery('russian', %s) "
+    "|| websearch_to_tsquery('english', %s))"
+)
+
+
+def install_search_index(schema_connection=connection):
+    """
+    Создает индекс, если его еще нет. Триггеры SQLite пересоздаются
+    после каждой миграции: пересборка таблицы movies_movie их удаляет
+    """
+    vendor = schema_connection.vendor
+    with schema_connection.cursor() as cursor:
+        if vendor == "sqlite":
+            cursor.execute(
+                f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+                    title, description,
+                    content='movies_movie', content_rowid='id',
+                    tokenize='porter unicode61 remove_diacritics 2'
+                )
+                """
+            )
+            for statement in _SQLITE_TRIGGERS:
+                cursor.execute(statement)
+        elif vendor == "postgresql":
+            cursor.execute(
+                f"""
+                ALTER TABLE movies_movie
+                ADD COLUMN IF NOT EXISTS search_vector tsvector
+                GENERATED ALWAYS AS ({_POSTGRES_VECTOR}) STORED
+                """
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS movies_movie_search_idx "
+                "ON movies_movie USING gin (search_vector)"
+            )
+
+
+def uninstall_search_index(schema_connection=connection):
+    vendor = schema_connection.vendor
+    with schema_connection.cursor() as cursor:
+        if vendor == "sqlite":
+            for suffix in ("ai", "ad", "au"):
+                cursor.execute(
+                    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}"
+                )
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif vendor == "postgresql":
+            cursor.execute("DROP INDEX IF EXISTS movies_movie_search_idx")
+            cursor.execute(
+                "ALTER TABLE movies_movie DROP COLUMN IF EXISTS search_vector"
+            )
+
+
+def rebuild_search_index():
+    """Переиндексирует весь каталог одной командой СУБД"""
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            install_search_index()
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+            )
+        elif connection.vendor == "postgresql":
+            # Колонка сгенерированная, пересобрать нужно только индекс
+            install_search_index()
+            cursor.execute("REINDEX INDEX movies_movie_search_idx")
+
+
+_RUSSIAN_ENDINGS = sorted(
+    (
+        "иями ями ами ией ого его ому ему ыми ими ать ять ить еть ешь "
+        "ете ует ют ут ах ях ом ем ой ей ый ий ая яя ое ее ые ие ов ев ам "
+        "ям ию ия а я о е ы и у ю ь й"
+    ).split(),
+    key=len,
+    reverse=True,
+)
+_CYRILLIC = re.compile(r"[а-яё]")
+
+
+def stem_russian(word):
+    """Отрезает окончание, оставляя основу не короче трех букв"""
+    for ending in _RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[: -len(ending)]
+    return word
+
+
+def build_fts_query(query):
+    """
+    Запрос FTS5 из пользовательской строки: все слова обязательны,
+    каждое в кавычках, чтобы спецсимволы не ломали синтаксис.
+    Русские слова ищутся по основе, последнее слово - как префикс
+    (поиск по мере набора)
+    """
+    words = re.findall(r"\w+", query.lower())
+    terms = []
+    for position, word in enumerate(words):
+        if _CYRILLIC.search(word):
+            terms.append(f'"{stem_russian(word)}"*')
+        elif position == len(words) - 1:
+            terms.append(f'"{word}"*')
+        else:
+            terms.append(f'"{word}"')
+    return " ".join(terms)
+
+
+def search_movies(queryset, query):
+    """
+    Фильтрует queryset по запросу и добавляет аннотацию rank
+    (больше - релевантнее). Возвращает (queryset, ранжирован ли)
+    """
+    if connection.vendor == "sqlite":
+        match = build_fts_query(query)
+        if not match:
+            return queryset.none(), True
+        queryset = queryset.filter(
+            id__in=RawSQL(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                [match],
+            )
+        ).annotate(
+            rank=RawSQL(
+                f"SELECT -bm25({FTS_TABLE}, {TITLE_WEIGHT}, 1.0) "
+                f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"AND {FTS_TABLE}.rowid = movies_movie.id",
+                [match],
+            )
+        )
+        return queryset, True
+
+    if connection.vendor == "postgresql":
+        queryset = queryset.filter(
+            id__in=RawSQL(
+                "SELECT id FROM movies_movie "
+                f"WHERE search_vector @@ {_POSTGRES_QUERY}",
+                [query, query],
+            )
+        ).annotate(
+            # real округляется при выдаче, и курсор страницы по нему не
+            # совпал бы с рангом в базе; double precision - точный
+            rank=RawSQL(
+                "ts_rank_cd(movies_movie.search_vector, "
+                f"{_POSTGRES_QUERY})::double precision",
+                [query, query],
+            )
+        )
+        return queryset, True
+
+    return (
+        queryset.filter(
+            Q(title__icontains=query) | Q(description__icontains=query)
+        ),
+        False,
+    )
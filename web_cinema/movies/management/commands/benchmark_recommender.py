@@ -0,0 +1,72 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from movies.benchmark import (
+    BENCHMARK_RATINGS_PER_USER,
+    BENCHMARK_REPEAT,
+    BENCHMARK_SCALES,
+    run_benchmarks,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет рекомендательные функции на синтетическом каталоге "
+        "во временной тестовой базе"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale", choices=sorted(BENCHMARK_SCALES), default="1k"
+        )
+        parser.add_argument("--repeat", type=int, default=BENCHMARK_REPEAT)
+        parser.add_argument(
+            "--ratings-per-user",
+            type=int,
+            default=BENCHMARK_RATINGS_PER_USER,
+        )
+        parser.add_argument(
+            "--train-model",
+            action="store_true",
+            help="Обучить ALS-модель перед замерами",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--output", default=None, help="Куда сохранить результат в JSON"
+        )
+
+    def handle(self, *args, **options):
+        # Синтетические данные не должны попасть в рабочую базу
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            report = run_benchmarks(
+                scale=options["scale"],
+                repeat=options["repeat"],
+                ratings_per_user=options["ratings_per_user"],
+                train_model=options["train_model"],
+                seed=options["seed"],
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for name, result in report["results"].items():
+            latency = result["latency_ms"]
+            self.stdout.write(
+                f"{name}: p50 {latency['p50']:.1f} мс, "
+                f"p95 {latency['p95']:.1f} мс, "
+                f"p99 {latency['p99']:.1f} мс, "
+                f"запросов {result['queries']['max']}, "
+                f"память {result['peak_memory_kb']:.0f} КБ"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(
+                self.style.SUCCESS(f"Результат сохранен в {options['output']}")
+            )
@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from movies.benchmark import (
+    BENCHMARK_WRITE_THREADS,
+    BENCHMARK_WRITES_PER_THREAD,
+    run_write_benchmark,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет пропускную способность оценок из нескольких потоков "
+        "на SQLite без режима WAL и с ним, во временной базе"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads", type=int, default=BENCHMARK_WRITE_THREADS
+        )
+        parser.add_argument(
+            "--writes", type=int, default=BENCHMARK_WRITES_PER_THREAD
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--output", default=None, help="Куда сохранить результат в JSON"
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Замер имеет смысл только для SQLite")
+
+        old_name = connection.settings_dict["NAME"]
+        with tempfile.TemporaryDirectory() as tmp:
+            # Потокам нужна общая база в файле, а не в памяти
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(
+                tmp, "benchmark.sqlite3"
+            )
+            connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                report = run_write_benchmark(
+                    threads=options["threads"],
+                    writes_per_thread=options["writes"],
+                    seed=options["seed"],
+                )
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for name, result in report["results"].items():
+            self.stdout.write(
+                f"{name}: {result['threads']} потоков, "
+                f"{result['writes_per_second']:.0f} записей/с, "
+                f"ошибок блокировки {result['errors']} "
+                f"из {result['writes']}"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(
+                self.style.SUCCESS(f"Результат сохранен в {options['output']}")
+            )
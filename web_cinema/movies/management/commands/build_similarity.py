@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from movies.similarity import SIMILARITY_TOP_K, rebuild_similarities
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает item-item схожесть фильмов (top-K соседей)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top-k",
+            type=int,
+            default=SIMILARITY_TOP_K,
+            help="Сколько соседей хранить для каждого фильма",
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_similarities(top_k=options["top_k"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Сохранено {count} пар похожих фильмов")
+        )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from movies.query_plans import explain_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Показывает планы запросов страниц каталога и отмечает "
+        "полные проходы по таблицам"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scans-only",
+            action="store_true",
+            help="Выводить только запросы с полными проходами",
+        )
+
+    def handle(self, *args, **options):
+        flagged = 0
+        for name, plan, scans in explain_catalog():
+            if scans:
+                flagged += 1
+            elif options["scans_only"]:
+                continue
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan)
+            if scans:
+                self.stdout.write(
+                    self.style.WARNING(
+                        "Полный проход: " + ", ".join(scans)
+                    )
+                )
+            self.stdout.write("")
+
+        if flagged:
+            self.stdout.write(
+                self.style.WARNING(f"Запросов с полным проходом: {flagged}")
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS("Полных проходов нет"))
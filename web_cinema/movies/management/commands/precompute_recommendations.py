@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movies.precompute import (
+    PRECOMPUTE_CHUNK_SIZE,
+    PRECOMPUTE_LIMIT,
+    precompute_recommendations,
+)
+
+
+class Command(BaseCommand):
+    help = "Предрасчитывает рекомендации всех пользователей в кэш"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=PRECOMPUTE_LIMIT,
+            help="Сколько фильмов хранить для каждого пользователя",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Размер пула процессов для ранжирования",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=PRECOMPUTE_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        generation, count = precompute_recommendations(
+            limit=options["limit"],
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Поколение {generation}: рекомендации для {count} "
+                f"пользователей за {time.monotonic() - started:.1f} с"
+            )
+        )
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movies.fulltext import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Переиндексирует каталог для полнотекстового поиска"
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rebuild_search_index()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Индекс поиска пересобран за "
+                f"{time.monotonic() - started:.1f} с"
+            )
+        )
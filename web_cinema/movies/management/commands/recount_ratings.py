@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from movies.counters import recount_rating_counters
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает счетчики лайков, дизлайков и отзывов фильмов"
+
+    def handle(self, *args, **options):
+        count = recount_rating_counters()
+        self.stdout.write(
+            self.style.SUCCESS(f"Счетчики пересчитаны для {count} фильмов")
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from movies.trending import TRENDING_TOP_N, refresh_trending
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает таблицу трендовых фильмов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=TRENDING_TOP_N,
+            help="Сколько фильмов хранить в трендах",
+        )
+
+    def handle(self, *args, **options):
+        count = refresh_trending(top_n=options["top"])
+        self.stdout.write(
+            self.style.SUCCESS(f"В трендах {count} фильмов")
+        )
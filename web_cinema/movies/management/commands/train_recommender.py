@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movies.recommender import (
+    ALS_ALPHA,
+    ALS_FACTORS,
+    ALS_ITERATIONS,
+    ALS_REGULARIZATION,
+    get_model_path,
+    save_model,
+    train_als,
+)
+
+
+class Command(BaseCommand):
+    help = "Обучает ALS-модель рекомендаций на лайках и дизлайках"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--factors", type=int, default=ALS_FACTORS)
+        parser.add_argument("--iterations", type=int, default=ALS_ITERATIONS)
+        parser.add_argument(
+            "--regularization", type=float, default=ALS_REGULARIZATION
+        )
+        parser.add_argument("--alpha", type=float, default=ALS_ALPHA)
+        parser.add_argument(
+            "--output",
+            default=None,
+            help="Куда сохранить эмбеддинги (по умолчанию "
+            "RECOMMENDER_MODEL_PATH)",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        model = train_als(
+            factors=options["factors"],
+            iterations=options["iterations"],
+            regularization=options["regularization"],
+            alpha=options["alpha"],
+        )
+        path = options["output"] or get_model_path()
+        save_model(model, path)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Модель обучена за {time.monotonic() - started:.1f} с: "
+                f"{len(model['user_ids'])} пользователей, "
+                f"{len(model['movie_ids'])} фильмов -> {path}"
+            )
+        )
@@ -0,0 +1,76 @@
+# Generated by Django 4.2 on 2026-10-17 15:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0005_delete_rating"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="review",
+            options={
+                "ordering": ["-created_at"],
+                "verbose_name": "Отзыв",
+                "verbose_name_plural": "Отзывы",
+            },
+        ),
+        migrations.CreateModel(
+            name="MovieSimilarity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField(verbose_name="Схожесть")),
+                (
+                    "support",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Общих оценок"
+                    ),
+                ),
+                (
+                    "movie",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="neighbours",
+                        to="movies.movie",
+                        verbose_name="Фильм",
+                    ),
+                ),
+                (
+                    "similar_movie",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="neighbour_of",
+                        to="movies.movie",
+                        verbose_name="Похожий фильм",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Схожесть фильмов",
+                "verbose_name_plural": "Схожесть фильмов",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="moviesimilarity",
+            index=models.Index(
+                fields=["movie", "-score", "-support"],
+                name="movies_sim_movie_score_idx",
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="moviesimilarity",
+            unique_together={("movie", "similar_movie")},
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2 on 2026-10-17 15:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0006_moviesimilarity"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MovieCoRating",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "co_count",
+                    models.IntegerField(
+                        default=0, verbose_name="Общих оценок"
+                    ),
+                ),
+                (
+                    "agree_count",
+                    models.IntegerField(
+                        default=0, verbose_name="Совпавших оценок"
+                    ),
+                ),
+                (
+                    "movie",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="movies.movie",
+                    ),
+                ),
+                (
+                    "other_movie",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="movies.movie",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Совместные оценки",
+                "verbose_name_plural": "Совместные оценки",
+                "unique_together": {("movie", "other_movie")},
+            },
+        ),
+    ]
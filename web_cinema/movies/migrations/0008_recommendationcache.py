@@ -0,0 +1,49 @@
+# Generated by Django 4.2 on 2026-10-17 15:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+        ("movies", "0007_moviecorating"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecommendationCache",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="recommendation_cache",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+                (
+                    "movie_ids",
+                    models.JSONField(
+                        default=list, verbose_name="Фильмы по порядку"
+                    ),
+                ),
+                (
+                    "generation",
+                    models.PositiveIntegerField(
+                        db_index=True, default=0, verbose_name="Поколение"
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Кэш рекомендаций",
+                "verbose_name_plural": "Кэш рекомендаций",
+            },
+        ),
+    ]
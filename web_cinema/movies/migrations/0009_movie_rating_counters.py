@@ -0,0 +1,46 @@
+# Generated by Django 4.2 on 2026-10-17 16:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0008_recommendationcache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movie",
+            name="dislike_count",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Дизлайков"
+            ),
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="like_count",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Лайков"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["-like_count", "-year"],
+                name="movies_movie_popular_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["-year", "-like_count"], name="movies_movie_new_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["-dislike_count"], name="movies_movie_dislikes_idx"
+            ),
+        ),
+    ]
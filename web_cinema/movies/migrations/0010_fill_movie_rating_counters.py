@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-17 16:01
+
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Movie = apps.get_model("movies", "Movie")
+    UserPreferences = apps.get_model("movies", "UserPreferences")
+
+    def count_subquery(through):
+        return Coalesce(
+            Subquery(
+                through.objects.filter(movie_id=OuterRef("pk"))
+                .values("movie_id")
+                .annotate(total=Count("*"))
+                .values("total")
+            ),
+            0,
+        )
+
+    Movie.objects.update(
+        like_count=count_subquery(UserPreferences.liked_movies.through),
+        dislike_count=count_subquery(
+            UserPreferences.disliked_movies.through
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0009_movie_rating_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,135 @@
+# Generated by Django 4.2 on 2026-10-17 16:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def copy_ratings(apps, schema_editor):
+    """Переносит лайки и дизлайки из двух M2M таблиц в Rating"""
+    Rating = apps.get_model("movies", "Rating")
+    UserPreferences = apps.get_model("movies", "UserPreferences")
+
+    values = {}
+    # Если фильм был и в лайках, и в дизлайках, остается лайк
+    for through, value in (
+        (UserPreferences.disliked_movies.through, -1),
+        (UserPreferences.liked_movies.through, 1),
+    ):
+        for user_id, movie_id in through.objects.values_list(
+            "userpreferences__user_id", "movie_id"
+        ):
+            values[user_id, movie_id] = value
+
+    Rating.objects.bulk_create(
+        (
+            Rating(user_id=user_id, movie_id=movie_id, value=value)
+            for (user_id, movie_id), value in values.items()
+        ),
+        batch_size=5000,
+    )
+
+
+def restore_ratings(apps, schema_editor):
+    Rating = apps.get_model("movies", "Rating")
+    UserPreferences = apps.get_model("movies", "UserPreferences")
+
+    prefs_ids = dict(UserPreferences.objects.values_list("user_id", "id"))
+    for through, value in (
+        (UserPreferences.liked_movies.through, 1),
+        (UserPreferences.disliked_movies.through, -1),
+    ):
+        through.objects.bulk_create(
+            (
+                through(
+                    userpreferences_id=prefs_ids[user_id], movie_id=movie_id
+                )
+                for user_id, movie_id in Rating.objects.filter(
+                    value=value, user_id__in=prefs_ids
+                ).values_list("user_id", "movie_id")
+            ),
+            batch_size=5000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("movies", "0010_fill_movie_rating_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Rating",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "value",
+                    models.SmallIntegerField(
+                        choices=[(1, "Нравится"), (-1, "Не нравится")],
+                        verbose_name="Оценка",
+                    ),
+                ),
+                (
+                    "rated_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="Дата оценки",
+                    ),
+                ),
+                (
+                    "movie",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ratings",
+                        to="movies.movie",
+                        verbose_name="Фильм",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ratings",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Оценка",
+                "verbose_name_plural": "Оценки",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="rating",
+            index=models.Index(
+                fields=["movie", "value"], name="movies_rating_movie_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="rating",
+            constraint=models.UniqueConstraint(
+                fields=("user", "movie"), name="movies_rating_user_movie_uniq"
+            ),
+        ),
+        migrations.RunPython(copy_ratings, restore_ratings),
+        migrations.RemoveField(
+            model_name="userpreferences",
+            name="disliked_movies",
+        ),
+        migrations.RemoveField(
+            model_name="userpreferences",
+            name="liked_movies",
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 4.2 on 2026-10-17 16:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0011_rating"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrendingMovie",
+            fields=[
+                (
+                    "movie",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="trending",
+                        serialize=False,
+                        to="movies.movie",
+                        verbose_name="Фильм",
+                    ),
+                ),
+                (
+                    "rank",
+                    models.PositiveIntegerField(
+                        db_index=True, verbose_name="Место"
+                    ),
+                ),
+                ("score", models.FloatField(verbose_name="Рейтинг тренда")),
+                (
+                    "refreshed_at",
+                    models.DateTimeField(verbose_name="Обновлено"),
+                ),
+            ],
+            options={
+                "verbose_name": "Трендовый фильм",
+                "verbose_name_plural": "Трендовые фильмы",
+                "ordering": ["rank"],
+            },
+        ),
+        migrations.CreateModel(
+            name="MovieActivity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("bucket", models.DateTimeField(verbose_name="Час")),
+                (
+                    "likes",
+                    models.IntegerField(default=0, verbose_name="Лайков"),
+                ),
+                (
+                    "dislikes",
+                    models.IntegerField(default=0, verbose_name="Дизлайков"),
+                ),
+                (
+                    "movie",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="activity",
+                        to="movies.movie",
+                        verbose_name="Фильм",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Активность по фильму",
+                "verbose_name_plural": "Активность по фильмам",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="movieactivity",
+            index=models.Index(
+                fields=["bucket"], name="movies_activity_bucket_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="movieactivity",
+            constraint=models.UniqueConstraint(
+                fields=("movie", "bucket"),
+                name="movies_activity_movie_bucket_uniq",
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-17 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0012_trending"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["-year", "-id"], name="movies_movie_year_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["title", "id"], name="movies_movie_title_id_idx"
+            ),
+        ),
+    ]
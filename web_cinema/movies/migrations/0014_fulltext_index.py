@@ -0,0 +1,32 @@
+from django.db import migrations
+
+from movies.fulltext import (
+    FTS_TABLE,
+    install_search_index,
+    uninstall_search_index,
+)
+
+
+def create_index(apps, schema_editor):
+    connection = schema_editor.connection
+    install_search_index(connection)
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+            )
+
+
+def drop_index(apps, schema_editor):
+    uninstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0013_movie_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
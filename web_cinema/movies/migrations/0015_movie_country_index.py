@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-17 16:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0014_fulltext_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["country"], name="movies_movie_country_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2 on 2026-10-17 16:25
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_review_count(apps, schema_editor):
+    Movie = apps.get_model("movies", "Movie")
+    Review = apps.get_model("movies", "Review")
+
+    Movie.objects.update(
+        review_count=Coalesce(
+            Subquery(
+                Review.objects.filter(movie_id=OuterRef("pk"))
+                .values("movie_id")
+                .annotate(total=Count("*"))
+                .values("total")
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0015_movie_country_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movie",
+            name="review_count",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Отзывов"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["movie", "-created_at", "-id"],
+                name="movies_review_feed_idx",
+            ),
+        ),
+        migrations.RunPython(fill_review_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 4.2 on 2026-10-17 18:02
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def _merge_user_rows(model, keep_id, movie_ids, newest_field):
+    """
+    Строки пользователей (оценки или отзывы) переходят на оставленный
+    фильм; если у пользователя они есть у нескольких копий, остается
+    самая свежая
+    """
+    seen, drop, move = set(), [], []
+    for row_id, user_id, movie_id in (
+        model.objects.filter(movie_id__in=movie_ids)
+        .order_by("user_id", f"-{newest_field}", "-id")
+        .values_list("id", "user_id", "movie_id")
+    ):
+        if user_id in seen:
+            drop.append(row_id)
+            continue
+        seen.add(user_id)
+        if movie_id != keep_id:
+            move.append(row_id)
+    model.objects.filter(id__in=drop).delete()
+    model.objects.filter(id__in=move).update(movie_id=keep_id)
+
+
+def _merge_activity(MovieActivity, keep_id, movie_ids):
+    totals = {}
+    for bucket, likes, dislikes in MovieActivity.objects.filter(
+        movie_id__in=movie_ids
+    ).values_list("bucket", "likes", "dislikes"):
+        total = totals.setdefault(bucket, [0, 0])
+        total[0] += likes
+        total[1] += dislikes
+    MovieActivity.objects.filter(movie_id__in=movie_ids).delete()
+    MovieActivity.objects.bulk_create(
+        MovieActivity(
+            movie_id=keep_id, bucket=bucket, likes=likes, dislikes=dislikes
+        )
+        for bucket, (likes, dislikes) in totals.items()
+    )
+
+
+def merge_duplicate_movies(apps, schema_editor):
+    """
+    Копии фильма с одинаковыми названием и годом сливаются в первую:
+    к ней переходят оценки, отзывы, жанры и активность для трендов,
+    счетчики пересчитываются. Совместные оценки и соседи копий
+    удаляются вместе с ними - их пересчитывает build_similarity.
+    Версии каталога поднимаются после миграций, см. movies.signals
+    """
+    Movie = apps.get_model("movies", "Movie")
+    Rating = apps.get_model("movies", "Rating")
+    Review = apps.get_model("movies", "Review")
+    MovieActivity = apps.get_model("movies", "MovieActivity")
+    MovieGenre = Movie.genres.through
+
+    duplicates = (
+        Movie.objects.values("title", "year")
+        .annotate(total=Count("id"))
+        .filter(total__gt=1)
+    )
+    for row in duplicates:
+        movie_ids = list(
+            Movie.objects.filter(title=row["title"], year=row["year"])
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        keep_id, copies = movie_ids[0], movie_ids[1:]
+
+        _merge_user_rows(Rating, keep_id, movie_ids, "rated_at")
+        _merge_user_rows(Review, keep_id, movie_ids, "created_at")
+        _merge_activity(MovieActivity, keep_id, movie_ids)
+        genre_ids = set(
+            MovieGenre.objects.filter(movie_id__in=movie_ids).values_list(
+                "genre_id", flat=True
+            )
+        ) - set(
+            MovieGenre.objects.filter(movie_id=keep_id).values_list(
+                "genre_id", flat=True
+            )
+        )
+        MovieGenre.objects.bulk_create(
+            MovieGenre(movie_id=keep_id, genre_id=genre_id)
+            for genre_id in genre_ids
+        )
+        Movie.objects.filter(id__in=copies).delete()
+
+        ratings = Rating.objects.filter(movie_id=keep_id)
+        Movie.objects.filter(id=keep_id).update(
+            like_count=ratings.filter(value=1).count(),
+            dislike_count=ratings.filter(value=-1).count(),
+            review_count=Review.objects.filter(movie_id=keep_id).count(),
+        )
+
+
+# Отдельно от 0018: в одной транзакции PostgreSQL не дает менять таблицу
+# после удаления и переноса строк
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0016_review_feed"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_movies, migrations.RunPython.noop
+        ),
+    ]
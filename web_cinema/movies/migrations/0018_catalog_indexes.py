@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-17 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0017_merge_duplicate_movies"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["director"], name="movies_movie_director_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="movie",
+            constraint=models.UniqueConstraint(
+                fields=("title", "year"), name="movies_movie_title_year_uniq"
+            ),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.dispatch import Signal
+from django.utils import timezone
 
 
 class Genre(models.Model):
@@ -29,6 +31,16 @@ class Movie(models.Model):
         max_length=300, blank=True, verbose_name="URL изображения"
     )
     genres = models.ManyToManyField(Genre, verbose_name="Жанры")
+    # Денормализованные счетчики, их поддерживают сигналы movies.signals
+    like_count = models.PositiveIntegerField(
+        default=0, verbose_name="Лайков"
+    )
+    dislike_count = models.PositiveIntegerField(
+        default=0, verbose_name="Дизлайков"
+    )
+    review_count = models.PositiveIntegerField(
+        default=0, verbose_name="Отзывов"
+    )
 
     def __str__(self):
         return f"{self.title} ({self.year})"
@@ -36,6 +48,201 @@ class Movie(models.Model):
     class Meta:
         verbose_name = "Фильм"
         verbose_name_plural = "Фильмы"
+        indexes = [
+            models.Index(
+                fields=["-like_count", "-year"],
+                name="movies_movie_popular_idx",
+            ),
+            models.Index(
+                fields=["-year", "-like_count"],
+                name="movies_movie_new_idx",
+            ),
+            models.Index(
+                fields=["-dislike_count"],
+                name="movies_movie_dislikes_idx",
+            ),
+            # Ключи keyset-пагинации каталога, см. movies.pagination
+            models.Index(
+                fields=["-year", "-id"],
+                name="movies_movie_year_id_idx",
+            ),
+            models.Index(
+                fields=["title", "id"],
+                name="movies_movie_title_id_idx",
+            ),
+            # Точный фильтр и фасет по стране, см. movies.filters
+            models.Index(
+                fields=["country"],
+                name="movies_movie_country_idx",
+            ),
+            models.Index(
+                fields=["director"],
+                name="movies_movie_director_idx",
+            ),
+        ]
+        constraints = [
+            # Дубли при импорте отсекает база, см. import_movies_from_csv
+            models.UniqueConstraint(
+                fields=["title", "year"],
+                name="movies_movie_title_year_uniq",
+            ),
+        ]
+
+
+class RatingManager(models.Manager):
+    def set_ratings(self, user_id, values):
+        """
+        Ставит оценки пользователя: values - словарь {movie_id: значение},
+        где 1 - лайк, -1 - дизлайк, 0 - снять оценку.
+        Возвращает список изменений (movie_id, старое, новое) и шлет
+        ratings_changed в той же транзакции
+        """
+        with transaction.atomic():
+            current = dict(
+                self.select_for_update()
+                .filter(user_id=user_id, movie_id__in=list(values))
+                .values_list("movie_id", "value")
+            )
+            changes = [
+                (movie_id, current.get(movie_id, 0), value)
+                for movie_id, value in values.items()
+                if current.get(movie_id, 0) != value
+            ]
+            if not changes:
+                return []
+
+            now = timezone.now()
+            removed = [m for m, old, new in changes if new == 0]
+            if removed:
+                self.filter(user_id=user_id, movie_id__in=removed).delete()
+            for value in (Rating.LIKE, Rating.DISLIKE):
+                updated = [
+                    m for m, old, new in changes if old and new == value
+                ]
+                if updated:
+                    self.filter(user_id=user_id, movie_id__in=updated).update(
+                        value=value, rated_at=now
+                    )
+            self.bulk_create(
+                Rating(
+                    user_id=user_id, movie_id=m, value=new, rated_at=now
+                )
+                for m, old, new in changes
+                if not old
+            )
+
+            ratings_changed.send(
+                sender=self.model, user_id=user_id, changes=changes
+            )
+        return changes
+
+
+class Rating(models.Model):
+    LIKE = 1
+    DISLIKE = -1
+    VALUE_CHOICES = [
+        (LIKE, "Нравится"),
+        (DISLIKE, "Не нравится"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="ratings",
+        verbose_name="Пользователь",
+    )
+    movie = models.ForeignKey(
+        Movie,
+        on_delete=models.CASCADE,
+        related_name="ratings",
+        verbose_name="Фильм",
+    )
+    value = models.SmallIntegerField(
+        choices=VALUE_CHOICES, verbose_name="Оценка"
+    )
+    rated_at = models.DateTimeField(
+        default=timezone.now, verbose_name="Дата оценки"
+    )
+
+    objects = RatingManager()
+
+    class Meta:
+        verbose_name = "Оценка"
+        verbose_name_plural = "Оценки"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "movie"], name="movies_rating_user_movie_uniq"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["movie", "value"], name="movies_rating_movie_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.movie_id}: {self.value:+d}"
+
+
+# Шлется после любого изменения оценок через Rating.objects.set_ratings:
+# user_id и changes - список (movie_id, старое, новое значение)
+ratings_changed = Signal()
+
+
+class RatedMovies:
+    """
+    Совместимость со старыми M2M liked_movies/disliked_movies:
+    чтение как у менеджера связи, запись через Rating.objects.set_ratings
+    """
+
+    def __init__(self, user_id, value):
+        self.user_id = user_id
+        self.value = value
+
+    def get_queryset(self):
+        return Movie.objects.filter(
+            ratings__user_id=self.user_id, ratings__value=self.value
+        )
+
+    def __getattr__(self, name):
+        return getattr(self.get_queryset(), name)
+
+    def __iter__(self):
+        return iter(self.get_queryset())
+
+    @staticmethod
+    def _ids(movies):
+        return [getattr(movie, "pk", movie) for movie in movies]
+
+    def add(self, *movies):
+        Rating.objects.set_ratings(
+            self.user_id, dict.fromkeys(self._ids(movies), self.value)
+        )
+
+    def remove(self, *movies):
+        rated = Rating.objects.filter(
+            user_id=self.user_id,
+            movie_id__in=self._ids(movies),
+            value=self.value,
+        ).values_list("movie_id", flat=True)
+        Rating.objects.set_ratings(self.user_id, dict.fromkeys(rated, 0))
+
+    def clear(self):
+        rated = Rating.objects.filter(
+            user_id=self.user_id, value=self.value
+        ).values_list("movie_id", flat=True)
+        Rating.objects.set_ratings(self.user_id, dict.fromkeys(rated, 0))
+
+    def set(self, movies):
+        movie_ids = set(self._ids(movies))
+        rated = set(
+            Rating.objects.filter(
+                user_id=self.user_id, value=self.value
+            ).values_list("movie_id", flat=True)
+        )
+        values = dict.fromkeys(rated - movie_ids, 0)
+        values.update(dict.fromkeys(movie_ids - rated, self.value))
+        Rating.objects.set_ratings(self.user_id, values)
 
 
 class UserPreferences(models.Model):
@@ -47,18 +254,14 @@ class UserPreferences(models.Model):
     favorite_genres = models.ManyToManyField(
         Genre, blank=True, verbose_name="Любимые жанры"
     )
-    liked_movies = models.ManyToManyField(
-        Movie,
-        blank=True,
-        related_name="liked_by",
-        verbose_name="Понравившиеся фильмы",
-    )
-    disliked_movies = models.ManyToManyField(
-        Movie,
-        blank=True,
-        related_name="disliked_by",
-        verbose_name="Не понравившиеся фильмы",
-    )
+
+    @property
+    def liked_movies(self):
+        return RatedMovies(self.user_id, Rating.LIKE)
+
+    @property
+    def disliked_movies(self):
+        return RatedMovies(self.user_id, Rating.DISLIKE)
 
     def __str__(self):
         return f"{self.user.phone} preferences"
@@ -84,6 +287,159 @@ class Review(models.Model):
             "movie",
         ]
         ordering = ["-created_at"]
+        indexes = [
+            # Ключ keyset-пагинации ленты отзывов, см. movies.reviews
+            models.Index(
+                fields=["movie", "-created_at", "-id"],
+                name="movies_review_feed_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user.phone} - {self.movie.title}"
+
+
+class MovieCoRating(models.Model):
+    """Счетчики совместных оценок пары фильмов (хранятся в обе стороны)"""
+
+    movie = models.ForeignKey(
+        Movie, on_delete=models.CASCADE, related_name="+"
+    )
+    other_movie = models.ForeignKey(
+        Movie, on_delete=models.CASCADE, related_name="+"
+    )
+    co_count = models.IntegerField(default=0, verbose_name="Общих оценок")
+    agree_count = models.IntegerField(
+        default=0, verbose_name="Совпавших оценок"
+    )
+
+    class Meta:
+        verbose_name = "Совместные оценки"
+        verbose_name_plural = "Совместные оценки"
+        unique_together = [
+            "movie",
+            "other_movie",
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.movie_id} & {self.other_movie_id}: "
+            f"{self.agree_count}/{self.co_count}"
+        )
+
+
+class MovieSimilarity(models.Model):
+    """Предрасчитанные ближайшие соседи фильма (top-K по схожести)"""
+
+    movie = models.ForeignKey(
+        Movie,
+        on_delete=models.CASCADE,
+        related_name="neighbours",
+        verbose_name="Фильм",
+    )
+    similar_movie = models.ForeignKey(
+        Movie,
+        on_delete=models.CASCADE,
+        related_name="neighbour_of",
+        verbose_name="Похожий фильм",
+    )
+    score = models.FloatField(verbose_name="Схожесть")
+    support = models.PositiveIntegerField(
+        default=0, verbose_name="Общих оценок"
+    )
+
+    class Meta:
+        verbose_name = "Схожесть фильмов"
+        verbose_name_plural = "Схожесть фильмов"
+        unique_together = [
+            "movie",
+            "similar_movie",
+        ]
+        indexes = [
+            models.Index(
+                fields=["movie", "-score", "-support"],
+                name="movies_sim_movie_score_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.movie_id} ~ {self.similar_movie_id}: {self.score:.2f}"
+
+
+class RecommendationCache(models.Model):
+    """Предрасчитанные рекомендации пользователя (пишет ночной батч)"""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="recommendation_cache",
+        verbose_name="Пользователь",
+    )
+    movie_ids = models.JSONField(
+        default=list, verbose_name="Фильмы по порядку"
+    )
+    generation = models.PositiveIntegerField(
+        default=0, db_index=True, verbose_name="Поколение"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Кэш рекомендаций"
+        verbose_name_plural = "Кэш рекомендаций"
+
+    def __str__(self):
+        return f"{self.user_id}: поколение {self.generation}"
+
+
+class MovieActivity(models.Model):
+    """Почасовые суммы лайков и дизлайков фильма для трендов"""
+
+    movie = models.ForeignKey(
+        Movie,
+        on_delete=models.CASCADE,
+        related_name="activity",
+        verbose_name="Фильм",
+    )
+    bucket = models.DateTimeField(verbose_name="Час")
+    likes = models.IntegerField(default=0, verbose_name="Лайков")
+    dislikes = models.IntegerField(default=0, verbose_name="Дизлайков")
+
+    class Meta:
+        verbose_name = "Активность по фильму"
+        verbose_name_plural = "Активность по фильмам"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["movie", "bucket"],
+                name="movies_activity_movie_bucket_uniq",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["bucket"], name="movies_activity_bucket_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.movie_id} @ {self.bucket:%Y-%m-%d %H}:00"
+
+
+class TrendingMovie(models.Model):
+    """Небольшая таблица top-N трендов, ее пересчитывает refresh_trending"""
+
+    movie = models.OneToOneField(
+        Movie,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="trending",
+        verbose_name="Фильм",
+    )
+    rank = models.PositiveIntegerField(db_index=True, verbose_name="Место")
+    score = models.FloatField(verbose_name="Рейтинг тренда")
+    refreshed_at = models.DateTimeField(verbose_name="Обновлено")
+
+    class Meta:
+        verbose_name = "Трендовый фильм"
+        verbose_name_plural = "Трендовые фильмы"
+        ordering = ["rank"]
 
     def __str__(self):
-        return f"{self.user.phone} - {self.movie.title}"
\ No newline at end of file
+        return f"{self.rank}. {self.movie_id} ({self.score:.2f})"
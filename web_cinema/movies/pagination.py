@@ -0,0 +1,106 @@
+"""
+Keyset-пагинация каталога.
+
+Вместо OFFSET следующая страница начинается строго после последнего
+фильма предыдущей: WHERE (year, id) < (:year, :id) ORDER BY year, id.
+Стоимость страницы не зависит от ее номера и размера каталога.
+Курсор - base64 от JSON с ключом последнего фильма.
+"""
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.db.models import Q
+
+
+# Поля, которые нужны карточке фильма в списке
+CARD_FIELDS = ("id", "title", "year", "director", "image_url")
+
+# Порядок -> (поле, по убыванию ли, тип значения в курсоре);
+# id всегда добивает ключ до уникального
+KEYSET_ORDERINGS = {
+    "year": ("year", True, int),
+    "title": ("title", False, str),
+    # Релевантность, аннотация movies.fulltext.search_movies
+    "rank": ("rank", True, float),
+}
+DEFAULT_ORDERING = "year"
+MAX_PAGE_SIZE = 100
+
+
+def card_queryset(queryset):
+    """
+    Только поля карточки. Жанры подгружаются одним запросом только для
+    карточек, которых нет в кэше, см. movies.cards
+    """
+    return queryset.only(*CARD_FIELDS)
+
+
+def encode_cursor(movie, ordering):
+    field = KEYSET_ORDERINGS[ordering][0]
+    data = json.dumps([getattr(movie, field), movie.id]).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(cursor, ordering):
+    """Возвращает (значение, id) или None для битого курсора"""
+    value_type = KEYSET_ORDERINGS[ordering][2]
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, movie_id = json.loads(data)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    if not isinstance(value, value_type) or not isinstance(movie_id, int):
+        return None
+    return value, movie_id
+
+
+def get_page_size(value):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return settings.MOVIES_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def paginate_keyset(queryset, ordering=None, cursor=None, page_size=None):
+    """
+    Возвращает (фильмы страницы, курсор следующей страницы или None).
+    Читается на одну строку больше страницы, чтобы узнать,
+    есть ли продолжение, без COUNT
+    """
+    ranked = "rank" in queryset.query.annotations
+    if ordering not in KEYSET_ORDERINGS or (
+        ordering == "rank" and not ranked
+    ):
+        ordering = "rank" if ranked else DEFAULT_ORDERING
+    page_size = page_size or settings.MOVIES_PAGE_SIZE
+    field, descending, _ = KEYSET_ORDERINGS[ordering]
+    prefix = "-" if descending else ""
+    queryset = queryset.order_by(f"{prefix}{field}", f"{prefix}id")
+
+    key = decode_cursor(cursor, ordering) if cursor else None
+    if key is not None:
+        value, movie_id = key
+        lookup = "lt" if descending else "gt"
+        queryset = queryset.filter(
+            Q(**{f"{field}__{lookup}": value})
+            | Q(**{field: value, f"id__{lookup}": movie_id})
+        )
+
+    movies = list(queryset[: page_size + 1])
+    if len(movies) <= page_size:
+        return movies, None
+    movies = movies[:page_size]
+    return movies, encode_cursor(movies[-1], ordering)
+
+
+def movie_cards(queryset, params):
+    """Страница карточек по GET-параметрам cursor, order и page_size"""
+    return paginate_keyset(
+        card_queryset(queryset),
+        ordering=params.get("order"),
+        cursor=params.get("cursor"),
+        page_size=get_page_size(params.get("page_size")),
+    )
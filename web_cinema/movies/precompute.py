@@ -0,0 +1,215 @@
+"""
+Ночной предрасчет рекомендаций для всех пользователей с предпочтениями.
+
+Главный процесс одним набором запросов читает оценки, любимые жанры и
+каталог, ранжирование идет без обращений к базе (при необходимости в
+пуле процессов), результат пишется в RecommendationCache пачками.
+"""
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from movies.models import (
+    Movie,
+    Rating,
+    RecommendationCache,
+    UserPreferences,
+)
+from movies.caching import bump_namespace
+from movies.recommender import MODEL_NAMESPACE, recommend_movie_ids
+
+
+PRECOMPUTE_LIMIT = 30
+PRECOMPUTE_CHUNK_SIZE = 1000
+
+
+def load_profiles():
+    """
+    Все пользователи с предпочтениями: их оценки и любимые жанры
+    """
+    profiles = {
+        user_id: {"user_id": user_id, "rated": set(), "genres": set()}
+        for user_id in UserPreferences.objects.values_list(
+            "user_id", flat=True
+        )
+    }
+    for user_id, movie_id in Rating.objects.filter(
+        user_id__in=UserPreferences.objects.values("user_id")
+    ).values_list("user_id", "movie_id"):
+        profiles[user_id]["rated"].add(movie_id)
+    for user_id, genre_id in (
+        UserPreferences.favorite_genres.through.objects.values_list(
+            "userpreferences__user_id", "genre_id"
+        )
+    ):
+        profiles[user_id]["genres"].add(genre_id)
+    return list(profiles.values())
+
+
+def load_catalog():
+    """
+    Фильмы каждого жанра и общий список, отсортированные
+    по популярности
+    """
+    popular = list(
+        Movie.objects.order_by("-like_count", "-year", "id")
+        .values_list("id", "like_count")
+    )
+    rank = {
+        movie_id: position for position, (movie_id, _) in enumerate(popular)
+    }
+
+    by_genre = defaultdict(list)
+    for movie_id, genre_id in Movie.genres.through.objects.values_list(
+        "movie_id", "genre_id"
+    ):
+        by_genre[genre_id].append(movie_id)
+    for movie_ids in by_genre.values():
+        movie_ids.sort(key=rank.__getitem__)
+
+    return {
+        "by_genre": dict(by_genre),
+        "rank": rank,
+        "popular": [movie_id for movie_id, likes in popular if likes > 0],
+    }
+
+
+def rank_profile(profile, catalog, limit):
+    """
+    Рекомендации одного пользователя: эмбеддинги ALS, а для
+    неизвестных модели - любимые жанры и популярные фильмы
+    """
+    rated = profile["rated"]
+    movie_ids = recommend_movie_ids(profile["user_id"], rated, limit)
+    if movie_ids:
+        return movie_ids
+
+    seen = set(rated)
+    candidates = sorted(
+        {
+            movie_id
+            for genre_id in profile["genres"]
+            for movie_id in catalog["by_genre"].get(genre_id, [])
+        },
+        key=catalog["rank"].__getitem__,
+    )
+    result = []
+    for movie_id in candidates + catalog["popular"]:
+        if movie_id not in seen:
+            seen.add(movie_id)
+            result.append(movie_id)
+            if len(result) == limit:
+                break
+    return result
+
+
+_worker_state = {}
+
+
+def _init_worker(catalog, limit):
+    _worker_state["catalog"] = catalog
+    _worker_state["limit"] = limit
+
+
+def _rank_chunk(profiles):
+    catalog = _worker_state["catalog"]
+    limit = _worker_state["limit"]
+    return [
+        (profile["user_id"], rank_profile(profile, catalog, limit))
+        for profile in profiles
+    ]
+
+
+def _write_chunk(results, generation):
+    now = timezone.now()
+    existing = RecommendationCache.objects.in_bulk(
+        [user_id for user_id, _ in results]
+    )
+    to_create, to_update = [], []
+    for user_id, movie_ids in results:
+        row = existing.get(user_id)
+        if row is None:
+            to_create.append(
+                RecommendationCache(
+                    user_id=user_id,
+                    movie_ids=movie_ids,
+                    generation=generation,
+                )
+            )
+        else:
+            row.movie_ids = movie_ids
+            row.generation = generation
+            row.updated_at = now
+            to_update.append(row)
+
+    RecommendationCache.objects.bulk_create(to_create)
+    RecommendationCache.objects.bulk_update(
+        to_update, ["movie_ids", "generation", "updated_at"]
+    )
+
+
+def precompute_recommendations(
+    limit=PRECOMPUTE_LIMIT, workers=1, chunk_size=PRECOMPUTE_CHUNK_SIZE
+):
+    """
+    Пересчитывает RecommendationCache для всех пользователей.
+    Возвращает (номер поколения, число пользователей)
+    """
+    profiles = load_profiles()
+    catalog = load_catalog()
+    chunks = [
+        profiles[start:start + chunk_size]
+        for start in range(0, len(profiles), chunk_size)
+    ]
+    generation = (
+        RecommendationCache.objects.aggregate(Max("generation"))[
+            "generation__max"
+        ]
+        or 0
+    ) + 1
+
+    if workers > 1:
+        # Дочерние процессы не должны наследовать открытые соединения.
+        # Внутри транзакции закрыть их нельзя - там их спасает то, что
+        # процессы пула к базе не ходят и выходят через os._exit
+        for connection in connections.all():
+            if not connection.in_atomic_block:
+                connection.close()
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+            initargs=(catalog, limit),
+        )
+        with pool:
+            ranked = pool.map(_rank_chunk, chunks)
+            for results in ranked:
+                with transaction.atomic():
+                    _write_chunk(results, generation)
+    else:
+        _init_worker(catalog, limit)
+        for chunk in chunks:
+            with transaction.atomic():
+                _write_chunk(_rank_chunk(chunk), generation)
+
+    # Пользователи, у которых больше нет предпочтений
+    RecommendationCache.objects.filter(generation__lt=generation).delete()
+    transaction.on_commit(lambda: bump_namespace(MODEL_NAMESPACE))
+    return generation, len(profiles)
+
+
+def discard_from_cache(user_id, movie_ids):
+    """
+    Убирает только что оцененные фильмы из кэша рекомендаций,
+    чтобы до следующего пересчета они не показывались снова
+    """
+    movie_ids = set(movie_ids)
+    row = RecommendationCache.objects.filter(user_id=user_id).first()
+    if row is None or not movie_ids & set(row.movie_ids):
+        return
+    row.movie_ids = [m for m in row.movie_ids if m not in movie_ids]
+    row.save(update_fields=["movie_ids"])
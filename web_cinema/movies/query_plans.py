@@ -0,0 +1,74 @@
+"""
+Планы запросов страниц каталога.
+
+Для запросов главной, каталога с фильтрами, страницы фильма и ленты
+отзывов берется EXPLAIN (EXPLAIN QUERY PLAN в SQLite) и ищутся полные
+проходы по таблице: "SCAN <таблица>" без индекса в SQLite и
+"Seq Scan on <таблица>" в PostgreSQL. На маленькой базе PostgreSQL
+может выбрать Seq Scan и при наличии индекса - планы стоит смотреть на
+данных, близких к рабочим.
+"""
+import re
+
+from movies.filters import filter_movies
+from movies.models import Movie, Review
+from movies.pagination import card_queryset
+from movies.utils import _new_ids, _popular_ids
+
+
+# Проход по индексу ("SCAN t USING INDEX i") полным не считается
+SQLITE_SCAN_RE = re.compile(r"\bSCAN (?:TABLE )?(\w+)(?P<using> USING)?")
+POSTGRES_SCAN_RE = re.compile(r"\bSeq Scan on (\w+)")
+
+
+def _catalog(params, ordering=("-year", "-id")):
+    return card_queryset(filter_movies(params)).order_by(*ordering)[:21]
+
+
+def catalog_querysets():
+    """{имя: queryset} - запросы страниц на значениях из базы"""
+    movie = Movie.objects.order_by("id").first() or Movie(
+        id=0, year=2000, country="", director=""
+    )
+    return {
+        "home: популярные": _popular_ids(8),
+        "home: новые": _new_ids(6),
+        "home: тренды": Movie.objects.filter(trending__isnull=False)
+        .order_by("trending__rank")
+        .values_list("id", flat=True)[:8],
+        "home: тренды без таблицы": Movie.objects.filter(year__gte=2020)
+        .order_by("-like_count", "-year")
+        .values_list("id", flat=True)[:8],
+        "movie_list": _catalog({}),
+        "movie_list: по названию": _catalog({}, ("title", "id")),
+        "movie_list: год": _catalog({"year": str(movie.year)}),
+        "movie_list: десятилетие": _catalog(
+            {"decade": str(movie.year // 10 * 10)}
+        ),
+        "movie_list: страна": _catalog({"country": movie.country}),
+        "movie_list: режиссер": _catalog({"director": movie.director}),
+        "movie_detail": Movie.objects.filter(id=movie.id),
+        "movie_reviews": Review.objects.filter(movie_id=movie.id)
+        .select_related("user")
+        .order_by("-created_at", "-id")[:11],
+    }
+
+
+def full_scans(plan):
+    """Таблицы, которые план читает целиком"""
+    scans = {
+        match.group(1)
+        for match in SQLITE_SCAN_RE.finditer(plan)
+        if not match.group("using")
+    }
+    scans.update(POSTGRES_SCAN_RE.findall(plan))
+    return sorted(scans)
+
+
+def explain_catalog():
+    """Список (имя, план, таблицы с полным проходом)"""
+    report = []
+    for name, queryset in catalog_querysets().items():
+        plan = queryset.explain()
+        report.append((name, plan, full_scans(plan)))
+    return report
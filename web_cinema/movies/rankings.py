@@ -0,0 +1,139 @@
+"""
+Ранжированные списки фильмов с кэшем stale-while-revalidate.
+
+В кэше лежат id фильмов списка и момент, до которого список свежий.
+После мягкого TTL (MOVIES_RANKING_SOFT_TTL) первый запрос берет
+блокировку через cache.add и пересчитывает список в фоновом потоке, а
+все запросы, включая его самого, получают старый список. Блокировка не
+дает нескольким воркерам пересчитывать одно и то же. Жесткий TTL
+(MOVIES_RANKING_HARD_TTL) - время жизни записи: без нее список
+считается синхронно под той же блокировкой, остальные запросы ждут
+результат до RANKING_WAIT секунд. Записи фильмов и оценок помечают
+затронутые списки устаревшими (см. movies.signals): их пересчитывает
+фон, а запросы до тех пор получают старые id. Пересчет, изменивший
+список, поднимает версию RANKINGS - иначе главная, закэшированная по
+ETag, так и показывала бы старый список.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from movies.conditional import bump_rankings_version
+from movies.models import Movie
+
+
+# Сколько секунд держится блокировка, если пересчет упал молча
+RANKING_LOCK_TIMEOUT = 60
+# Сколько секунд ждать чужой пересчет, когда записи нет совсем, и как
+# часто ее проверять
+RANKING_WAIT = 1.0
+RANKING_POLL = 0.05
+
+
+def _key(name):
+    return f"movies:ranking:{name}"
+
+
+def _lock_key(name):
+    return f"movies:ranking:{name}:lock"
+
+
+def _compute(name, limit, compute):
+    ids = list(compute(limit))
+    previous = cache.get(_key(name))
+    cache.set(
+        _key(name),
+        {
+            "ids": ids,
+            "limit": limit,
+            "fresh_until": time.time() + settings.MOVIES_RANKING_SOFT_TTL,
+        },
+        settings.MOVIES_RANKING_HARD_TTL,
+    )
+    # limit не меньше прежнего, так что сравнивается начало списка
+    if previous is not None and previous["ids"] != ids[:previous["limit"]]:
+        bump_rankings_version()
+    return ids
+
+
+def _refresh(name, limit, compute):
+    try:
+        _compute(name, limit, compute)
+    finally:
+        cache.delete(_lock_key(name))
+
+
+def _refresh_in_background(name, limit, compute):
+    try:
+        _refresh(name, limit, compute)
+    finally:
+        # У потока свои соединения с базой, Django их сам не закроет
+        connections.close_all()
+
+
+def _wait_for_entry(name, limit):
+    deadline = time.monotonic() + RANKING_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(RANKING_POLL)
+        entry = cache.get(_key(name))
+        if entry is not None and entry["limit"] >= limit:
+            return entry
+    return None
+
+
+def ranked_ids(name, limit, compute):
+    """
+    id первых limit фильмов списка name. compute(limit) возвращает
+    id по порядку; список считается на максимальный запрошенный limit,
+    меньшие берут его начало
+    """
+    entry = cache.get(_key(name))
+    if entry is None or entry["limit"] < limit:
+        size = max(limit, entry["limit"]) if entry else limit
+        if cache.add(_lock_key(name), True, RANKING_LOCK_TIMEOUT):
+            try:
+                return _compute(name, size, compute)[:limit]
+            finally:
+                cache.delete(_lock_key(name))
+        # Список уже считает другой запрос
+        entry = _wait_for_entry(name, limit)
+        if entry is None:
+            return list(compute(limit))
+        return entry["ids"][:limit]
+
+    if entry["fresh_until"] <= time.time() and cache.add(
+        _lock_key(name), True, RANKING_LOCK_TIMEOUT
+    ):
+        if settings.MOVIES_RANKING_BACKGROUND_REFRESH:
+            threading.Thread(
+                target=_refresh_in_background,
+                args=(name, entry["limit"], compute),
+                daemon=True,
+            ).start()
+        else:
+            _refresh(name, entry["limit"], compute)
+    return entry["ids"][:limit]
+
+
+def ranked_movies(name, limit, compute):
+    """Фильмы списка name по порядку, одним запросом по id"""
+    ids = ranked_ids(name, limit, compute)
+    movies = Movie.objects.in_bulk(ids)
+    return [movies[movie_id] for movie_id in ids if movie_id in movies]
+
+
+def invalidate_ranking(*names):
+    """
+    Помечает списки names устаревшими: следующий запрос начнет
+    пересчет, а пока получит старые id. Записи не удаляются, иначе
+    после каждой оценки запросы считали бы список синхронно
+    """
+    entries = cache.get_many([_key(name) for name in names])
+    stale = {
+        key: {**entry, "fresh_until": 0} for key, entry in entries.items()
+    }
+    if stale:
+        cache.set_many(stale, settings.MOVIES_RANKING_HARD_TTL)
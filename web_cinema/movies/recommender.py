@@ -0,0 +1,218 @@
+"""
+Матричная факторизация для персональных рекомендаций.
+
+Модель - implicit ALS (Hu, Koren, Volinsky): лайк - предпочтение 1 с
+уверенностью 1 + alpha, дизлайк - явное предпочтение 0 с уверенностью
+1 + alpha * dislike_weight, остальные фильмы - предпочтение 0 с
+уверенностью 1. Обучение запускается командой train_recommender,
+эмбеддинги хранятся в .npz файле в float32.
+"""
+import os
+import threading
+
+import numpy as np
+
+from django.conf import settings
+
+from movies.caching import bump_namespace
+from movies.similarity import load_rating_matrix
+
+
+ALS_FACTORS = 32
+ALS_ITERATIONS = 10
+ALS_REGULARIZATION = 0.1
+ALS_ALPHA = 20.0
+ALS_DISLIKE_WEIGHT = 0.5
+# Шагов сопряженных градиентов на одну половину итерации ALS
+ALS_CG_STEPS = 3
+# Сколько ненулевых элементов обрабатывается за раз
+ALS_CHUNK_NNZ = 1 << 18
+
+
+def _weighted_dots(confidence, rows, fixed, solved, max_nnz):
+    """(c_ui - 1) * <y_i, x_u> для каждой ненулевой ячейки confidence"""
+    dots = np.empty(confidence.nnz)
+    for lo in range(0, confidence.nnz, max_nnz):
+        hi = min(lo + max_nnz, confidence.nnz)
+        dots[lo:hi] = np.einsum(
+            "nf,nf->n",
+            fixed[confidence.indices[lo:hi]],
+            solved[rows[lo:hi]],
+        )
+    return confidence.data * dots
+
+
+def _als_step(
+    confidence, targets, fixed, solved, regularization, cg_steps, max_nnz
+):
+    """
+    Приближенно решает для всех строк confidence (C - I) систему
+    (Y^T Y + Y^T (C_u - I) Y + lambda I) x_u = Y^T C_u p_u,
+    где Y = fixed, а targets = C * P.
+
+    Вместо f x f систем на каждого пользователя - несколько шагов
+    сопряженных градиентов сразу для всех строк, начиная с решения
+    прошлой итерации: один шаг стоит O(nnz * f)
+    """
+    factors = fixed.shape[1]
+    gram = fixed.T @ fixed + regularization * np.eye(factors)
+    rows = np.repeat(
+        np.arange(confidence.shape[0]), np.diff(confidence.indptr)
+    )
+
+    def apply(vectors):
+        weighted = confidence.copy()
+        weighted.data = _weighted_dots(
+            confidence, rows, fixed, vectors, max_nnz
+        )
+        return vectors @ gram + weighted @ fixed
+
+    solved = solved.copy()
+    residual = targets @ fixed - apply(solved)
+    direction = residual.copy()
+    norm = np.einsum("nf,nf->n", residual, residual)
+    for _ in range(cg_steps):
+        product = apply(direction)
+        curvature = np.einsum("nf,nf->n", direction, product)
+        step = np.divide(
+            norm, curvature, out=np.zeros_like(norm), where=curvature > 0
+        )
+        solved += step[:, None] * direction
+        residual -= step[:, None] * product
+        new_norm = np.einsum("nf,nf->n", residual, residual)
+        beta = np.divide(
+            new_norm, norm, out=np.zeros_like(norm), where=norm > 0
+        )
+        direction = residual + beta[:, None] * direction
+        norm = new_norm
+
+    return solved
+
+
+def train_als(
+    factors=ALS_FACTORS,
+    iterations=ALS_ITERATIONS,
+    regularization=ALS_REGULARIZATION,
+    alpha=ALS_ALPHA,
+    dislike_weight=ALS_DISLIKE_WEIGHT,
+    cg_steps=ALS_CG_STEPS,
+    max_nnz=ALS_CHUNK_NNZ,
+    seed=0,
+):
+    """
+    Обучает ALS на лайках и дизлайках.
+    Возвращает словарь массивов для save_model
+    """
+    user_ids, movie_ids, likes, dislikes = load_rating_matrix()
+
+    # C - I: alpha для лайков, alpha * dislike_weight для дизлайков
+    confidence = (alpha * likes + alpha * dislike_weight * dislikes).tocsr()
+    # C * P: предпочтение 1 только у лайков
+    targets = ((1 + alpha) * likes).tocsr()
+    confidence_t = confidence.T.tocsr()
+    targets_t = targets.T.tocsr()
+
+    rng = np.random.default_rng(seed)
+    user_factors = rng.normal(0, 0.01, (len(user_ids), factors))
+    item_factors = rng.normal(0, 0.01, (len(movie_ids), factors))
+
+    for _ in range(iterations):
+        user_factors = _als_step(
+            confidence,
+            targets,
+            item_factors,
+            user_factors,
+            regularization,
+            cg_steps,
+            max_nnz,
+        )
+        item_factors = _als_step(
+            confidence_t,
+            targets_t,
+            user_factors,
+            item_factors,
+            regularization,
+            cg_steps,
+            max_nnz,
+        )
+
+    return {
+        "user_ids": user_ids,
+        "movie_ids": movie_ids,
+        "user_factors": user_factors.astype(np.float32),
+        "item_factors": item_factors.astype(np.float32),
+    }
+
+
+# Пространство кэша, которое устаревает с новой моделью, см. movies.caching
+MODEL_NAMESPACE = "recommender"
+
+
+def get_model_path():
+    return str(settings.RECOMMENDER_MODEL_PATH)
+
+
+def save_model(model, path=None):
+    path = path or get_model_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Пишем во временный файл, чтобы воркеры не прочитали половину
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **model)
+    os.replace(tmp_path, path)
+    bump_namespace(MODEL_NAMESPACE)
+
+
+_model_lock = threading.Lock()
+_loaded = {"path": None, "mtime": None, "model": None}
+
+
+def load_model():
+    """
+    Загружает эмбеддинги один раз на процесс и перечитывает файл,
+    когда команда обучения его заменит
+    """
+    path = get_model_path()
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+
+    with _model_lock:
+        if _loaded["path"] != path or _loaded["mtime"] != mtime:
+            with np.load(path) as data:
+                _loaded["model"] = {key: data[key] for key in data.files}
+            _loaded["path"] = path
+            _loaded["mtime"] = mtime
+        return _loaded["model"]
+
+
+def recommend_movie_ids(user_id, rated_movie_ids, limit):
+    """
+    Скоринг всего каталога одним умножением матрицы на вектор.
+    Возвращает id фильмов по убыванию оценки или None,
+    если модели нет или пользователя не было при обучении
+    """
+    model = load_model()
+    if model is None:
+        return None
+
+    user_ids = model["user_ids"]
+    row = np.searchsorted(user_ids, user_id)
+    if row >= len(user_ids) or user_ids[row] != user_id:
+        return None
+
+    movie_ids = model["movie_ids"]
+    scores = model["item_factors"] @ model["user_factors"][row]
+
+    rated = np.unique(np.asarray(list(rated_movie_ids), dtype=np.int64))
+    positions = np.searchsorted(movie_ids, rated)
+    positions = positions[positions < len(movie_ids)]
+    positions = positions[np.isin(movie_ids[positions], rated)]
+    scores[positions] = -np.inf
+
+    limit = min(limit, len(movie_ids) - len(positions))
+    if limit <= 0:
+        return []
+    top = np.argpartition(-scores, limit - 1)[:limit]
+    top = top[np.argsort(-scores[top])]
+    return [int(movie_id) for movie_id in movie_ids[top]]
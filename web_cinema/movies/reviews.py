@@ -0,0 +1,64 @@
+"""
+Лента отзывов фильма с keyset-пагинацией.
+
+Отзывы идут от новых к старым по ключу (created_at, id): следующая
+страница начинается строго после последнего отзыва предыдущей и читается
+по индексу (movie, -created_at, -id), так что стоимость страницы не
+зависит от ее номера и числа отзывов. Курсор - base64 от JSON
+[created_at в ISO 8601, id].
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+from movies.models import Review
+
+
+REVIEWS_PAGE_SIZE = 10
+
+
+def encode_review_cursor(review):
+    data = json.dumps([review.created_at.isoformat(), review.id]).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_review_cursor(cursor):
+    """Возвращает (created_at, id) или None для битого курсора"""
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, review_id = json.loads(data)
+        created_at = datetime.fromisoformat(created_at)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    if not isinstance(review_id, int):
+        return None
+    return created_at, review_id
+
+
+def review_page(movie_id, cursor=None, page_size=REVIEWS_PAGE_SIZE):
+    """
+    Возвращает (отзывы страницы, курсор следующей страницы или None).
+    Читается на одну строку больше страницы, чтобы узнать,
+    есть ли продолжение, без COUNT
+    """
+    queryset = (
+        Review.objects.filter(movie_id=movie_id)
+        .select_related("user")
+        .order_by("-created_at", "-id")
+    )
+    key = decode_review_cursor(cursor) if cursor else None
+    if key is not None:
+        created_at, review_id = key
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at)
+            | Q(created_at=created_at, id__lt=review_id)
+        )
+
+    reviews = list(queryset[: page_size + 1])
+    if len(reviews) <= page_size:
+        return reviews, None
+    reviews = reviews[:page_size]
+    return reviews, encode_review_cursor(reviews[-1])
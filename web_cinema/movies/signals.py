@@ -0,0 +1,135 @@
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from movies.conditional import bump_catalog_version
+from movies.counters import shift_rating_counters, shift_review_count
+from movies.fulltext import install_search_index
+from movies.models import Genre, Movie, Rating, Review, ratings_changed
+from movies.precompute import discard_from_cache
+from movies.rankings import invalidate_ranking
+from movies.similarity import apply_rating_changes
+from movies.trending import record_rating_changes
+from movies.viewer import bump_viewer_version
+
+
+User = get_user_model()
+
+
+@receiver(ratings_changed, sender=Rating)
+def update_rating_aggregates(sender, user_id, changes, **kwargs):
+    """
+    Обновляет счетчики фильмов, кэш рекомендаций и схожесть.
+    Сигнал шлется внутри транзакции set_ratings, так что все обновления
+    атомарны вместе с самими оценками. Активность для трендов
+    записывается только после коммита
+    """
+    shift_rating_counters(changes)
+    discard_from_cache(
+        user_id, [movie_id for movie_id, _, new in changes if new]
+    )
+    apply_rating_changes(user_id, changes)
+    transaction.on_commit(lambda: record_rating_changes(changes))
+    # Сразу - для чтений в этой же транзакции, и еще раз после
+    # коммита: параллельный запрос мог закэшировать старые оценки
+    # под новой версией
+    bump_viewer_version(user_id)
+    transaction.on_commit(lambda: bump_viewer_version(user_id))
+    transaction.on_commit(lambda: invalidate_ranking("popular"))
+    bump_catalog_version([movie_id for movie_id, _, _ in changes])
+
+
+@receiver(post_migrate)
+def ensure_search_index(sender, app_config, using, **kwargs):
+    """
+    Пересборка таблицы movies_movie в миграциях SQLite удаляет
+    триггеры полнотекстового индекса - возвращаем их
+    """
+    if app_config.label == "movies":
+        install_search_index(connections[using])
+
+
+@receiver(post_migrate)
+def bump_migrated_catalog(sender, app_config, plan=None, **kwargs):
+    """
+    Миграции данных каталога (например, слияние копий фильмов) не
+    зависят от кода приложения и кэш не трогают - новые версии
+    поднимаются здесь, если применялась хоть одна миграция movies
+    """
+    if app_config.label == "movies" and any(
+        migration.app_label == "movies" and not backwards
+        for migration, backwards in plan or ()
+    ):
+        bump_catalog_version(content=True)
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def bump_movie_version(sender, instance, **kwargs):
+    """Новые ETag страниц каталога, см. movies.conditional"""
+    bump_catalog_version([instance.id], content=True)
+    transaction.on_commit(lambda: invalidate_ranking("new", "popular"))
+
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+def bump_movie_genres_version(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    # Очистка - до удаления связей, пока видно, каких фильмов она касается
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        movie_ids = [instance.id]
+    elif action == "pre_clear":
+        movie_ids = list(instance.movie_set.values_list("id", flat=True))
+    else:
+        movie_ids = pk_set
+    bump_catalog_version(movie_ids, content=True)
+
+
+@receiver(post_save, sender=Genre)
+@receiver(pre_delete, sender=Genre)
+def bump_genre_version(sender, instance, created=False, **kwargs):
+    movie_ids = []
+    if not created:
+        movie_ids = list(instance.movie_set.values_list("id", flat=True))
+    bump_catalog_version(movie_ids, content=True)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def bump_review_version(sender, instance, **kwargs):
+    bump_catalog_version([instance.movie_id])
+
+
+@receiver(post_save, sender=Review)
+def count_added_review(sender, instance, created, **kwargs):
+    if created:
+        shift_review_count(instance.movie_id, 1)
+
+
+@receiver(post_delete, sender=Review)
+def count_deleted_review(sender, instance, **kwargs):
+    shift_review_count(instance.movie_id, -1)
+
+
+@receiver(pre_delete, sender=User)
+def remove_user_ratings(sender, instance, **kwargs):
+    """
+    Каскадное удаление оценок обходит set_ratings, и счетчики фильмов,
+    совместные оценки и схожесть остались бы с ними. Поэтому оценки
+    снимаются до удаления, в его же транзакции
+    """
+    movie_ids = Rating.objects.filter(user_id=instance.id).values_list(
+        "movie_id", flat=True
+    )
+    Rating.objects.set_ratings(
+        instance.id, {movie_id: 0 for movie_id in movie_ids}
+    )
@@ -0,0 +1,345 @@
+"""
+Item-item схожесть фильмов на разреженной матрице оценок.
+
+Схожесть совпадает с calculate_item_similarity: доля пользователей,
+оценивших оба фильма одинаково, среди всех, кто оценил оба фильма.
+Для матрицы оценок R (пользователи x фильмы, +1 лайк / -1 дизлайк):
+
+    co = |R|^T |R|         - число общих оценщиков
+    agree = L^T L + D^T D  - число совпавших оценок
+    score = agree / co
+"""
+import numpy as np
+from scipy import sparse
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from movies.conditional import bump_catalog_version
+from movies.models import Movie, MovieCoRating, MovieSimilarity, Rating
+
+
+SIMILARITY_TOP_K = 50
+SIMILARITY_THRESHOLD = 0.5
+SIMILARITY_BLOCK_SIZE = 1000
+
+
+def load_rating_matrix():
+    """
+    Читает все оценки одним запросом и строит матрицы
+    лайков L и дизлайков D (пользователи x фильмы).
+    Строки соответствуют user_ids, столбцы - movie_ids
+    """
+    movie_ids = np.fromiter(
+        Movie.objects.order_by("id").values_list("id", flat=True),
+        dtype=np.int64,
+    )
+    ratings = np.array(
+        list(Rating.objects.values_list("user_id", "movie_id", "value")),
+        dtype=np.int64,
+    ).reshape(-1, 3)
+
+    user_ids, rows = np.unique(ratings[:, 0], return_inverse=True)
+    cols = np.searchsorted(movie_ids, ratings[:, 1])
+    shape = (len(user_ids), len(movie_ids))
+
+    def to_matrix(mask):
+        data = np.ones(mask.sum(), dtype=np.float32)
+        return sparse.csr_matrix(
+            (data, (rows[mask], cols[mask])), shape=shape
+        )
+
+    likes = to_matrix(ratings[:, 2] == Rating.LIKE)
+    dislikes = to_matrix(ratings[:, 2] == Rating.DISLIKE)
+    return user_ids, movie_ids, likes, dislikes
+
+
+def top_k_neighbours(columns, scores, support, top_k, threshold):
+    """
+    Отбирает top-K соседей одного фильма: сначала по схожести,
+    при равенстве - по числу общих оценок
+    """
+    candidates = np.flatnonzero(scores > threshold)
+    order = np.lexsort((-support[candidates], -scores[candidates]))
+    candidates = candidates[order[:top_k]]
+    return columns[candidates], scores[candidates], support[candidates]
+
+
+def iter_pair_counts(block_size=SIMILARITY_BLOCK_SIZE):
+    """
+    Для каждого фильма возвращает (movie_id, other_ids, co, agree) -
+    счетчики совместных оценок со всеми фильмами, оцененными
+    теми же пользователями
+    """
+    _, movie_ids, likes, dislikes = load_rating_matrix()
+    rated = (likes + dislikes).tocsc()
+    likes = likes.tocsc()
+    dislikes = dislikes.tocsc()
+
+    for start in range(0, len(movie_ids), block_size):
+        stop = min(start + block_size, len(movie_ids))
+
+        # Блок строк матрицы фильм x фильм, чтобы не держать её целиком
+        co = (rated[:, start:stop].T @ rated).tocsr()
+        agree = (
+            likes[:, start:stop].T @ likes
+            + dislikes[:, start:stop].T @ dislikes
+        ).tocsr()
+        co.sort_indices()
+        agree.sort_indices()
+
+        for offset in range(stop - start):
+            row = start + offset
+            co_slice = slice(co.indptr[offset], co.indptr[offset + 1])
+            agree_slice = slice(
+                agree.indptr[offset], agree.indptr[offset + 1]
+            )
+            cols = co.indices[co_slice]
+
+            # Шаблон agree вложен в шаблон co: совпасть могут только
+            # оценки пользователей, оценивших оба фильма
+            agreed = np.zeros(len(cols))
+            agreed[np.searchsorted(cols, agree.indices[agree_slice])] = (
+                agree.data[agree_slice]
+            )
+            not_self = cols != row
+            yield (
+                int(movie_ids[row]),
+                movie_ids[cols[not_self]],
+                co.data[co_slice][not_self],
+                agreed[not_self],
+            )
+
+
+def compute_similarities(
+    top_k=SIMILARITY_TOP_K,
+    threshold=SIMILARITY_THRESHOLD,
+    block_size=SIMILARITY_BLOCK_SIZE,
+):
+    """
+    Векторно считает схожесть для всех пар фильмов и возвращает
+    список (movie_id, similar_movie_id, score, support) для top-K соседей
+    """
+    neighbours = []
+    for movie_id, other_ids, co, agreed in iter_pair_counts(block_size):
+        other_ids, scores, support = top_k_neighbours(
+            other_ids, agreed / co, co, top_k, threshold
+        )
+        for other_id, score, count in zip(other_ids, scores, support):
+            neighbours.append(
+                (movie_id, int(other_id), float(score), int(count))
+            )
+
+    return neighbours
+
+
+def rebuild_similarities(top_k=SIMILARITY_TOP_K, batch_size=5000):
+    """
+    Полностью пересобирает счетчики MovieCoRating и таблицу соседей
+    MovieSimilarity
+    """
+    co_ratings = []
+    neighbours = []
+
+    with transaction.atomic():
+        MovieCoRating.objects.all().delete()
+        MovieSimilarity.objects.all().delete()
+
+        for movie_id, other_ids, co, agreed in iter_pair_counts():
+            co_ratings.extend(
+                MovieCoRating(
+                    movie_id=movie_id,
+                    other_movie_id=int(other_id),
+                    co_count=int(count),
+                    agree_count=int(agree),
+                )
+                for other_id, count, agree in zip(other_ids, co, agreed)
+            )
+            if len(co_ratings) >= batch_size:
+                MovieCoRating.objects.bulk_create(co_ratings)
+                co_ratings = []
+
+            other_ids, scores, support = top_k_neighbours(
+                other_ids, agreed / co, co, top_k, SIMILARITY_THRESHOLD
+            )
+            neighbours.extend(
+                MovieSimilarity(
+                    movie_id=movie_id,
+                    similar_movie_id=int(other_id),
+                    score=float(score),
+                    support=int(count),
+                )
+                for other_id, score, count in zip(other_ids, scores, support)
+            )
+
+        MovieCoRating.objects.bulk_create(co_ratings)
+        MovieSimilarity.objects.bulk_create(
+            neighbours, batch_size=batch_size
+        )
+        # Похожие фильмы на страницах фильмов
+        bump_catalog_version(content=True)
+
+    return len(neighbours)
+
+
+def _pairs_filter(movie_id, other_ids):
+    return Q(movie_id=movie_id, other_movie_id__in=other_ids) | Q(
+        movie_id__in=other_ids, other_movie_id=movie_id
+    )
+
+
+def _apply_pair_delta(movie_id, others, old, new):
+    """
+    Сдвигает счетчики пар (movie_id, j) в обе стороны, когда оценка
+    movie_id меняется с old на new; others - {j: оценка j}
+    """
+    co_delta = abs(new) - abs(old)
+    if co_delta > 0:
+        MovieCoRating.objects.bulk_create(
+            [
+                MovieCoRating(movie_id=a, other_movie_id=b)
+                for other_id in others
+                for a, b in ((movie_id, other_id), (other_id, movie_id))
+            ],
+            ignore_conflicts=True,
+        )
+
+    for value in (Rating.LIKE, Rating.DISLIKE):
+        agree_delta = (new == value) - (old == value)
+        group = {j for j, other in others.items() if other == value}
+        if group and (co_delta or agree_delta):
+            MovieCoRating.objects.filter(
+                _pairs_filter(movie_id, group)
+            ).update(
+                co_count=F("co_count") + co_delta,
+                agree_count=F("agree_count") + agree_delta,
+            )
+
+    if co_delta < 0:
+        MovieCoRating.objects.filter(
+            _pairs_filter(movie_id, set(others)), co_count__lte=0
+        ).delete()
+
+
+def refresh_neighbours(movie_ids, top_k=SIMILARITY_TOP_K):
+    """Пересчитывает top-K соседей фильмов по их счетчикам пар"""
+    counts = {movie_id: [] for movie_id in movie_ids}
+    for movie_id, other_id, co, agreed in MovieCoRating.objects.filter(
+        movie_id__in=movie_ids, co_count__gt=0
+    ).values_list("movie_id", "other_movie_id", "co_count", "agree_count"):
+        counts[movie_id].append((other_id, co, agreed))
+
+    neighbours = []
+    for movie_id, rows in counts.items():
+        rows = np.array(rows, dtype=np.float64).reshape(-1, 3)
+        other_ids, scores, support = top_k_neighbours(
+            rows[:, 0],
+            rows[:, 2] / rows[:, 1],
+            rows[:, 1],
+            top_k,
+            SIMILARITY_THRESHOLD,
+        )
+        neighbours.extend(
+            MovieSimilarity(
+                movie_id=movie_id,
+                similar_movie_id=int(other_id),
+                score=float(score),
+                support=int(count),
+            )
+            for other_id, score, count in zip(other_ids, scores, support)
+        )
+
+    MovieSimilarity.objects.filter(movie_id__in=movie_ids).delete()
+    MovieSimilarity.objects.bulk_create(neighbours)
+
+
+def _merge_neighbour(movie_id, other_ids, top_k=SIMILARITY_TOP_K):
+    """
+    Обновляет место movie_id в списках соседей фильмов other_ids.
+    Полный пересчет нужен только тем спискам, из которых movie_id
+    выпал при заполненном top-K: на его место может прийти фильм,
+    которого в списке нет
+    """
+    pair_counts = {
+        other_id: (co, agreed)
+        for other_id, co, agreed in MovieCoRating.objects.filter(
+            movie_id__in=other_ids, other_movie_id=movie_id, co_count__gt=0
+        ).values_list("movie_id", "co_count", "agree_count")
+    }
+    current = {other_id: [] for other_id in other_ids}
+    for neighbour in MovieSimilarity.objects.filter(movie_id__in=other_ids):
+        current[neighbour.movie_id].append(neighbour)
+
+    to_create, to_update, to_delete, to_refresh = [], [], [], []
+    for other_id, rows in current.items():
+        co, agreed = pair_counts.get(other_id, (0, 0))
+        score = agreed / co if co else 0.0
+        eligible = score > SIMILARITY_THRESHOLD
+        existing = next(
+            (row for row in rows if row.similar_movie_id == movie_id), None
+        )
+        key = (score, co)
+
+        if existing is not None:
+            if len(rows) >= top_k and key < (existing.score, existing.support):
+                to_refresh.append(other_id)
+            elif eligible:
+                existing.score, existing.support = score, co
+                to_update.append(existing)
+            else:
+                to_delete.append(existing.pk)
+        elif eligible:
+            if len(rows) < top_k:
+                to_create.append(
+                    MovieSimilarity(
+                        movie_id=other_id,
+                        similar_movie_id=movie_id,
+                        score=score,
+                        support=co,
+                    )
+                )
+            else:
+                worst = min(rows, key=lambda row: (row.score, row.support))
+                if key > (worst.score, worst.support):
+                    worst.similar_movie_id = movie_id
+                    worst.score, worst.support = score, co
+                    to_update.append(worst)
+
+    MovieSimilarity.objects.filter(pk__in=to_delete).delete()
+    MovieSimilarity.objects.bulk_update(
+        to_update, ["similar_movie", "score", "support"]
+    )
+    MovieSimilarity.objects.bulk_create(to_create)
+    if to_refresh:
+        refresh_neighbours(to_refresh, top_k=top_k)
+
+
+def apply_rating_changes(user_id, changes):
+    """
+    Инкрементально обновляет схожесть после изменения оценок
+    пользователя: changes - список (movie_id, старое, новое значение).
+
+    Вызывается после записи, поэтому сначала восстанавливается
+    состояние оценок до изменений, затем изменения применяются по
+    одному. Стоимость - O(число оценок пользователя) на фильм.
+    """
+    ratings = dict(
+        Rating.objects.filter(user_id=user_id).values_list(
+            "movie_id", "value"
+        )
+    )
+    for movie_id, old, new in changes:
+        ratings[movie_id] = old
+
+    with transaction.atomic():
+        for movie_id, old, new in changes:
+            others = {
+                other_id: value
+                for other_id, value in ratings.items()
+                if value and other_id != movie_id
+            }
+            ratings[movie_id] = new
+
+            _apply_pair_delta(movie_id, others, old, new)
+            refresh_neighbours([movie_id])
+            _merge_neighbour(movie_id, set(others))
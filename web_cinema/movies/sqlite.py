@@ -0,0 +1,81 @@
+"""
+Режим SQLite для небольших установок.
+
+Каждое новое соединение получает WAL (читатели не ждут писателя),
+synchronous=NORMAL (в WAL надежно при сбое процесса), отображение
+файла в память, кэш страниц и ожидание чужой блокировки. Выключается
+SQLITE_TUNING=False.
+
+Короткие пишущие транзакции оборачиваются в retry_on_lock: при
+"database is locked" транзакция повторяется с экспоненциальной
+задержкой и разбросом. Ожидание busy_timeout помогает не всегда:
+если две транзакции начали с чтения и обе хотят писать, SQLite
+сразу отказывает одной из них.
+"""
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+# Первая пауза перед повтором, дальше она удваивается
+SQLITE_RETRY_DELAY = 0.01
+
+
+def sqlite_pragmas():
+    return {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT,
+    }
+
+
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor != "sqlite" or not settings.SQLITE_TUNING:
+        return
+    with connection.cursor() as cursor:
+        for name, value in sqlite_pragmas().items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def is_lock_error(error):
+    message = str(error)
+    return (
+        "database is locked" in message
+        or "database table is locked" in message
+    )
+
+
+def retry_on_lock(func):
+    """
+    Выполняет func в транзакции и повторяет ее, пока база занята, до
+    SQLITE_WRITE_RETRIES раз. Внутри чужой транзакции повтор ничего не
+    даст - там func просто вызывается
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if transaction.get_connection().in_atomic_block:
+            return func(*args, **kwargs)
+        for attempt in range(settings.SQLITE_WRITE_RETRIES + 1):
+            try:
+                with transaction.atomic():
+                    return func(*args, **kwargs)
+            except OperationalError as error:
+                if (
+                    attempt == settings.SQLITE_WRITE_RETRIES
+                    or not is_lock_error(error)
+                ):
+                    raise
+            time.sleep(
+                SQLITE_RETRY_DELAY * 2**attempt * random.uniform(0.5, 1.5)
+            )
+
+    return wrapper
@@ -0,0 +1,12 @@
+from django import template
+
+from movies.cards import render_cards
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def movie_cards(movies, stats=False):
+    """Карточки фильмов из кэша, см. movies.cards"""
+    return render_cards(movies, stats)
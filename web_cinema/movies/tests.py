@@ -1,11 +1,42 @@
+import json
+import os
+import tempfile
+import uuid
+
 from movies.models import Genre, Movie, UserPreferences, Review
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.contrib.auth.models import AnonymousUser
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 User = get_user_model()
 
 
+class CacheIsolationMixin:
+    """
+    Свои кэши на каждый тест: те же хранилища, что задает CACHE_URL, но
+    с новым префиксом ключей. Записи прошлых тестов не видны, а clear()
+    не нужен - в Redis он очистил бы всю базу сервера
+    """
+
+    def setUp(self):
+        from django.conf import settings
+
+        super().setUp()
+        prefix = f"test-{uuid.uuid4().hex}"
+        isolated = override_settings(
+            CACHES={
+                alias: {
+                    **cache,
+                    "KEY_PREFIX": f"{prefix}:{cache.get('KEY_PREFIX', '')}",
+                }
+                for alias, cache in settings.CACHES.items()
+            }
+        )
+        isolated.enable()
+        self.addCleanup(isolated.disable)
+
+
 class MovieModelTest(TestCase):
     def setUp(self):
         self.genre = Genre.objects.create(name="Драма")
@@ -72,8 +103,9 @@ class UserPreferencesTest(TestCase):
         self.assertIn(str(self.user.phone), str(prefs))
 
 
-class MovieViewsTest(TestCase):
+class MovieViewsTest(CacheIsolationMixin, TestCase):
     def setUp(self):
+        super().setUp()
         self.client = Client()
         self.user = User.objects.create_user(
             phone="79998887766",
@@ -133,8 +165,9 @@ class MovieViewsTest(TestCase):
         self.assertEqual(response.status_code, 302)  # Redirect to login
 
 
-class RecommendationsTest(TestCase):
+class RecommendationsTest(CacheIsolationMixin, TestCase):
     def setUp(self):
+        super().setUp()
         self.client = Client()
         self.user = User.objects.create_user(
             phone="79998887766",
@@ -161,8 +194,9 @@ class RecommendationsTest(TestCase):
         self.assertEqual(response.status_code, 302)  # Redirect to login
 
 
-class UtilsTest(TestCase):
+class UtilsTest(CacheIsolationMixin, TestCase):
     def setUp(self):
+        super().setUp()
         self.user = User.objects.create_user(
             phone="79998887766",
             first_name="Test",
@@ -199,4 +233,1500 @@ class UtilsTest(TestCase):
         similar_movies = get_similar_movies(self.movie, self.user, 3)
         self.assertIsNotNone(similar_movies)
         # Функция возвращает list
-        self.assertIsInstance(similar_movies, list)
\ No newline at end of file
+        self.assertIsInstance(similar_movies, list)
+
+
+class ItemSimilarityTest(TestCase):
+    def setUp(self):
+        self.movies = [
+            Movie.objects.create(title=f"Фильм {i}", year=2020 + i)
+            for i in range(4)
+        ]
+        ratings = [
+            # (лайки, дизлайки) для каждого пользователя
+            ([0, 1, 2], [3]),
+            ([0, 1], [2, 3]),
+            ([0], [1, 3]),
+        ]
+        for i, (liked, disliked) in enumerate(ratings):
+            user = User.objects.create_user(
+                phone=f"7999000000{i}",
+                first_name="Test",
+                last_name="User",
+                password="testpass123",
+            )
+            prefs = UserPreferences.objects.create(user=user)
+            prefs.liked_movies.add(*[self.movies[j] for j in liked])
+            prefs.disliked_movies.add(*[self.movies[j] for j in disliked])
+
+    def test_matches_calculate_item_similarity(self):
+        from movies.similarity import compute_similarities
+        from movies.utils import calculate_item_similarity
+
+        neighbours = compute_similarities(top_k=10, threshold=-1)
+        scores = {(a, b): score for a, b, score, _ in neighbours}
+
+        for first in self.movies:
+            for second in self.movies:
+                if first == second:
+                    continue
+                self.assertAlmostEqual(
+                    scores.get((first.id, second.id), 0.0),
+                    calculate_item_similarity(first, second),
+                )
+
+    def test_get_similar_movies_uses_neighbours(self):
+        from movies.similarity import rebuild_similarities
+        from movies.utils import get_similar_movies
+
+        rebuild_similarities()
+        similar = get_similar_movies(self.movies[0], AnonymousUser(), 1)
+        # Фильм 1 совпадает с фильмом 0 у 2 из 3 пользователей
+        self.assertEqual(similar, [self.movies[1]])
+
+    def test_incremental_updates_match_rebuild(self):
+        from movies.models import MovieCoRating, MovieSimilarity
+        from movies.similarity import rebuild_similarities
+
+        def snapshot():
+            counts = set(
+                MovieCoRating.objects.filter(co_count__gt=0).values_list(
+                    "movie_id", "other_movie_id", "co_count", "agree_count"
+                )
+            )
+            rows = MovieSimilarity.objects.values_list(
+                "movie_id", "similar_movie_id", "score", "support"
+            )
+            neighbours = {
+                (a, b, round(score, 6), support)
+                for a, b, score, support in rows
+            }
+            return counts, neighbours
+
+        rebuild_similarities()
+
+        prefs = UserPreferences.objects.order_by("id")
+        # Лайк -> дизлайк, как в rate_movie
+        prefs[0].disliked_movies.add(self.movies[2])
+        prefs[0].liked_movies.remove(self.movies[2])
+        # Удаление несуществующей связи ничего не меняет
+        prefs[1].liked_movies.remove(self.movies[3])
+        prefs[1].disliked_movies.remove(self.movies[0])
+        # Дизлайк -> лайк без remove() и clear()
+        prefs[2].liked_movies.add(self.movies[3])
+        prefs[2].disliked_movies.clear()
+        prefs[1].liked_movies.add(self.movies[2], self.movies[3])
+
+        incremental = snapshot()
+        rebuild_similarities()
+        self.assertEqual(incremental, snapshot())
+
+
+class MatrixFactorizationTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            RECOMMENDER_MODEL_PATH=os.path.join(
+                self.tmp_dir.name, "recommender.npz"
+            )
+        )
+        self.settings_override.enable()
+
+        self.movies = [
+            Movie.objects.create(title=f"Фильм {i}", year=2000 + i)
+            for i in range(6)
+        ]
+        # Две группы пользователей: любители фильмов 0-2 и 3-5
+        self.prefs = []
+        for i in range(6):
+            user = User.objects.create_user(
+                phone=f"7999111000{i}",
+                first_name="Test",
+                last_name="User",
+                password="testpass123",
+            )
+            prefs = UserPreferences.objects.create(user=user)
+            group = self.movies[:3] if i < 3 else self.movies[3:]
+            prefs.liked_movies.add(*[m for m in group if m.id % 3 != i % 3])
+            self.prefs.append(prefs)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp_dir.cleanup()
+
+    def test_recommendations_use_embeddings(self):
+        from movies.recommender import save_model, train_als
+        from movies.utils import get_recommendations
+
+        save_model(train_als(factors=4, iterations=10))
+
+        user = self.prefs[0].user
+        rated = set(self.prefs[0].liked_movies.values_list("id", flat=True))
+        recommendations = get_recommendations(user, limit=2)
+
+        self.assertEqual(len(recommendations), 2)
+        self.assertFalse(rated & {movie.id for movie in recommendations})
+        # Первым идет фильм из своей группы
+        self.assertIn(recommendations[0], self.movies[:3])
+        self.assertEqual(recommendations, get_recommendations(user, limit=2))
+
+    def test_without_model_returns_none(self):
+        from movies.recommender import recommend_movie_ids
+
+        self.assertIsNone(recommend_movie_ids(self.prefs[0].id, [], 3))
+
+
+class PrecomputeRecommendationsTest(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(
+            phone="79998887766",
+            first_name="Test",
+            last_name="User",
+            password="testpass123",
+        )
+        self.genre = Genre.objects.create(name="Драма")
+        self.other_genre = Genre.objects.create(name="Комедия")
+        self.movies = [
+            Movie.objects.create(title=f"Фильм {i}", year=2000 + i)
+            for i in range(4)
+        ]
+        for movie in self.movies[:3]:
+            movie.genres.add(self.genre)
+        self.movies[3].genres.add(self.other_genre)
+
+        self.prefs = UserPreferences.objects.create(user=self.user)
+        self.prefs.favorite_genres.add(self.genre)
+        self.prefs.liked_movies.add(self.movies[0])
+
+    def test_precompute_writes_cache(self):
+        from movies.models import RecommendationCache
+        from movies.precompute import precompute_recommendations
+        from movies.utils import get_recommendations
+
+        for workers in (1, 2):
+            generation, count = precompute_recommendations(
+                limit=5, workers=workers
+            )
+            self.assertEqual(count, 1)
+
+        cache = RecommendationCache.objects.get(user=self.user)
+        self.assertEqual(cache.generation, 2)
+        # Сначала фильмы любимого жанра, затем популярные
+        self.assertEqual(
+            cache.movie_ids[:2], [self.movies[2].id, self.movies[1].id]
+        )
+        self.assertNotIn(self.movies[0].id, cache.movie_ids)
+
+        with self.assertNumQueries(2):
+            recommendations = get_recommendations(self.user, limit=2)
+        self.assertEqual(recommendations, [self.movies[2], self.movies[1]])
+        # Повторно - id из кэша рекомендаций, только сами фильмы
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                get_recommendations(self.user, limit=2), recommendations
+            )
+
+    def test_cached_recommendations_follow_changes(self):
+        from movies.models import Rating
+        from movies.precompute import precompute_recommendations
+        from movies.utils import get_recommendations
+
+        # Живая выдача перемешана, но до изменений берется из кэша
+        live = get_recommendations(self.user, limit=5)
+        self.assertEqual(get_recommendations(self.user, limit=5), live)
+
+        # Новое поколение предрасчета сменяет живую выдачу
+        precompute_recommendations(limit=5)
+        self.assertEqual(
+            get_recommendations(self.user, limit=2),
+            [self.movies[2], self.movies[1]],
+        )
+
+        # Оценка пользователя сбрасывает его выдачу
+        Rating.objects.set_ratings(
+            self.user.id, {self.movies[2].id: Rating.DISLIKE}
+        )
+        self.assertNotIn(
+            self.movies[2], get_recommendations(self.user, limit=2)
+        )
+
+    def test_rating_discards_cached_movie(self):
+        from movies.models import RecommendationCache
+        from movies.precompute import precompute_recommendations
+
+        precompute_recommendations(limit=5)
+        self.prefs.disliked_movies.add(self.movies[2])
+
+        cache = RecommendationCache.objects.get(user=self.user)
+        self.assertNotIn(self.movies[2].id, cache.movie_ids)
+
+
+class RatingCountersTest(TestCase):
+    def setUp(self):
+        self.movie = Movie.objects.create(title="Тестовый фильм", year=2023)
+        self.prefs = []
+        for i in range(2):
+            user = User.objects.create_user(
+                phone=f"7999222000{i}",
+                first_name="Test",
+                last_name="User",
+                password="testpass123",
+            )
+            self.prefs.append(UserPreferences.objects.create(user=user))
+
+    def assertCounters(self, likes, dislikes):
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.like_count, likes)
+        self.assertEqual(self.movie.dislike_count, dislikes)
+
+    def test_counters_follow_ratings(self):
+        self.prefs[0].liked_movies.add(self.movie)
+        self.prefs[1].liked_movies.add(self.movie)
+        self.assertCounters(2, 0)
+
+        # Повторное добавление и удаление несуществующей связи
+        self.prefs[0].liked_movies.add(self.movie)
+        self.prefs[0].disliked_movies.remove(self.movie)
+        self.assertCounters(2, 0)
+
+        self.prefs[1].disliked_movies.add(self.movie)
+        self.prefs[1].liked_movies.remove(self.movie)
+        self.assertCounters(1, 1)
+
+        self.prefs[0].liked_movies.clear()
+        self.assertCounters(0, 1)
+
+    def test_recount_repairs_counters(self):
+        from movies.counters import recount_rating_counters
+
+        self.prefs[0].liked_movies.add(self.movie)
+        self.prefs[1].disliked_movies.add(self.movie)
+        Movie.objects.update(like_count=10, dislike_count=10)
+
+        recount_rating_counters()
+        self.assertCounters(1, 1)
+
+    def test_user_deletion_removes_ratings(self):
+        from movies.models import MovieCoRating, Rating
+
+        other = Movie.objects.create(title="Другой фильм", year=2020)
+        user = self.prefs[0].user
+        Rating.objects.set_ratings(user.id, {self.movie.id: 1, other.id: 1})
+        Rating.objects.set_ratings(self.prefs[1].user_id, {self.movie.id: -1})
+        self.assertTrue(MovieCoRating.objects.filter(co_count__gt=0).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.delete()
+        self.assertCounters(0, 1)
+        self.assertFalse(
+            MovieCoRating.objects.filter(co_count__gt=0).exists()
+        )
+
+    def test_admin_save_keeps_counters(self):
+        from unittest import mock
+
+        from movies.admin import MovieAdmin
+
+        genre = Genre.objects.create(name="Драма")
+        admin = User.objects.create_superuser(
+            phone="79992220099", password="testpass123"
+        )
+        self.client.force_login(admin)
+        # Фильм загружен до лайка: в его полях старые счетчики
+        stale = Movie.objects.get(id=self.movie.id)
+        self.prefs[0].liked_movies.add(self.movie)
+
+        with mock.patch.object(MovieAdmin, "get_object", return_value=stale):
+            response = self.client.post(
+                reverse("admin:movies_movie_change", args=[self.movie.id]),
+                {
+                    "title": "Новое название",
+                    "description": "",
+                    "year": 2023,
+                    "director": "",
+                    "country": "",
+                    "image_url": "",
+                    "genres": [genre.id],
+                },
+            )
+        self.assertEqual(response.status_code, 302)
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.title, "Новое название")
+        self.assertCounters(1, 0)
+
+
+class RatingModelTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            phone="79998887766",
+            first_name="Test",
+            last_name="User",
+            password="testpass123",
+        )
+        self.movie = Movie.objects.create(title="Тестовый фильм", year=2023)
+        self.prefs = UserPreferences.objects.create(user=self.user)
+
+    def test_set_ratings_keeps_single_row(self):
+        from movies.models import Rating
+
+        changes = Rating.objects.set_ratings(
+            self.user.id, {self.movie.id: Rating.LIKE}
+        )
+        self.assertEqual(changes, [(self.movie.id, 0, Rating.LIKE)])
+        Rating.objects.set_ratings(
+            self.user.id, {self.movie.id: Rating.DISLIKE}
+        )
+
+        rating = Rating.objects.get(user=self.user, movie=self.movie)
+        self.assertEqual(rating.value, Rating.DISLIKE)
+        self.assertEqual(
+            Rating.objects.set_ratings(
+                self.user.id, {self.movie.id: Rating.DISLIKE}
+            ),
+            [],
+        )
+
+    def test_compatibility_accessors(self):
+        self.prefs.disliked_movies.add(self.movie)
+        self.prefs.liked_movies.add(self.movie)
+        self.assertEqual(list(self.prefs.liked_movies.all()), [self.movie])
+        self.assertFalse(self.prefs.disliked_movies.exists())
+
+        # remove() не трогает оценку с другим значением
+        self.prefs.disliked_movies.remove(self.movie)
+        self.assertEqual(self.prefs.liked_movies.count(), 1)
+        self.prefs.liked_movies.remove(self.movie)
+        self.assertEqual(self.prefs.liked_movies.count(), 0)
+
+
+class TrendingTest(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.movies = [
+            Movie.objects.create(title=f"Фильм {i}", year=2000 + i)
+            for i in range(3)
+        ]
+        self.users = [
+            User.objects.create_user(
+                phone=f"7999333000{i}",
+                first_name="Test",
+                last_name="User",
+                password="testpass123",
+            )
+            for i in range(3)
+        ]
+
+    def test_fresh_likes_outrank_old_ones(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from movies.models import MovieActivity, Rating
+        from movies.trending import (
+            hour_bucket,
+            record_rating_changes,
+            refresh_trending,
+        )
+        from movies.utils import get_trending_movies
+
+        now = timezone.now()
+        old = now - timedelta(days=2)
+        # Три старых лайка против двух свежих
+        record_rating_changes(
+            [(self.movies[0].id, 0, Rating.LIKE)] * 3, moment=old
+        )
+        record_rating_changes(
+            [(self.movies[1].id, 0, Rating.LIKE)] * 2, moment=now
+        )
+        # Лайк, смененный на дизлайк, не считается лайком
+        record_rating_changes(
+            [
+                (self.movies[2].id, 0, Rating.LIKE),
+                (self.movies[2].id, Rating.LIKE, Rating.DISLIKE),
+            ],
+            moment=now,
+        )
+
+        activity = MovieActivity.objects.get(movie=self.movies[2])
+        self.assertEqual((activity.likes, activity.dislikes), (0, 1))
+        self.assertEqual(activity.bucket, hour_bucket(now))
+
+        self.assertEqual(refresh_trending(now=now), 2)
+        self.assertEqual(
+            list(get_trending_movies(5)), [self.movies[1], self.movies[0]]
+        )
+
+        # Вне окна активность удаляется и из трендов выпадает
+        refresh_trending(now=now + timedelta(days=8))
+        self.assertFalse(MovieActivity.objects.exists())
+
+    def test_rating_path_feeds_activity(self):
+        from movies.models import MovieActivity, Rating
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for user in self.users:
+                Rating.objects.set_ratings(
+                    user.id, {self.movies[0].id: Rating.LIKE}
+                )
+
+        self.assertEqual(
+            MovieActivity.objects.get(movie=self.movies[0]).likes, 3
+        )
+
+    def test_fallback_without_trending_table(self):
+        from movies.utils import get_trending_movies
+
+        Movie.objects.filter(pk=self.movies[0].pk).update(year=2024)
+        self.assertEqual(list(get_trending_movies(5)), [self.movies[0]])
+
+
+class BenchmarkHarnessTest(TestCase):
+    def test_generate_and_measure(self):
+        from movies.benchmark import generate_catalog, measure, sample_cases
+        from movies.models import Rating
+        from movies.utils import get_similar_movies
+
+        ratings = generate_catalog(50, 10, ratings_per_user=5)
+        self.assertEqual(Movie.objects.count(), 50)
+        self.assertEqual(Rating.objects.count(), ratings)
+        self.assertEqual(
+            sum(Movie.objects.values_list("like_count", flat=True)),
+            Rating.objects.filter(value=Rating.LIKE).count(),
+        )
+
+        users, popular = sample_cases(size=3)
+        result = measure(
+            get_similar_movies,
+            [(movie, user, 5) for movie, user in zip(popular, users)],
+            repeat=6,
+        )
+        self.assertEqual(result["calls"], 6)
+        self.assertLessEqual(
+            result["latency_ms"]["p50"], result["latency_ms"]["p99"]
+        )
+        self.assertGreater(result["queries"]["max"], 0)
+
+    def test_isolated_caches(self):
+        from django.core.cache import caches
+
+        from movies.benchmark import isolated_caches
+
+        key = f"benchmark-test:{os.getpid()}"
+        caches["recommendations"].set(key, "рабочее", 60)
+        with isolated_caches():
+            self.assertIsNone(caches["recommendations"].get(key))
+            caches["recommendations"].set(key, "замер", 60)
+        self.assertEqual(caches["recommendations"].get(key), "рабочее")
+        caches["recommendations"].delete(key)
+
+
+class KeysetPaginationTest(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.genre = Genre.objects.create(name="Драма")
+        # Одинаковые годы, чтобы порядок решал id
+        self.movies = [
+            Movie.objects.create(title=f"Фильм {i:02d}", year=2000 + i // 3)
+            for i in range(10)
+        ]
+        for movie in self.movies:
+            movie.genres.add(self.genre)
+
+    def collect(self, order):
+        seen, params = [], {"order": order, "page_size": 4}
+        while True:
+            response = self.client.get(reverse("movies:movie_page"), params)
+            data = response.json()
+            seen += [movie["id"] for movie in data["movies"]]
+            if data["cursor"] is None:
+                return seen
+            params["cursor"] = data["cursor"]
+
+    def test_pages_cover_catalog_in_order(self):
+        by_year = sorted(self.movies, key=lambda m: (m.year, m.id))[::-1]
+        self.assertEqual(self.collect("year"), [m.id for m in by_year])
+        self.assertEqual(self.collect("title"), [m.id for m in self.movies])
+
+    def test_page_queries_do_not_grow_with_cards(self):
+        url = reverse("movies:movie_list")
+        # Только фильмы: фасеты и карточки уже в кэше
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"page_size": 4})
+        self.assertEqual(len(response.context["movies"]), 4)
+        self.assertIn("cursor=", response.context["next_url"])
+        self.assertNotIn("description", response.context["movies"][0].__dict__)
+
+    def test_broken_params_do_not_fail(self):
+        url = reverse("movies:movie_page")
+        response = self.client.get(url, {"cursor": "!!!", "page_size": 2})
+        self.assertEqual(len(response.json()["movies"]), 2)
+
+        response = self.client.get(url, {"year": "abc"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["movies"], [])
+
+
+class FullTextSearchTest(TestCase):
+    def setUp(self):
+        self.genre = Genre.objects.create(name="Драма")
+        self.war = Movie.objects.create(
+            title="Война и мир",
+            description="Экранизация романа о войнах с Наполеоном",
+            year=1966,
+        )
+        self.about_war = Movie.objects.create(
+            title="Летят журавли",
+            description="Фильм о любви во время войны",
+            year=1957,
+        )
+        self.runner = Movie.objects.create(
+            title="Blade Runner", description="Replicants running", year=1982
+        )
+        self.war.genres.add(self.genre)
+
+    def search(self, **params):
+        response = self.client.get(reverse("movies:search"), params)
+        return [movie.id for movie in response.context["movies"]]
+
+    def test_stemming_and_title_relevance(self):
+        # Совпадение в названии важнее совпадения в описании
+        self.assertEqual(
+            self.search(q="войны"), [self.war.id, self.about_war.id]
+        )
+        self.assertEqual(self.search(q="run"), [self.runner.id])
+        self.assertEqual(self.search(q="фильм любви"), [self.about_war.id])
+
+    def test_combines_with_filters(self):
+        self.assertEqual(
+            self.search(q="война", genre="Драма"), [self.war.id]
+        )
+        self.assertEqual(
+            self.search(q="война", year="1957"), [self.about_war.id]
+        )
+
+    def test_index_follows_changes(self):
+        self.runner.title = "Бегущий по лезвию"
+        self.runner.save()
+        self.assertEqual(self.search(q="бегущий"), [self.runner.id])
+        self.assertEqual(self.search(q="blade"), [])
+
+        self.war.delete()
+        self.assertEqual(self.search(q="войны"), [self.about_war.id])
+
+    def test_rank_pagination(self):
+        response = self.client.get(
+            reverse("movies:movie_page"), {"q": "войны", "page_size": 1}
+        )
+        data = response.json()
+        self.assertEqual(data["movies"][0]["id"], self.war.id)
+        response = self.client.get(
+            reverse("movies:movie_page"),
+            {"q": "войны", "page_size": 1, "cursor": data["cursor"]},
+        )
+        self.assertEqual(
+            response.json()["movies"][0]["id"], self.about_war.id
+        )
+
+
+class AutocompleteTest(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.genre = Genre.objects.create(name="Фантастика")
+        self.knight = Movie.objects.create(
+            title="Тёмный рыцарь", year=2008, director="Кристофер Нолан"
+        )
+        self.fantasy = Movie.objects.create(
+            title="Фантастическая четвёрка", year=2015, like_count=5
+        )
+
+    def suggest(self, query):
+        response = self.client.get(
+            reverse("movies:autocomplete"), {"q": query}
+        )
+        return [
+            (item["kind"], item["label"])
+            for item in response.json()["suggestions"]
+        ]
+
+    def test_prefix_matches_any_word(self):
+        self.assertEqual(
+            self.suggest("рыцарь"), [("movie", "Тёмный рыцарь (2008)")]
+        )
+        self.assertEqual(
+            self.suggest("Темн"), [("movie", "Тёмный рыцарь (2008)")]
+        )
+        self.assertEqual(
+            self.suggest("нол"), [("director", "Кристофер Нолан")]
+        )
+        self.assertEqual(
+            self.suggest("фант"),
+            [
+                ("genre", "Фантастика"),
+                ("movie", "Фантастическая четвёрка (2015)"),
+            ],
+        )
+        self.assertEqual(self.suggest("ф"), [])
+
+    def test_served_from_memory_and_reset_by_signals(self):
+        from movies.conditional import CONTENT, _bump
+
+        self.suggest("рыцарь")
+        with self.assertNumQueries(0):
+            self.suggest("рыцарь")
+
+        # Правка в другом процессе видна только по общей версии
+        Movie.objects.filter(pk=self.fantasy.pk).update(title="Рыцари")
+        self.assertEqual(
+            self.suggest("рыцар"), [("movie", "Тёмный рыцарь (2008)")]
+        )
+        _bump([CONTENT])
+        self.assertEqual(
+            self.suggest("рыцар"),
+            [("movie", "Рыцари (2015)"), ("movie", "Тёмный рыцарь (2008)")],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.knight.title = "Начало"
+            self.knight.save()
+        self.assertEqual(self.suggest("рыцарь"), [])
+        self.assertEqual(self.suggest("нач"), [("movie", "Начало (2008)")])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.knight.delete()
+        self.assertEqual(self.suggest("нач"), [])
+
+
+class FacetsTest(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        drama = Genre.objects.create(name="Драма")
+        comedy = Genre.objects.create(name="Комедия")
+        for title, year, country, genres in [
+            ("Первый", 1995, "США", [drama]),
+            ("Второй", 1999, "США", [drama, comedy]),
+            ("Третий", 2005, "Франция", [comedy]),
+        ]:
+            movie = Movie.objects.create(
+                title=title, year=year, country=country
+            )
+            movie.genres.set(genres)
+
+    def test_counts_ignore_own_filter(self):
+        from movies.filters import get_facets
+
+        facets = get_facets({"genre": "Драма"})
+        # Жанры считаются без фильтра по жанру, остальное - с ним
+        self.assertEqual(facets["genres"], [["Драма", 2], ["Комедия", 2]])
+        self.assertEqual(facets["decades"], [[1990, 2]])
+        self.assertEqual(facets["countries"], [["США", 2]])
+
+        facets = get_facets({"decade": "2000", "country": "США"})
+        self.assertEqual(facets["genres"], [])
+        self.assertEqual(facets["decades"], [[1990, 2]])
+        self.assertEqual(facets["countries"], [["Франция", 1]])
+
+    def test_cached_by_normalized_filters(self):
+        from movies.filters import facets_key, get_facets
+
+        self.assertEqual(
+            facets_key({"q": " Война  И мир", "genre": "Драма"}),
+            facets_key({"genre": "Драма ", "q": "война и мир", "page": "2"}),
+        )
+        self.assertNotEqual(
+            facets_key({"genre": "Драма"}), facets_key({"genre": "драма"})
+        )
+
+        get_facets({"country": "США"})
+        with self.assertNumQueries(0):
+            get_facets({"country": "США "})
+
+    def test_list_shows_facet_links(self):
+        response = self.client.get(
+            reverse("movies:movie_list"), {"decade": "1990"}
+        )
+        self.assertEqual(len(response.context["movies"]), 2)
+        decades = response.context["facets"]["decades"]
+        self.assertEqual(
+            [(item["value"], item["active"]) for item in decades],
+            [(2000, False), (1990, True)],
+        )
+        # Ссылка активного значения снимает фильтр
+        self.assertNotIn("decade", decades[1]["url"])
+        self.assertContains(response, "США (2)")
+
+
+# Бюджет запросов считается с пользователем из базы и сессией из кэша,
+# при любом CACHE_URL
+@override_settings(
+    AUTHENTICATION_BACKENDS=["django.contrib.auth.backends.ModelBackend"],
+    SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+)
+class MovieDetailLoaderTest(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        from movies.models import Rating
+
+        super().setUp()
+        self.user = User.objects.create_user(
+            phone="79998887766",
+            first_name="Test",
+            last_name="User",
+            password="testpass123",
+        )
+        genre = Genre.objects.create(name="Драма")
+        self.movie = Movie.objects.create(title="Тестовый фильм", year=2023)
+        self.other = Movie.objects.create(title="Другой фильм", year=2020)
+        self.movie.genres.add(genre)
+        self.other.genres.add(genre)
+        Rating.objects.set_ratings(self.user.id, {self.movie.id: Rating.LIKE})
+        for i in range(12):
+            author = User.objects.create_user(
+                phone=f"7999000{i:04d}", password="testpass123"
+            )
+            Review.objects.create(
+                user=author, movie=self.movie, text=f"Отзыв {i}"
+            )
+
+    def test_fixed_query_budget(self):
+        url = reverse("movies:movie_detail", args=[self.movie.id])
+        # Фильм и его жанры, страница отзывов, соседи, жанровые
+        # кандидаты и их жанры
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertEqual(response.context["like_count"], 1)
+        self.assertEqual(len(response.context["reviews"]), 10)
+        self.assertEqual(response.context["review_count"], 12)
+        self.assertIn("cursor=", response.context["next_page_url"])
+        self.assertEqual(response.context["similar_movies"], [self.other])
+
+    def test_fragments_query_budget(self):
+        url = reverse("movies:fragments")
+        params = {
+            "slot": [
+                "header_user",
+                "messages",
+                "movie_actions",
+                "similar_movies",
+            ],
+            "movie": self.movie.id,
+        }
+        self.client.login(phone="79998887766", password="testpass123")
+        self.client.get(url, params)
+        # Пользователь, фильм и его жанры, отзыв зрителя, соседи и
+        # жанровые кандидаты; сессия и карточки уже в кэше
+        with self.assertNumQueries(6):
+            response = self.client.get(url, params)
+        fragments = response.json()
+        self.assertEqual(
+            set(fragments), {"header_user", "movie_actions", "similar_movies"}
+        )
+        self.assertIn("79998887766", fragments["header_user"])
+        self.assertIn("Вы поставили 👍", fragments["movie_actions"])
+        self.assertIn("Другой фильм", fragments["similar_movies"])
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    def test_anonymous_gets_only_messages(self):
+        response = self.client.get(
+            reverse("movies:fragments"),
+            {"slot": ["header_user", "messages"], "movie": "abc"},
+        )
+        self.assertEqual(response.json(), {})
+
+    def test_viewer_cache_follows_ratings(self):
+        from movies.models import Rating
+        from movies.viewer import get_rated_movies
+
+        get_rated_movies(self.user.id)
+        with self.assertNumQueries(0):
+            rated = get_rated_movies(self.user.id)
+        self.assertEqual(rated["liked"], {self.movie.id})
+
+        Rating.objects.set_ratings(
+            self.user.id, {self.movie.id: Rating.DISLIKE}
+        )
+        rated = get_rated_movies(self.user.id)
+        self.assertEqual(rated["liked"], frozenset())
+        self.assertEqual(rated["disliked"], {self.movie.id})
+
+
+class ConditionalGetTest(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.movie = Movie.objects.create(title="Тестовый фильм", year=2023)
+        self.other = Movie.objects.create(title="Другой фильм", year=2020)
+        self.detail_url = reverse("movies:movie_detail", args=[self.movie.id])
+
+    def test_unchanged_page_is_not_rendered(self):
+        for url in (reverse("movies:home"), reverse("movies:movie_list")):
+            etag = self.client.get(url)["ETag"]
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertIn("public", response["Cache-Control"])
+            self.assertIn("no-cache", response["Cache-Control"])
+            self.assertNotIn("Cookie", response.get("Vary", ""))
+
+            # Без заголовков - готовая страница из кэша
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_changes_bump_versions(self):
+        from movies.models import Rating
+
+        user = User.objects.create_user(
+            phone="79998887766", password="testpass123"
+        )
+        etag = self.client.get(self.detail_url)["ETag"]
+        list_etag = self.client.get(reverse("movies:movie_list"))["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(user=user, movie=self.other, text="Отзыв")
+        # Отзыв к другому фильму меняет только общую версию
+        self.assertEqual(self.client.get(self.detail_url)["ETag"], etag)
+        self.assertNotEqual(
+            self.client.get(reverse("movies:movie_list"))["ETag"], list_etag
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.set_ratings(user.id, {self.movie.id: Rating.LIKE})
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["like_count"], 1)
+
+        etag = response["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.title = "Переименованный фильм"
+            self.other.save()
+        self.assertNotEqual(self.client.get(self.detail_url)["ETag"], etag)
+
+    def test_page_is_shared_across_users(self):
+        anonymous = self.client.get(self.detail_url)
+        User.objects.create_user(phone="79998887766", password="testpass123")
+        self.client.login(phone="79998887766", password="testpass123")
+        # Сессия и пользователь не загружаются
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(response.content, anonymous.content)
+        self.assertNotContains(response, "79998887766")
+        self.assertNotContains(response, "csrfmiddlewaretoken")
+
+
+class MovieCardsTest(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.genre = Genre.objects.create(name="Драма")
+        self.movies = [
+            Movie.objects.create(title=f"Фильм {i}", year=2000 + i)
+            for i in range(3)
+        ]
+        for movie in self.movies:
+            movie.genres.add(self.genre)
+
+    def render(self):
+        from movies.cards import render_cards
+
+        return render_cards(Movie.objects.order_by("id"))
+
+    def test_cards_rendered_once(self):
+        html = self.render()
+        self.assertEqual(html.count('class="col"'), 3)
+        self.assertLess(html.index("Фильм 0"), html.index("Фильм 2"))
+        # Фильмы; карточки одним get_many без жанров
+        with self.assertNumQueries(1):
+            self.assertEqual(self.render(), html)
+
+    def test_changes_rerender_cards(self):
+        from movies.models import Rating
+
+        self.render()
+        user = User.objects.create_user(
+            phone="79998887766", password="testpass123"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.set_ratings(
+                user.id, {self.movies[0].id: Rating.LIKE}
+            )
+        with self.assertNumQueries(1):
+            self.render()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.genre.name = "Мелодрама"
+            self.genre.save()
+        self.assertEqual(self.render().count("Мелодрама"), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movies[1].title = "Переименованный"
+            self.movies[1].save()
+            self.movies[2].genres.clear()
+        html = self.render()
+        self.assertIn("Переименованный", html)
+        self.assertEqual(html.count("Мелодрама"), 2)
+
+    def test_stats_follow_counters_without_rerender(self):
+        from movies.cards import render_cards
+
+        self.assertNotIn("лайков", self.render())
+        Movie.objects.filter(pk=self.movies[0].pk).update(
+            like_count=7, review_count=2
+        )
+        movies = list(Movie.objects.order_by("id"))
+        # Сами карточки из кэша, счетчики - с фильмов
+        with self.assertNumQueries(0):
+            html = render_cards(movies, stats=True)
+        self.assertIn("👍 7 лайков", html)
+        self.assertIn("📝 2 отзывов", html)
+        self.assertEqual(html.count("лайков"), 3)
+
+
+class ReviewFeedTest(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.movie = Movie.objects.create(title="Тестовый фильм", year=2023)
+        self.reviews = [
+            Review.objects.create(
+                user=User.objects.create_user(phone=f"7999000{i:04d}"),
+                movie=self.movie,
+                text=f"Отзыв {i}",
+            )
+            for i in range(25)
+        ]
+
+    def test_cursor_walks_all_reviews(self):
+        from movies.reviews import review_page
+
+        url = reverse("movies:movie_reviews", args=[self.movie.id])
+        seen, params = [], {}
+        while True:
+            with self.assertNumQueries(1):
+                data = self.client.get(url, params).json()
+            seen += [review["id"] for review in data["reviews"]]
+            if data["cursor"] is None:
+                break
+            params["cursor"] = data["cursor"]
+
+        expected = sorted(
+            self.reviews, key=lambda r: (r.created_at, r.id), reverse=True
+        )
+        self.assertEqual(seen, [review.id for review in expected])
+        # Битый курсор - первая страница
+        self.assertEqual(
+            review_page(self.movie.id, "!!!")[0], review_page(self.movie.id)[0]
+        )
+
+    def test_review_count_follows_reviews(self):
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.review_count, 25)
+        self.reviews[0].text = "Новый текст"
+        self.reviews[0].save()
+        self.reviews[1].delete()
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.review_count, 24)
+
+
+class BulkRatingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            phone="79998887766", password="testpass123"
+        )
+        self.movies = [
+            Movie.objects.create(title=f"Фильм {i}", year=2000 + i)
+            for i in range(4)
+        ]
+        self.client.login(phone="79998887766", password="testpass123")
+
+    def post(self, pairs):
+        return self.client.post(
+            reverse("movies:rate_movies"),
+            json.dumps({"ratings": pairs}),
+            content_type="application/json",
+        )
+
+    def test_batch_applied_once(self):
+        from movies.models import Rating, ratings_changed
+
+        calls = []
+
+        def receiver(sender, changes, **kwargs):
+            calls.append(changes)
+
+        ratings_changed.connect(receiver)
+        self.addCleanup(ratings_changed.disconnect, receiver)
+
+        first, second, third, _ = self.movies
+        response = self.post(
+            [
+                {"movie_id": first.id, "action": "like"},
+                {"movie_id": second.id, "action": "dislike"},
+                {"movie_id": third.id, "action": "like"},
+                {"movie_id": third.id, "action": "dislike"},
+                {"movie_id": 999999, "action": "like"},
+            ]
+        )
+        data = response.json()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(data["changed"]), 3)
+        self.assertEqual(data["unknown"], [999999])
+        self.assertEqual(
+            data["counters"][str(first.id)],
+            {"like_count": 1, "dislike_count": 0},
+        )
+        self.assertEqual(
+            Rating.objects.get(user=self.user, movie=third).value,
+            Rating.DISLIKE,
+        )
+        self.assertTrue(
+            UserPreferences.objects.filter(user=self.user).exists()
+        )
+
+        data = self.post([{"movie_id": first.id, "action": "remove"}]).json()
+        self.assertEqual(data["changed"], [{"movie_id": first.id, "value": 0}])
+        self.assertEqual(data["counters"][str(first.id)]["like_count"], 0)
+
+    def test_rejects_bad_batches(self):
+        movie_id = self.movies[0].id
+        for pairs in (
+            [],
+            [{"movie_id": movie_id, "action": "love"}],
+            [{"movie_id": "abc", "action": "like"}],
+            [{"movie_id": movie_id, "action": "like"}] * 101,
+            {"movie_id": movie_id},
+        ):
+            self.assertEqual(self.post(pairs).status_code, 400)
+        response = self.client.get(reverse("movies:rate_movies"))
+        self.assertEqual(response.status_code, 405)
+
+
+@override_settings(
+    MOVIES_RANKING_SOFT_TTL=0, MOVIES_RANKING_BACKGROUND_REFRESH=False
+)
+class RankingsTest(CacheIsolationMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.old = Movie.objects.create(title="Старый", year=1990)
+        self.new = Movie.objects.create(title="Новый", year=2020)
+
+    def test_stale_value_served_while_refreshing(self):
+        from movies.rankings import ranked_ids
+        from movies.utils import _new_ids
+
+        calls = []
+
+        def compute(limit):
+            calls.append(limit)
+            return list(_new_ids(limit))
+
+        self.assertEqual(ranked_ids("new", 1, compute), [self.new.id])
+        newest = Movie.objects.create(title="Новейший", year=2024)
+        # Мягкий TTL истек: отдается старый список, пересчет - один
+        self.assertEqual(ranked_ids("new", 1, compute), [self.new.id])
+        self.assertEqual(ranked_ids("new", 1, compute), [newest.id])
+        self.assertEqual(calls, [1, 1, 1])
+
+        # Больший limit считается сразу, меньшие берут его начало
+        self.assertEqual(len(ranked_ids("new", 3, compute)), 3)
+        self.assertEqual(calls[-1], 3)
+
+    def test_lock_stops_parallel_refresh(self):
+        from django.core.cache import cache
+
+        from movies.rankings import _lock_key, ranked_ids
+
+        calls = []
+
+        def compute(limit):
+            calls.append(limit)
+            return [self.old.id]
+
+        ranked_ids("popular", 1, compute)
+        cache.add(_lock_key("popular"), True)
+        # Пересчет уже идет в другом воркере
+        self.assertEqual(ranked_ids("popular", 1, compute), [self.old.id])
+        self.assertEqual(calls, [1])
+
+    def test_lock_taken_on_missing_entry(self):
+        from unittest import mock
+
+        from django.core.cache import cache
+
+        from movies.rankings import _key, _lock_key, ranked_ids
+
+        cache.add(_lock_key("popular"), True)
+        # Записи нет, а считает другой воркер: после ожидания список
+        # считается, но не записывается поверх его результата
+        with mock.patch("movies.rankings.RANKING_WAIT", 0.1):
+            ids = ranked_ids("popular", 1, lambda limit: [self.old.id])
+        self.assertEqual(ids, [self.old.id])
+        self.assertIsNone(cache.get(_key("popular")))
+
+        cache.delete(_lock_key("popular"))
+        ranked_ids("popular", 1, lambda limit: [self.old.id])
+        self.assertIsNotNone(cache.get(_key("popular")))
+        self.assertIsNone(cache.get(_lock_key("popular")))
+
+    def test_changed_ranking_bumps_version(self):
+        from movies.conditional import RANKINGS, get_versions
+        from movies.rankings import ranked_ids
+        from movies.utils import _new_ids
+
+        def version():
+            return get_versions([RANKINGS])[RANKINGS][0]
+
+        ranked_ids("new", 2, _new_ids)
+        before = version()
+        ranked_ids("new", 2, _new_ids)
+        self.assertEqual(version(), before)
+
+        Movie.objects.filter(pk=self.old.pk).update(year=2030)
+        with self.captureOnCommitCallbacks(execute=True):
+            ranked_ids("new", 2, _new_ids)
+        self.assertNotEqual(version(), before)
+
+    def test_home_page_shows_new_movie(self):
+        url = reverse("movies:home")
+        first = self.client.get(url)
+        self.assertNotContains(first, "Brand New")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Movie.objects.create(title="Brand New", year=2030)
+        # Первый запрос еще может получить старый список, пока его
+        # пересчитывают, следующие - уже новый
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(url)
+        for _ in range(3):
+            response = self.client.get(url)
+            self.assertContains(response, "Brand New")
+        self.assertNotEqual(response["ETag"], first["ETag"])
+
+    @override_settings(MOVIES_RANKING_SOFT_TTL=300)
+    def test_invalidation_keeps_stale_ids(self):
+        from movies.rankings import invalidate_ranking, ranked_ids
+
+        calls = []
+
+        def compute(limit):
+            calls.append(limit)
+            return [self.old.id] if len(calls) == 1 else [self.new.id]
+
+        ranked_ids("popular", 1, compute)
+        invalidate_ranking("popular", "new")
+        # Старый список отдается сразу, пересчет идет вместо ожидания
+        self.assertEqual(ranked_ids("popular", 1, compute), [self.old.id])
+        self.assertEqual(ranked_ids("popular", 1, compute), [self.new.id])
+        self.assertEqual(ranked_ids("popular", 1, compute), [self.new.id])
+        self.assertEqual(calls, [1, 1])
+
+
+class QueryPlansTest(TestCase):
+    def test_full_scans_in_plans(self):
+        from movies.query_plans import full_scans
+
+        self.assertEqual(
+            full_scans(
+                "2 0 0 SCAN movies_movie\n"
+                "5 0 0 SEARCH movies_review USING INDEX feed (movie_id=?)"
+            ),
+            ["movies_movie"],
+        )
+        self.assertEqual(
+            full_scans("SCAN movies_movie USING INDEX movies_movie_new_idx"),
+            [],
+        )
+        self.assertEqual(
+            full_scans("Limit\n  ->  Seq Scan on movies_review"),
+            ["movies_review"],
+        )
+
+    def test_catalog_pages_use_indexes(self):
+        from django.core.management import call_command
+        from django.db import connection
+        from io import StringIO
+
+        from movies.query_plans import explain_catalog
+
+        Movie.objects.create(title="Фильм", year=2020, country="США")
+        report = {name: scans for name, _, scans in explain_catalog()}
+        # PostgreSQL на пустых таблицах выбирает Seq Scan и с индексом
+        if connection.vendor == "sqlite":
+            self.assertNotIn("movies_movie", report["movie_list"])
+            self.assertNotIn("movies_review", report["movie_reviews"])
+
+        out = StringIO()
+        call_command("explain_queries", stdout=out)
+        self.assertIn("movie_detail", out.getvalue())
+
+
+class DatabaseSettingsTest(TestCase):
+    def test_profiles_from_url(self):
+        from pathlib import Path
+
+        from django.core.exceptions import ImproperlyConfigured
+
+        from web_cinema_config.database import database_settings
+
+        sqlite = database_settings(None, sqlite_path=Path("db.sqlite3"))
+        self.assertEqual(sqlite["ENGINE"], "web_cinema_config.sqlite")
+
+        postgres = database_settings(
+            "postgres://web:p%40ss@db:6432/cinema?sslmode=require",
+            sqlite_path=None,
+            conn_max_age=30,
+        )
+        self.assertEqual(
+            postgres["ENGINE"], "django.db.backends.postgresql"
+        )
+        self.assertEqual(
+            (postgres["NAME"], postgres["USER"], postgres["PASSWORD"]),
+            ("cinema", "web", "p@ss"),
+        )
+        self.assertEqual((postgres["HOST"], postgres["PORT"]), ("db", "6432"))
+        self.assertEqual(postgres["OPTIONS"], {"sslmode": "require"})
+        self.assertEqual(postgres["CONN_MAX_AGE"], 30)
+        self.assertTrue(postgres["CONN_HEALTH_CHECKS"])
+
+        pooled = database_settings(
+            "postgresql://web@db/cinema", sqlite_path=None, pool_size=8
+        )
+        self.assertEqual(pooled["ENGINE"], "web_cinema_config.postgresql_pool")
+        self.assertEqual((pooled["POOL_SIZE"], pooled["CONN_MAX_AGE"]), (8, 0))
+
+        with self.assertRaises(ImproperlyConfigured):
+            database_settings("mysql://db/cinema", sqlite_path=None)
+
+
+class CacheSettingsTest(TestCase):
+    def test_profiles_from_url(self):
+        from django.core.exceptions import ImproperlyConfigured
+
+        from web_cinema_config.caches import CACHE_ALIASES, cache_settings
+
+        locmem = cache_settings(None, file_root="/tmp/cache")
+        self.assertEqual(list(locmem), list(CACHE_ALIASES))
+        self.assertEqual(
+            locmem["fragments"]["BACKEND"],
+            "django.core.cache.backends.locmem.LocMemCache",
+        )
+        self.assertEqual(
+            {cache["LOCATION"] for cache in locmem.values()},
+            set(CACHE_ALIASES),
+        )
+
+        files = cache_settings("file://", file_root="/tmp/cache")
+        self.assertEqual(
+            files["counters"]["LOCATION"], "/tmp/cache/counters"
+        )
+        files = cache_settings("file:///var/cache/web/", file_root=None)
+        self.assertEqual(
+            files["counters"]["LOCATION"], "/var/cache/web/counters"
+        )
+
+        redis = cache_settings("redis://:secret@cache:6379/1", None)
+        self.assertEqual(
+            redis["recommendations"]["BACKEND"],
+            "django.core.cache.backends.redis.RedisCache",
+        )
+        self.assertEqual(
+            redis["recommendations"]["LOCATION"],
+            "redis://:secret@cache:6379/1",
+        )
+        self.assertEqual(
+            {cache["KEY_PREFIX"] for cache in redis.values()},
+            set(CACHE_ALIASES),
+        )
+
+        with self.assertRaises(ImproperlyConfigured):
+            cache_settings("memcached://cache:11211", file_root=None)
+
+
+class CachingTest(CacheIsolationMixin, TestCase):
+    def test_bump_invalidates_namespace(self):
+        from movies.caching import FRAGMENTS, bump_namespace, get_or_compute
+
+        calls = []
+
+        def cached(key, *namespaces):
+            return get_or_compute(
+                FRAGMENTS,
+                key,
+                lambda: calls.append(key) or len(calls),
+                60,
+                namespaces=namespaces,
+            )
+
+        self.assertEqual(cached("a", "catalog"), 1)
+        self.assertEqual(cached("b", "catalog", "user"), 2)
+        self.assertEqual(cached("a", "catalog"), 1)
+        self.assertEqual(cached("b", "catalog", "user"), 2)
+
+        bump_namespace("user")
+        self.assertEqual(cached("a", "catalog"), 1)
+        self.assertEqual(cached("b", "catalog", "user"), 3)
+
+        bump_namespace("catalog")
+        self.assertEqual(cached("a", "catalog"), 4)
+        self.assertEqual(cached("b", "catalog", "user"), 5)
+
+    def test_versions_survive_cleared_counters(self):
+        from django.core.cache import caches
+
+        from movies.caching import (
+            COUNTERS,
+            _namespace_key,
+            bump_namespace,
+            key_version,
+        )
+
+        version = key_version("catalog")
+        bump_namespace("catalog")
+        self.assertNotEqual(key_version("catalog"), version)
+
+        bumped = key_version("catalog")
+        # Счетчик вытеснен из кэша
+        caches[COUNTERS].delete(_namespace_key("catalog"))
+        self.assertNotIn(key_version("catalog"), {version, bumped})
+
+
+@override_settings(DATABASE_REPLICAS=["replica1", "replica2"])
+class ReplicaRouterTest(TestCase):
+    def read_db(self, model=Movie):
+        from web_cinema_config.routers import ReplicaRouter
+
+        return ReplicaRouter().db_for_read(model)
+
+    def test_reads_outside_transaction(self):
+        from unittest import mock
+
+        from django.db import connection
+
+        from web_cinema_config.routers import ReplicaRouter, replica_reads
+
+        # TestCase держит тест в транзакции, а в ней читается основная база
+        with replica_reads():
+            self.assertEqual(self.read_db(), "default")
+
+        with mock.patch.object(connection, "in_atomic_block", False):
+            self.assertEqual(self.read_db(), "default")
+            with replica_reads():
+                replica = self.read_db()
+                self.assertIn(replica, ["replica1", "replica2"])
+                self.assertEqual(self.read_db(Genre), replica)
+                self.assertEqual(self.read_db(User), "default")
+            with replica_reads():
+                self.assertNotEqual(self.read_db(), replica)
+
+            with replica_reads(pinned=True):
+                self.assertEqual(self.read_db(), "default")
+
+            with replica_reads() as state:
+                self.read_db()
+                ReplicaRouter().db_for_write(User)
+                self.assertFalse(state["wrote"])
+                ReplicaRouter().db_for_write(Movie)
+                self.assertEqual(self.read_db(), "default")
+
+    def test_cached_pages_render_from_primary(self):
+        from unittest import mock
+
+        from django.db import connection
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+
+        from movies.conditional import CATALOG, catalog_page
+        from web_cinema_config.routers import replica_reads
+
+        reads = []
+
+        @catalog_page(CATALOG)
+        def view(request):
+            reads.append(self.read_db())
+            return HttpResponse()
+
+        request = RequestFactory().get("/catalog-page/")
+        with mock.patch.object(connection, "in_atomic_block", False):
+            with replica_reads():
+                view(request)
+                self.assertIn(self.read_db(), ["replica1", "replica2"])
+        self.assertEqual(reads, ["default"])
+
+    @override_settings(DATABASE_REPLICA_SELECTION="least_recent")
+    def test_least_recent_selection(self):
+        from web_cinema_config.routers import choose_replica
+
+        first = choose_replica(["replica1", "replica2"])
+        second = choose_replica(["replica1", "replica2"])
+        self.assertNotEqual(first, second)
+        self.assertEqual(choose_replica(["replica1", "replica2"]), first)
+
+    @override_settings(DATABASE_REPLICAS=["default"])
+    def test_write_pins_browser_to_primary(self):
+        from web_cinema_config.routers import PIN_COOKIE
+
+        movie = Movie.objects.create(title="Фильм", year=2020)
+        user = User.objects.create_user(
+            phone="79998887766", password="testpass123"
+        )
+        self.client.force_login(user)
+
+        response = self.client.get(reverse("movies:movie_list"))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        response = self.client.post(
+            reverse("movies:rate_movie", args=[movie.id]), {"action": "like"}
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+
+class SqliteModeTest(TestCase):
+    def test_connection_pragmas(self):
+        from django.db import connection
+
+        if connection.vendor != "sqlite":
+            self.skipTest("Режим только для SQLite")
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    def test_retry_on_lock(self):
+        from contextlib import nullcontext
+        from unittest import mock
+
+        from django.db import OperationalError, connection
+
+        from movies.sqlite import retry_on_lock
+
+        calls = []
+
+        @retry_on_lock
+        def write(error="database is locked"):
+            calls.append(error)
+            if len(calls) < 3:
+                raise OperationalError(error)
+            return len(calls)
+
+        # Повторы работают только вне транзакции, а TestCase держит свою
+        with mock.patch.object(
+            connection, "in_atomic_block", False
+        ), mock.patch(
+            "movies.sqlite.transaction.atomic", nullcontext
+        ), mock.patch(
+            "movies.sqlite.time.sleep"
+        ) as sleep:
+            self.assertEqual(write(), 3)
+            self.assertEqual(sleep.call_count, 2)
+
+            calls.clear()
+            with override_settings(SQLITE_WRITE_RETRIES=1):
+                with self.assertRaises(OperationalError):
+                    write()
+
+            calls.clear()
+            with self.assertRaises(OperationalError):
+                write("no such table: movies_movie")
+            self.assertEqual(len(calls), 1)
+
+        # Внутри чужой транзакции - без повторов
+        calls.clear()
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 1)
@@ -0,0 +1,136 @@
+"""
+Тренды: почасовые суммы оценок и рейтинг с экспоненциальным затуханием.
+
+Изменения оценок после коммита прибавляются к часовым строкам
+MovieActivity через F(), одной короткой транзакцией на запрос: буфер в
+памяти воркера терял бы активность при его перезапуске. Команда
+refresh_trending периодически пересчитывает рейтинг за окно
+TRENDING_WINDOW и записывает top-N в TrendingMovie.
+"""
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from movies.conditional import bump_catalog_version
+from movies.models import Movie, MovieActivity, Rating, TrendingMovie
+from movies.rankings import invalidate_ranking
+from movies.sqlite import retry_on_lock
+
+
+TRENDING_WINDOW = timedelta(days=7)
+TRENDING_HALF_LIFE = timedelta(hours=24)
+TRENDING_DISLIKE_WEIGHT = 0.5
+TRENDING_TOP_N = 100
+
+
+def hour_bucket(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def record_rating_changes(changes, moment=None):
+    """
+    Прибавляет изменения оценок (movie_id, старое, новое) к активности
+    их часа. Снятый лайк вычитается из часа, в котором его сняли.
+    Возвращает число затронутых строк
+    """
+    bucket = hour_bucket(moment or timezone.now())
+    pending = defaultdict(lambda: [0, 0])
+    for movie_id, old, new in changes:
+        counts = pending[movie_id, bucket]
+        for value, delta in ((old, -1), (new, 1)):
+            if value == Rating.LIKE:
+                counts[0] += delta
+            elif value == Rating.DISLIKE:
+                counts[1] += delta
+    pending = {key: counts for key, counts in pending.items() if any(counts)}
+    if not pending:
+        return 0
+    return _add_activity(pending)
+
+
+@retry_on_lock
+def _add_activity(pending):
+    # Фильм могли удалить между коммитом оценки и этой записью
+    existing = set(
+        Movie.objects.filter(
+            id__in={movie_id for movie_id, _ in pending}
+        ).values_list("id", flat=True)
+    )
+    pending = {
+        key: counts for key, counts in pending.items() if key[0] in existing
+    }
+    MovieActivity.objects.bulk_create(
+        [
+            MovieActivity(movie_id=movie_id, bucket=bucket)
+            for movie_id, bucket in pending
+        ],
+        ignore_conflicts=True,
+    )
+    for (movie_id, bucket), (likes, dislikes) in pending.items():
+        MovieActivity.objects.filter(movie_id=movie_id, bucket=bucket).update(
+            likes=F("likes") + likes, dislikes=F("dislikes") + dislikes
+        )
+    return len(pending)
+
+
+def compute_trending_scores(now=None):
+    """
+    Рейтинг тренда по окну: сумма (лайки - w * дизлайки) по часам,
+    каждый час с весом 2^(-возраст / период полураспада)
+    """
+    now = now or timezone.now()
+    rows = np.array(
+        [
+            (movie_id, (now - bucket).total_seconds(), likes, dislikes)
+            for movie_id, bucket, likes, dislikes in (
+                MovieActivity.objects.filter(
+                    bucket__gte=now - TRENDING_WINDOW
+                ).values_list("movie_id", "bucket", "likes", "dislikes")
+            )
+        ],
+        dtype=np.float64,
+    ).reshape(-1, 4)
+    if not len(rows):
+        return {}
+
+    decay = np.exp(
+        -math.log(2) * rows[:, 1] / TRENDING_HALF_LIFE.total_seconds()
+    )
+    weights = decay * (rows[:, 2] - TRENDING_DISLIKE_WEIGHT * rows[:, 3])
+    movie_ids, index = np.unique(rows[:, 0], return_inverse=True)
+    scores = np.bincount(index, weights=weights)
+    return dict(zip(movie_ids.astype(np.int64).tolist(), scores.tolist()))
+
+
+def refresh_trending(top_n=TRENDING_TOP_N, now=None):
+    """
+    Пересчитывает рейтинг и заменяет TrendingMovie. Часы старше окна
+    больше не нужны и удаляются
+    """
+    now = now or timezone.now()
+    scores = compute_trending_scores(now)
+    ranked = sorted(
+        ((score, movie_id) for movie_id, score in scores.items() if score > 0),
+        reverse=True,
+    )[:top_n]
+
+    with transaction.atomic():
+        TrendingMovie.objects.all().delete()
+        TrendingMovie.objects.bulk_create(
+            TrendingMovie(
+                movie_id=movie_id, rank=rank, score=score, refreshed_at=now
+            )
+            for rank, (score, movie_id) in enumerate(ranked, 1)
+        )
+        MovieActivity.objects.filter(
+            bucket__lt=hour_bucket(now - TRENDING_WINDOW)
+        ).delete()
+    transaction.on_commit(lambda: invalidate_ranking("trending"))
+    bump_catalog_version()
+    return len(ranked)
@@ -8,10 +8,19 @@ app_name = "movies"
 urlpatterns = [
     path("", views.home, name="home"),
     path("movies/", views.movie_list, name="movie_list"),
+    path("movies/page/", views.movie_page, name="movie_page"),
     path("search/", views.search, name="search"),
+    path("autocomplete/", views.autocomplete, name="autocomplete"),
+    path("fragments/", views.fragments, name="fragments"),
     path("movie/<int:movie_id>/", views.movie_detail, name="movie_detail"),
+    path(
+        "movie/<int:movie_id>/reviews/",
+        views.movie_reviews,
+        name="movie_reviews",
+    ),
     path("movie/<int:movie_id>/review/", views.add_review, name="add_review"),
     path("movie/<int:movie_id>/rate/", views.rate_movie, name="rate_movie"),
+    path("ratings/", views.rate_movies, name="rate_movies"),
     path(
         "preferences/",
         views.set_genre_preferences,
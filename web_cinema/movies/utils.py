@@ -1,47 +1,92 @@
 import random
+from django.conf import settings
 from django.db.models import Count, Q, Avg
-from movies.models import Movie, UserPreferences, Genre, Review
+from movies.models import (
+    Movie, MovieSimilarity, Rating, RecommendationCache, UserPreferences, Genre,
+    Review
+)
+from movies.caching import RECOMMENDATIONS, get_or_compute
+from movies.rankings import ranked_movies
+from movies.recommender import MODEL_NAMESPACE, recommend_movie_ids
+from movies.similarity import SIMILARITY_THRESHOLD
+from movies.viewer import get_rated_movies, viewer_namespace
 from django.contrib.auth.models import User
 
 
 def get_recommendations(user, limit=10):
     """
-    Простая система рекомендаций на основе любимых жанров
+    Персональные рекомендации: id выдачи лежат в кэше RECOMMENDATIONS,
+    пока не изменятся оценки и жанры пользователя или модель
+    """
+    movie_ids = get_or_compute(
+        RECOMMENDATIONS,
+        f"movies:recommendations:{user.id}:{limit}",
+        lambda: _recommendation_ids(user, limit),
+        settings.MOVIES_RECOMMENDATIONS_CACHE_TTL,
+        namespaces=[viewer_namespace(user.id), MODEL_NAMESPACE],
+    )
+    movies = Movie.objects.in_bulk(movie_ids)
+    return [movies[movie_id] for movie_id in movie_ids if movie_id in movies]
+
+
+def _recommendation_ids(user, limit):
+    """
+    Сначала из таблицы ночного предрасчета, для пользователей без
+    нее - живой расчет
+    """
+    cached = RecommendationCache.objects.filter(user_id=user.id).first()
+    if cached is not None:
+        return cached.movie_ids[:limit]
+    return [movie.id for movie in compute_recommendations(user, limit)]
+
+
+def compute_recommendations(user, limit=10):
+    """
+    Живой расчет рекомендаций по эмбеддингам ALS-модели.
+    Если модель еще не знает пользователя - рекомендации по любимым жанрам
     """
     try:
         prefs = UserPreferences.objects.get(user=user)
     except UserPreferences.DoesNotExist:
         return get_popular_movies(limit)
 
-    # Фильмы в любимых жанрах пользователя
-    genre_movies = Movie.objects.filter(genres__in=prefs.favorite_genres.all())
-
     # Исключаем уже оцененные фильмы
-    try:
-        user_prefs = UserPreferences.objects.get(user=user)
-        rated_movies = list(user_prefs.liked_movies.values_list('id', flat=True)) + \
-                       list(user_prefs.disliked_movies.values_list('id', flat=True))
-        genre_movies = genre_movies.exclude(id__in=rated_movies)
-    except UserPreferences.DoesNotExist:
-        pass
+    rated = get_rated_movies(user.id)
+    rated_movies = list(rated['liked'] | rated['disliked'])
+
+    movie_ids = recommend_movie_ids(user.id, rated_movies, limit)
+    if movie_ids:
+        movies = Movie.objects.in_bulk(movie_ids)
+        return [movies[movie_id] for movie_id in movie_ids if movie_id in movies]
+
+    # Холодный старт: случайные фильмы в любимых жанрах пользователя
+    genre_movie_ids = Movie.objects.filter(
+        genres__in=prefs.favorite_genres.all()
+    ).values('id')
+    recommendations = list(
+        Movie.objects.filter(id__in=genre_movie_ids)
+        .exclude(id__in=rated_movies)
+        .order_by('?')[:limit]
+    )
 
     # Если мало рекомендаций - добавляем популярные
-    if genre_movies.count() < limit:
-        popular = get_popular_movies(limit - genre_movies.count())
-        recommendations = list(genre_movies) + list(popular)
-    else:
-        recommendations = list(genre_movies)
+    if len(recommendations) < limit:
+        recommendations += list(get_popular_movies(limit - len(recommendations)))
 
     # Перемешиваем для разнообразия
     random.shuffle(recommendations)
-    return recommendations[:limit]
+    return recommendations
+
+
+def _popular_ids(limit):
+    return Movie.objects.filter(like_count__gte=1) \
+        .order_by('-like_count') \
+        .values_list('id', flat=True)[:limit]
 
 
 def get_popular_movies(limit=10):
-    """Самые популярные фильмы по лайкам"""
-    return Movie.objects.annotate(
-        like_count=Count('liked_by')
-    ).filter(like_count__gte=1).order_by('-like_count')[:limit]
+    """Самые популярные фильмы по лайкам, из кэша movies.rankings"""
+    return ranked_movies('popular', limit, _popular_ids)
 
 
 def calculate_item_similarity(movie1, movie2):
@@ -49,29 +94,23 @@ def calculate_item_similarity(movie1, movie2):
     Вычисляет схожесть между двумя фильмами
     на основе оценок пользователей
     """
-    # Пользователи, которые оценили оба фильма
-    users_movie1 = set(UserPreferences.objects.filter(
-        Q(liked_movies=movie1) | Q(disliked_movies=movie1)
-    ).values_list('user_id', flat=True))
-
-    users_movie2 = set(UserPreferences.objects.filter(
-        Q(liked_movies=movie2) | Q(disliked_movies=movie2)
-    ).values_list('user_id', flat=True))
+    # Оценки каждого фильма: пользователь -> +1/-1
+    ratings1 = dict(
+        Rating.objects.filter(movie=movie1).values_list('user_id', 'value')
+    )
+    ratings2 = dict(
+        Rating.objects.filter(movie=movie2).values_list('user_id', 'value')
+    )
 
-    common_users = users_movie1.intersection(users_movie2)
+    common_users = ratings1.keys() & ratings2.keys()
 
     if not common_users:
         return 0.0  # Нет общих пользователей - схожесть 0
 
     # Для общих пользователей считаем совпадение оценок
-    match_count = 0
-    for user_id in common_users:
-        prefs = UserPreferences.objects.get(user_id=user_id)
-        rating1 = 1 if prefs.liked_movies.filter(id=movie1.id).exists() else -1
-        rating2 = 1 if prefs.liked_movies.filter(id=movie2.id).exists() else -1
-
-        if rating1 == rating2:
-            match_count += 1
+    match_count = sum(
+        1 for user_id in common_users if ratings1[user_id] == ratings2[user_id]
+    )
 
     similarity = match_count / len(common_users)
     return similarity
@@ -85,41 +124,32 @@ def get_similar_movies(movie, user, limit=5):
     # Исключаем уже оцененные пользователем фильмы
     rated_movie_ids = []
     if user.is_authenticated:
-        try:
-            prefs = UserPreferences.objects.get(user=user)
-            rated_movie_ids = list(prefs.liked_movies.values_list('id', flat=True)) + \
-                              list(prefs.disliked_movies.values_list('id', flat=True))
-        except UserPreferences.DoesNotExist:
-            pass
-
-    # 1. Item-based подход - анализируем все фильмы
-    item_based_recs = []
-    all_movies = Movie.objects.exclude(id=movie.id)
-
-    movie_similarities = []
-    for similar_movie in all_movies:
-        # Пропускаем уже оцененные пользователем фильмы
-        if similar_movie.id in rated_movie_ids:
-            continue
-
-        similarity = calculate_item_similarity(movie, similar_movie)
-        if similarity > 0.5:  # Порог схожести
-            movie_similarities.append((similar_movie, similarity))
-
-    # Сортируем по схожести
-    movie_similarities.sort(key=lambda x: x[1], reverse=True)
-    item_based_recs = [m for m, s in movie_similarities]
+        rated = get_rated_movies(user.id)
+        rated_movie_ids = list(rated['liked'] | rated['disliked'])
+
+    # 1. Item-based подход - предрасчитанные соседи фильма
+    neighbours = (
+        MovieSimilarity.objects.filter(
+            movie=movie, score__gt=SIMILARITY_THRESHOLD
+        )
+        .exclude(similar_movie_id__in=rated_movie_ids)
+        .select_related("similar_movie")
+        .order_by("-score", "-support")[:limit]
+    )
+    item_based_recs = [n.similar_movie for n in neighbours]
 
     # 2. Content-based по жанрам (если item-based рекомендаций мало)
     if len(item_based_recs) < limit:
-        content_based_recs = Movie.objects.filter(genres__in=movie.genres.all()) \
+        # Жанры берутся из prefetch, если он был
+        genre_ids = [genre.id for genre in movie.genres.all()]
+        content_based_recs = Movie.objects.filter(genres__in=genre_ids) \
             .exclude(id=movie.id) \
             .exclude(id__in=rated_movie_ids) \
+            .exclude(id__in=[m.id for m in item_based_recs]) \
             .annotate(
-            common_genres=Count('genres', filter=Q(genres__in=movie.genres.all())),
-            like_count=Count('liked_by')
+            common_genres=Count('genres', filter=Q(genres__in=genre_ids))
         ) \
-            .order_by('-common_genres', '-year', '-like_count')
+            .order_by('-common_genres', '-year', '-like_count')[:limit]
         recommendations = list(item_based_recs) + list(content_based_recs)
     else:
         recommendations = item_based_recs
@@ -135,15 +165,33 @@ def get_similar_movies(movie, user, limit=5):
     return unique_recommendations[:limit]
 
 
+def _new_ids(limit):
+    return Movie.objects.order_by('-year', '-like_count') \
+        .values_list('id', flat=True)[:limit]
+
+
 def get_new_movies(limit=5):
-    """Новые фильмы"""
-    return Movie.objects.annotate(
-        like_count=Count('liked_by')
-    ).order_by('-year', '-like_count')[:limit]
+    """Новые фильмы, из кэша movies.rankings"""
+    return ranked_movies('new', limit, _new_ids)
+
+
+def _trending_ids(limit):
+    trending = list(
+        Movie.objects.filter(trending__isnull=False)
+        .order_by('trending__rank')
+        .values_list('id', flat=True)[:limit]
+    )
+    if trending:
+        return trending
+    return Movie.objects.filter(year__gte=2020) \
+        .order_by('-like_count', '-year') \
+        .values_list('id', flat=True)[:limit]
 
 
 def get_trending_movies(limit=8):
-    """Трендовые фильмы"""
-    return Movie.objects.annotate(
-        like_count=Count('liked_by')
-    ).filter(year__gte=2020).order_by('-like_count', '-year')[:limit]
\ No newline at end of file
+    """
+    Трендовые фильмы из таблицы, которую пересчитывает refresh_trending.
+    Пока она пуста - свежие фильмы по числу лайков. Из кэша
+    movies.rankings
+    """
+    return ranked_movies('trending', limit, _trending_ids)
@@ -0,0 +1,51 @@
+"""
+Оценки пользователя в кэше: множества лайкнутых и дизлайкнутых id.
+
+Запись лежит в кэше RECOMMENDATIONS в пространстве пользователя:
+каждое изменение оценок поднимает его версию, и старые записи просто
+перестают читаться, пока не истечет их TTL. Используется страницей
+фильма, похожими фильмами и расчетом рекомендаций.
+"""
+from movies.caching import RECOMMENDATIONS, bump_namespace, get_or_compute
+from movies.models import Rating
+
+
+VIEWER_CACHE_TTL = 60 * 60
+
+
+def viewer_namespace(user_id):
+    """Пространство закэшированных данных пользователя, см. movies.caching"""
+    return f"viewer:{user_id}"
+
+
+def _load_rated_movies(user_id):
+    liked, disliked = set(), set()
+    for movie_id, value in Rating.objects.filter(user_id=user_id).values_list(
+        "movie_id", "value"
+    ):
+        (liked if value == Rating.LIKE else disliked).add(movie_id)
+    return {"liked": frozenset(liked), "disliked": frozenset(disliked)}
+
+
+def get_rated_movies(user_id):
+    """
+    Оценки пользователя {"liked": frozenset, "disliked": frozenset}:
+    из кэша или одним запросом
+    """
+    if user_id is None:
+        return {"liked": frozenset(), "disliked": frozenset()}
+    return get_or_compute(
+        RECOMMENDATIONS,
+        f"movies:viewer:{user_id}:ratings",
+        lambda: _load_rated_movies(user_id),
+        VIEWER_CACHE_TTL,
+        namespaces=[viewer_namespace(user_id)],
+    )
+
+
+def bump_viewer_version(user_id):
+    """
+    Делает недействительными закэшированные оценки и рекомендации
+    пользователя
+    """
+    bump_namespace(viewer_namespace(user_id))
@@ -1,103 +1,216 @@
+import json
+
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Q
+from django.db.models import prefetch_related_objects
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse
-
-from movies.models import Genre, Movie, Review, UserPreferences
-from movies.utils import get_new_movies, get_recommendations, get_trending_movies
-from movies.utils import get_similar_movies
-
-
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_POST
+
+from movies.models import Genre, Movie, Rating, Review, UserPreferences
+from movies.autocomplete import suggest
+from movies.conditional import CATALOG, CONTENT, RANKINGS, catalog_page
+from movies.detail import load_movie_detail
+from movies.filters import FACET_PARAMS, filter_movies, get_facets
+from movies.fragments import render_fragments
+from movies.pagination import movie_cards
+from movies.reviews import review_page
+from movies.sqlite import retry_on_lock
+from movies.utils import get_new_movies, get_popular_movies
+from movies.utils import get_recommendations, get_trending_movies
+from movies.viewer import bump_viewer_version
+
+
+# Действия с оценкой -> значение Rating, 0 снимает оценку
+RATING_ACTIONS = {"like": Rating.LIKE, "dislike": Rating.DISLIKE, "remove": 0}
+# Сколько оценок принимает rate_movies за один запрос
+BULK_RATINGS_LIMIT = 100
+
+
+@catalog_page(CATALOG, RANKINGS)
 def home(request):
     """Главная страница"""
-    popular_movies = (
-        Movie.objects.annotate(like_count=Count("liked_by"))
-        .filter(like_count__gte=1)
-        .order_by("-like_count")[:8]
-    )
-
-    new_movies = Movie.objects.order_by("-year")[:6]
+    # Списки из кэша stale-while-revalidate, см. movies.rankings
+    popular_movies = get_popular_movies(8)
+    new_movies = get_new_movies(6)
+    trending_movies = get_trending_movies(8)
 
     return render(
         request,
         "movies/home.html",
-        {"popular_movies": popular_movies, "new_movies": new_movies},
+        {
+            "popular_movies": popular_movies,
+            "new_movies": new_movies,
+            "trending_movies": trending_movies,
+        },
     )
 
 
+def _next_page_urls(request, cursor, page_url=None):
+    """
+    Ссылки на следующую страницу: обычная и JSON для подгрузки,
+    по умолчанию - страницы каталога
+    """
+    if cursor is None:
+        return None, None
+    params = request.GET.copy()
+    params["cursor"] = cursor
+    query = params.urlencode()
+    page_url = page_url or reverse("movies:movie_page")
+    return f"{request.path}?{query}", f"{page_url}?{query}"
+
+
+def _facet_links(request):
+    """
+    Фасеты текущей выборки со ссылками: выбрать значение или,
+    если оно уже выбрано, снять фильтр
+    """
+    links = {}
+    for name, values in get_facets(request.GET).items():
+        param = FACET_PARAMS[name]
+        links[name] = []
+        for value, count in values:
+            params = request.GET.copy()
+            params.pop("cursor", None)
+            active = params.get(param, "").strip() == str(value)
+            if active:
+                params.pop(param)
+            else:
+                params[param] = value
+            links[name].append(
+                {
+                    "value": value,
+                    "count": count,
+                    "active": active,
+                    "url": f"{request.path}?{params.urlencode()}",
+                }
+            )
+    return links
+
+
+@catalog_page(CATALOG)
 def movie_list(request):
     """Список всех фильмов"""
-    movies = Movie.objects.all()
-    genres = Genre.objects.all()
+    movies, cursor = movie_cards(filter_movies(request.GET), request.GET)
+    next_url, next_page_url = _next_page_urls(request, cursor)
 
-    # Фильтрация
-    genre_filter = request.GET.get("genre")
-    year_filter = request.GET.get("year")
-    country_filter = request.GET.get("country")
+    return render(
+        request,
+        "movies/movie_list.html",
+        {
+            "movies": movies,
+            "facets": _facet_links(request),
+            "next_url": next_url,
+            "next_page_url": next_page_url,
+        },
+    )
 
-    if genre_filter:
-        movies = movies.filter(genres__name=genre_filter)
-    if year_filter:
-        movies = movies.filter(year=year_filter)
-    if country_filter:
-        movies = movies.filter(country__icontains=country_filter)
 
-    return render(
-        request, "movies/movie_list.html", {"movies": movies, "genres": genres}
+def movie_page(request):
+    """Следующая страница каталога в JSON для бесконечной прокрутки"""
+    movies, cursor = movie_cards(filter_movies(request.GET), request.GET)
+    _, next_page_url = _next_page_urls(request, cursor)
+    prefetch_related_objects(movies, "genres")
+
+    return JsonResponse(
+        {
+            "movies": [
+                {
+                    "id": movie.id,
+                    "title": movie.title,
+                    "year": movie.year,
+                    "director": movie.director,
+                    "image_url": movie.image_url,
+                    "genres": [genre.name for genre in movie.genres.all()],
+                    "url": reverse("movies:movie_detail", args=[movie.id]),
+                }
+                for movie in movies
+            ],
+            "html": render_to_string(
+                "movies/includes/movie_cards.html",
+                {"movies": movies},
+                request=request,
+            ),
+            "cursor": cursor,
+            "next": next_page_url,
+        }
     )
 
+
+@catalog_page(CONTENT, "movie:{movie_id}")
 def movie_detail(request, movie_id):
     """Детальная страница фильма"""
-    movie = get_object_or_404(Movie, id=movie_id)
-    user_review = None
-    user_liked = False
-    user_disliked = False
-
-    if request.user.is_authenticated:
-        try:
-            user_review = Review.objects.get(user=request.user, movie=movie)
-        except Review.DoesNotExist:
-            pass
-
-        # Проверяем, лайкнул ли пользователь фильм
-        try:
-            prefs = UserPreferences.objects.get(user=request.user)
-            user_liked = prefs.liked_movies.filter(id=movie.id).exists()
-            user_disliked = prefs.disliked_movies.filter(id=movie.id).exists()
-        except UserPreferences.DoesNotExist:
-            pass
-
-    # Статистика фильма
-    like_count = movie.liked_by.count()
-    dislike_count = movie.disliked_by.count()
-
-    # Все отзывы к фильму
-    reviews = (
-        Review.objects.filter(movie=movie)
-        .select_related("user")
-        .order_by("-created_at")
+    context = load_movie_detail(movie_id, request.GET.get("cursor"))
+    context["next_url"], context["next_page_url"] = _next_page_urls(
+        request,
+        context["reviews_cursor"],
+        reverse("movies:movie_reviews", args=[movie_id]),
     )
+    return render(request, "movies/movie_detail.html", context)
 
-    # Похожие фильмы (используем улучшенный item-based подход)
-    similar_movies = get_similar_movies(movie, request.user, limit=4)
 
-    return render(
-        request,
-        "movies/movie_detail.html",
+@catalog_page("movie:{movie_id}")
+def movie_reviews(request, movie_id):
+    """Следующая страница отзывов фильма в JSON для подгрузки"""
+    reviews, cursor = review_page(movie_id, request.GET.get("cursor"))
+    _, next_page_url = _next_page_urls(
+        request, cursor, reverse("movies:movie_reviews", args=[movie_id])
+    )
+
+    return JsonResponse(
         {
-            "movie": movie,
-            "user_review": user_review,
-            "user_liked": user_liked,
-            "user_disliked": user_disliked,
-            "like_count": like_count,
-            "dislike_count": dislike_count,
-            "reviews": reviews,
-            "similar_movies": similar_movies,
-        },
+            "reviews": [
+                {
+                    "id": review.id,
+                    "user": review.user.phone,
+                    "text": review.text,
+                    "created_at": review.created_at.isoformat(),
+                }
+                for review in reviews
+            ],
+            "html": render_to_string(
+                "movies/includes/review_list.html",
+                {"reviews": reviews},
+                request=request,
+            ),
+            "cursor": cursor,
+            "next": next_page_url,
+        }
+    )
+
+
+@never_cache
+def fragments(request):
+    """Персональные блоки общей страницы в JSON, см. movies.fragments"""
+    return JsonResponse(
+        render_fragments(
+            request, request.GET.getlist("slot"), request.GET.get("movie")
+        )
     )
 
 
+@retry_on_lock
+def _save_review(user, movie, text):
+    """Создает или обновляет отзыв; True, если отзыв новый"""
+    review, created = Review.objects.get_or_create(
+        user=user, movie=movie, defaults={"text": text}
+    )
+    if not created:
+        review.text = text
+        review.save()
+    return created
+
+
+@retry_on_lock
+def _save_ratings(user, values):
+    """Оценки пользователя вместе с его предпочтениями, одной транзакцией"""
+    UserPreferences.objects.get_or_create(user=user)
+    return Rating.objects.set_ratings(user.id, values)
+
+
 @login_required
 def add_review(request, movie_id):
     """Добавление отзыва"""
@@ -115,17 +228,10 @@ def add_review(request, movie_id):
             )
             return redirect("movies:movie_detail", movie_id=movie_id)
 
-        # Создаем или обновляем отзыв
-        review, created = Review.objects.get_or_create(
-            user=request.user, movie=movie, defaults={"text": review_text}
-        )
-
-        if not created:
-            review.text = review_text
-            review.save()
-            messages.success(request, "Отзыв обновлен!")
-        else:
+        if _save_review(request.user, movie, review_text):
             messages.success(request, "Отзыв добавлен!")
+        else:
+            messages.success(request, "Отзыв обновлен!")
 
         return redirect("movies:movie_detail", movie_id=movie_id)
 
@@ -137,27 +243,83 @@ def rate_movie(request, movie_id):
         movie = get_object_or_404(Movie, id=movie_id)
         action = request.POST.get("action")  # like или dislike
 
-        # Получаем или создаем предпочтения пользователя
-        prefs, created = UserPreferences.objects.get_or_create(
-            user=request.user
-        )
-
         if action == "like":
-            prefs.liked_movies.add(movie)
-            prefs.disliked_movies.remove(movie)
+            _save_ratings(request.user, {movie.id: Rating.LIKE})
             messages.success(request, "Фильм добавлен в понравившиеся!")
         elif action == "dislike":
-            prefs.disliked_movies.add(movie)
-            prefs.liked_movies.remove(movie)
+            _save_ratings(request.user, {movie.id: Rating.DISLIKE})
             messages.success(request, "Фильм добавлен в не понравившиеся!")
         elif action == "remove":
-            prefs.liked_movies.remove(movie)
-            prefs.disliked_movies.remove(movie)
+            _save_ratings(request.user, {movie.id: 0})
             messages.success(request, "Оценка удалена!")
 
         return redirect("movies:movie_detail", movie_id=movie_id)
 
 
+def _parse_bulk_ratings(body):
+    """
+    {movie_id: значение} из тела {"ratings": [{"movie_id": 1,
+    "action": "like"}, ...]}; при повторе фильма побеждает последняя
+    пара. Для неверного тела - None
+    """
+    try:
+        pairs = json.loads(body)["ratings"]
+        if not isinstance(pairs, list):
+            return None
+        if not 0 < len(pairs) <= BULK_RATINGS_LIMIT:
+            return None
+        return {
+            int(pair["movie_id"]): RATING_ACTIONS[pair["action"]]
+            for pair in pairs
+        }
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+@login_required
+@require_POST
+def rate_movies(request):
+    """
+    Пакет оценок одним запросом, например для онбординга. Все пары
+    пишутся в одной транзакции пачкой, счетчики и кэши обновляются
+    один раз на пакет. Ответ - JSON с новыми счетчиками фильмов
+    """
+    values = _parse_bulk_ratings(request.body)
+    if values is None:
+        return JsonResponse(
+            {
+                "error": "Ожидается список ratings из пар movie_id и "
+                f"action, не больше {BULK_RATINGS_LIMIT}"
+            },
+            status=400,
+        )
+
+    known = set(
+        Movie.objects.filter(id__in=list(values)).values_list(
+            "id", flat=True
+        )
+    )
+    changes = _save_ratings(
+        request.user, {movie_id: values[movie_id] for movie_id in known}
+    )
+
+    return JsonResponse(
+        {
+            "changed": [
+                {"movie_id": movie_id, "value": new}
+                for movie_id, _, new in changes
+            ],
+            "unknown": sorted(set(values) - known),
+            "counters": {
+                movie_id: {"like_count": likes, "dislike_count": dislikes}
+                for movie_id, likes, dislikes in Movie.objects.filter(
+                    id__in=known
+                ).values_list("id", "like_count", "dislike_count")
+            },
+        }
+    )
+
+
 @login_required
 def set_genre_preferences(request):
     """Выбор любимых жанров"""
@@ -166,6 +328,8 @@ def set_genre_preferences(request):
     if request.method == "POST":
         genre_ids = request.POST.getlist("genres")
         prefs.favorite_genres.set(genre_ids)
+        # Любимые жанры меняют рекомендации холодного старта
+        bump_viewer_version(request.user.id)
         messages.success(request, "Ваши предпочтения сохранены!")
         return redirect(reverse("movies:recommendations"))
 
@@ -201,32 +365,27 @@ def recommendations(request):
     )
 
 
+def autocomplete(request):
+    """Подсказки для строки поиска из индекса в памяти"""
+    return JsonResponse({"suggestions": suggest(request.GET.get("q", ""))})
+
+
 def search(request):
     """Поиск фильмов"""
     query = request.GET.get("q", "")
-    genre = request.GET.get("genre")
-    year = request.GET.get("year")
-    country = request.GET.get("country")
-
-    movies = Movie.objects.all()
-
-    if query:
-        movies = movies.filter(
-            Q(title__icontains=query) | Q(description__icontains=query)
-        )
-    if genre:
-        movies = movies.filter(genres__name=genre)
-    if year:
-        movies = movies.filter(year=year)
-    if country:
-        movies = movies.filter(country__icontains=country)
-
-    genres = Genre.objects.all()
+    movies, cursor = movie_cards(filter_movies(request.GET), request.GET)
+    next_url, next_page_url = _next_page_urls(request, cursor)
 
     return render(
         request,
         "movies/search.html",
-        {"movies": movies, "query": query, "genres": genres},
+        {
+            "movies": movies,
+            "query": query,
+            "facets": _facet_links(request),
+            "next_url": next_url,
+            "next_page_url": next_page_url,
+        },
     )
 
 
@@ -0,0 +1,55 @@
+// static/js/autocomplete.js
+// Подсказки в строке поиска шапки: фильмы, режиссеры и жанры
+document.addEventListener('DOMContentLoaded', function() {
+    var input = document.getElementById('autocomplete-input');
+    var menu = document.getElementById('autocomplete-menu');
+    if (!input || !menu) {
+        return;
+    }
+    var labels = {movie: '🎬', director: '🎥', genre: '🏷️'};
+    var timer = null;
+    var lastQuery = '';
+
+    function hide() {
+        menu.classList.remove('show');
+        menu.innerHTML = '';
+    }
+
+    function show(suggestions) {
+        menu.innerHTML = '';
+        suggestions.forEach(function(suggestion) {
+            var item = document.createElement('a');
+            item.className = 'dropdown-item text-truncate';
+            item.href = suggestion.url;
+            item.textContent = labels[suggestion.kind] + ' ' + suggestion.label;
+            menu.appendChild(item);
+        });
+        menu.classList.toggle('show', suggestions.length > 0);
+    }
+
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        var query = input.value.trim();
+        if (query.length < 2) {
+            hide();
+            return;
+        }
+        timer = setTimeout(function() {
+            lastQuery = query;
+            fetch(input.dataset.autocompleteUrl + '?q=' + encodeURIComponent(query))
+                .then(function(response) {
+                    return response.json();
+                })
+                .then(function(data) {
+                    // Ответ на устаревший запрос не показываем
+                    if (query === lastQuery) {
+                        show(data.suggestions);
+                    }
+                });
+        }, 100);
+    });
+
+    input.addEventListener('blur', function() {
+        setTimeout(hide, 200);
+    });
+});
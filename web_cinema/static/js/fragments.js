@@ -0,0 +1,34 @@
+// static/js/fragments.js
+// Персональные блоки страницы: шапка, сообщения, оценка и отзыв,
+// похожие фильмы. Сама страница одинакова для всех и кэшируется,
+// а блоки с атрибутом data-slot приходят одним запросом после загрузки.
+// Для анонима сервер отдает только сообщения - остальное уже на странице
+document.addEventListener('DOMContentLoaded', function() {
+    var slots = document.querySelectorAll('[data-slot]');
+    var url = document.body.dataset.fragmentsUrl;
+    if (!slots.length || !url) {
+        return;
+    }
+    var params = new URLSearchParams();
+    slots.forEach(function(slot) {
+        params.append('slot', slot.dataset.slot);
+        if (slot.dataset.movie) {
+            params.set('movie', slot.dataset.movie);
+        }
+    });
+
+    fetch(url + '?' + params.toString(), {
+        headers: {'Accept': 'application/json'},
+        credentials: 'same-origin'
+    })
+        .then(function(response) {
+            return response.json();
+        })
+        .then(function(fragments) {
+            slots.forEach(function(slot) {
+                if (slot.dataset.slot in fragments) {
+                    slot.innerHTML = fragments[slot.dataset.slot];
+                }
+            });
+        });
+});
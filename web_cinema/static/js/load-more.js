@@ -0,0 +1,49 @@
+// static/js/load-more.js
+// Бесконечная прокрутка каталога и отзывов: следующая страница
+// подгружается из JSON-эндпоинта, когда кнопка "Показать еще" видна
+// на экране
+document.addEventListener('DOMContentLoaded', function() {
+    var button = document.getElementById('load-more');
+    if (!button || !('IntersectionObserver' in window)) {
+        return;
+    }
+    var container = document.querySelector(button.dataset.target);
+    var loading = false;
+
+    function loadNext() {
+        var url = button.dataset.nextPageUrl;
+        if (loading || !url) {
+            return;
+        }
+        loading = true;
+        fetch(url, {headers: {'Accept': 'application/json'}})
+            .then(function(response) {
+                return response.json();
+            })
+            .then(function(page) {
+                container.insertAdjacentHTML('beforeend', page.html);
+                if (page.next) {
+                    button.dataset.nextPageUrl = page.next;
+                    button.href = window.location.pathname + page.next.substring(page.next.indexOf('?'));
+                } else {
+                    observer.disconnect();
+                    button.parentNode.remove();
+                }
+            })
+            .finally(function() {
+                loading = false;
+            });
+    }
+
+    var observer = new IntersectionObserver(function(entries) {
+        if (entries[0].isIntersecting) {
+            loadNext();
+        }
+    });
+    observer.observe(button);
+
+    button.addEventListener('click', function(event) {
+        event.preventDefault();
+        loadNext();
+    });
+});
@@ -0,0 +1,77 @@
+"""
+Аутентификация с кэшем пользователей.
+
+AuthenticationMiddleware на каждом запросе загружает пользователя
+сессии по id. CachedModelBackend берет его из кэша sessions (туда же
+складывает сессии cached_db и cache), поэтому страница с теплой
+сессией не обращается к базе совсем. Сохранение и удаление
+пользователя убирают его из кэша, см. users.signals; update() по
+queryset сигналов не шлет, после него запись доживает USERS_CACHE_TTL.
+
+Сброс записи должен быть виден всем воркерам, иначе после смены
+пароля чужой воркер продолжит пускать старую сессию. Поэтому кэш
+sessions должен быть общим (файлы или Redis), с кэшем в памяти
+процесса настройки выбирают обычный ModelBackend. В кэше лежат поля
+пользователя без пароля и готовый хэш сессии; пароль при обращении
+к нему догружается из базы.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import router
+
+from web_cinema_config.caches import is_shared_cache
+
+
+USERS_CACHE = "sessions"
+# Не кэшируется: хэш пароля не должен лежать в общем кэше
+USERS_CACHE_EXCLUDE = {"password"}
+
+
+def user_cache_key(user_id):
+    return f"users:user:{user_id}"
+
+
+def forget_user(user_id):
+    """Следующий запрос загрузит пользователя из базы"""
+    caches[USERS_CACHE].delete(user_cache_key(user_id))
+
+
+def _cached_fields(model):
+    return [
+        field.attname
+        for field in model._meta.concrete_fields
+        if field.attname not in USERS_CACHE_EXCLUDE
+    ]
+
+
+class CachedModelBackend(ModelBackend):
+    def __init__(self):
+        if not is_shared_cache(settings.CACHES[USERS_CACHE]):
+            raise ImproperlyConfigured(
+                "CachedModelBackend: кэш sessions должен быть общим для "
+                "воркеров, иначе сброс пользователя видит один процесс"
+            )
+
+    def get_user(self, user_id):
+        model = get_user_model()
+        fields = _cached_fields(model)
+        key = user_cache_key(user_id)
+        row = caches[USERS_CACHE].get(key)
+        if row is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                row = {name: getattr(user, name) for name in fields}
+                row["session_auth_hash"] = user.get_session_auth_hash()
+                caches[USERS_CACHE].set(key, row, settings.USERS_CACHE_TTL)
+            return user
+
+        user = model.from_db(
+            router.db_for_read(model),
+            fields,
+            [row[name] for name in fields],
+        )
+        user.cached_session_auth_hash = row["session_auth_hash"]
+        return user if self.user_can_authenticate(user) else None
@@ -64,6 +64,14 @@ class User(AbstractBaseUser):
     def get_full_name(self):
         return f"{self.last_name} {self.first_name}".title()
 
+    def get_session_auth_hash(self):
+        # Пользователь из кэша приходит без пароля, но с готовым хэшем,
+        # см. users.backends
+        cached = getattr(self, "cached_session_auth_hash", None)
+        if cached and "password" in self.get_deferred_fields():
+            return cached
+        return super().get_session_auth_hash()
+
     class Meta:
         db_table = "users"
         ordering = ["phone"]
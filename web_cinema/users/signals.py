@@ -0,0 +1,15 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.backends import forget_user
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Сразу - для чтений в этой же транзакции, и еще раз после
+    # коммита: параллельный запрос мог закэшировать старую строку
+    forget_user(instance.pk)
+    transaction.on_commit(lambda: forget_user(instance.pk))
@@ -1,5 +1,7 @@
+import tempfile
+
 from django.contrib.auth import authenticate, get_user_model
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from users.forms import UserRegisterForm
 
@@ -109,4 +111,111 @@ class UserAuthenticationTest(TestCase):
         wrong_pass_user = authenticate(
             phone="79998887766", password="wrongpass"
         )
-        self.assertIsNone(wrong_pass_user)
\ No newline at end of file
+        self.assertIsNone(wrong_pass_user)
+
+
+class CachedAuthTest(TestCase):
+    def setUp(self):
+        from web_cinema_config.caches import cache_settings
+
+        # Кэш пользователей работает только с общим для воркеров кэшем
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            CACHES=cache_settings("file://", file_root=self.tmp_dir.name),
+            AUTHENTICATION_BACKENDS=["users.backends.CachedModelBackend"],
+            SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+        )
+        self.settings_override.enable()
+
+        self.client = Client()
+        self.user = User.objects.create_user(
+            phone="79998887766",
+            first_name="Test",
+            last_name="User",
+            password="testpass123",
+        )
+        self.url = reverse("movies:fragments")
+        self.params = {"slot": ["header_user"]}
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp_dir.cleanup()
+
+    def test_warm_session_skips_database(self):
+        self.client.login(phone="79998887766", password="testpass123")
+        self.client.get(self.url, self.params)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, self.params)
+        self.assertIn("79998887766", response.json()["header_user"])
+
+    def test_cached_user_without_password(self):
+        from django.core.cache import caches
+
+        from users.backends import CachedModelBackend, user_cache_key
+
+        backend = CachedModelBackend()
+        backend.get_user(self.user.id)
+        row = caches["sessions"].get(user_cache_key(self.user.id))
+        self.assertNotIn("password", row)
+
+        with self.assertNumQueries(0):
+            user = backend.get_user(self.user.id)
+            self.assertEqual(
+                user.get_session_auth_hash(),
+                self.user.get_session_auth_hash(),
+            )
+        # Сохранение пользователя из кэша не затирает пароль
+        user.first_name = "Новое"
+        user.save()
+        self.assertEqual(backend.get_user(self.user.id).first_name, "Новое")
+        self.assertIsNotNone(
+            authenticate(phone="79998887766", password="testpass123")
+        )
+
+        self.user.delete()
+        self.assertIsNone(backend.get_user(self.user.id))
+
+    def test_password_change_ends_session(self):
+        self.client.login(phone="79998887766", password="testpass123")
+        self.client.get(self.url, self.params)
+
+        self.user.set_password("newpass123")
+        self.user.save()
+        self.assertEqual(self.client.get(self.url, self.params).json(), {})
+
+    def test_local_cache_refused(self):
+        from django.core.exceptions import ImproperlyConfigured
+
+        from users.backends import CachedModelBackend
+        from web_cinema_config.caches import cache_settings
+
+        with override_settings(CACHES=cache_settings(None, None)):
+            with self.assertRaises(ImproperlyConfigured):
+                CachedModelBackend()
+
+    def test_sessions_cached_only_in_shared_cache(self):
+        import os
+
+        from web_cinema_config import settings as config
+        from web_cinema_config.caches import is_shared_cache
+
+        if "DJANGO_SESSION_BACKEND" in os.environ:
+            self.skipTest("хранилище сессий задано явно")
+        shared = is_shared_cache(config.CACHES["sessions"])
+        self.assertEqual(
+            config.SESSION_ENGINE.endswith(".cached_db"), shared
+        )
+        self.assertEqual(config.SESSION_ENGINE.endswith(".db"), not shared)
+
+    @override_settings(
+        SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies"
+    )
+    def test_signed_cookie_sessions(self):
+        from django.contrib.sessions.models import Session
+
+        self.client.login(phone="79998887766", password="testpass123")
+        self.client.get(self.url, self.params)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, self.params)
+        self.assertIn("header_user", response.json())
+        self.assertFalse(Session.objects.exists())
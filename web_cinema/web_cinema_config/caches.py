@@ -0,0 +1,77 @@
+"""
+Настройки кэшей из переменных окружения.
+
+CACHE_URL выбирает хранилище сразу для всех кэшей проекта:
+- locmem:// (по умолчанию) - память процесса, у каждого воркера своя;
+  замена общему кэшу для разработки и тестов;
+- file:///var/cache/web_cinema - файлы, общие для воркеров одной машины;
+- redis://localhost:6379/0 - Redis или совместимый сервер (Valkey,
+  KeyDB), общий для всех машин; нужен пакет redis.
+Кэши CACHE_ALIASES различаются префиксом ключей, у locmem и файлов -
+еще и хранилищем. clear() в Redis очищает всю базу сервера, то есть
+все кэши сразу.
+"""
+from urllib.parse import unquote, urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+# default - списки и фасеты каталога, fragments - готовый HTML,
+# recommendations - оценки зрителей и их рекомендации, counters - версии,
+# sessions - сессии и пользователи по id
+CACHE_ALIASES = (
+    "default",
+    "fragments",
+    "recommendations",
+    "counters",
+    "sessions",
+)
+
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+    "rediss": "django.core.cache.backends.redis.RedisCache",
+}
+
+# Хранилища в памяти процесса: запись и удаление видит один воркер
+LOCAL_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+def cache_settings(url, file_root, max_entries=10000):
+    """
+    Словарь для CACHES. url - вида locmem://, file:///path или
+    redis://[:password@]host:6379/0; file:// без пути - каталог
+    file_root. max_entries - предел записей locmem и файлового кэша
+    """
+    parts = urlsplit(url or "locmem://")
+    if parts.scheme not in CACHE_BACKENDS:
+        raise ImproperlyConfigured(
+            f"CACHE_URL: неизвестная схема {parts.scheme!r}"
+        )
+
+    caches = {}
+    for alias in CACHE_ALIASES:
+        cache = {
+            "BACKEND": CACHE_BACKENDS[parts.scheme],
+            "KEY_PREFIX": alias,
+        }
+        if parts.scheme == "locmem":
+            cache["LOCATION"] = alias
+            cache["OPTIONS"] = {"MAX_ENTRIES": max_entries}
+        elif parts.scheme == "file":
+            root = unquote(parts.path) or str(file_root)
+            cache["LOCATION"] = f"{root.rstrip('/')}/{alias}"
+            cache["OPTIONS"] = {"MAX_ENTRIES": max_entries}
+        else:
+            cache["LOCATION"] = url
+        caches[alias] = cache
+    return caches
+
+
+def is_shared_cache(cache):
+    """Видят ли воркеры изменения друг друга; cache - из CACHES"""
+    return cache["BACKEND"] not in LOCAL_BACKENDS
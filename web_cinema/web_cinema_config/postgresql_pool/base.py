@@ -0,0 +1,99 @@
+"""
+PostgreSQL с пулом соединений внутри процесса.
+
+Django 4.2 с psycopg2 пула не умеет: соединение либо открывается на
+каждый запрос, либо живет CONN_MAX_AGE в своем потоке. Здесь соединения
+берутся из psycopg2 ThreadedConnectionPool, а close() возвращает их в
+пул - незавершенная транзакция при этом откатывается. Пул открывает
+все POOL_SIZE соединений при первом обращении. Пулы общие для
+потоков процесса и заводятся на каждый набор параметров соединения:
+тестовая и служебная базы получают свои. POOL_SIZE в DATABASES -
+предел соединений на процесс; он должен быть не меньше числа потоков
+воркера, иначе лишний поток получит ошибку базы.
+"""
+import threading
+
+from django.db.backends.postgresql import base, creation
+from psycopg2 import pool
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(conn_params, size):
+    key = tuple(
+        sorted((name, str(value)) for name, value in conn_params.items())
+    )
+    with _pools_lock:
+        if key not in _pools:
+            # psycopg2 держит открытыми не больше minconn соединений,
+            # так что пул сразу открывает все
+            _pools[key] = pool.ThreadedConnectionPool(
+                size, size, **conn_params
+            )
+        return _pools[key]
+
+
+def close_pools():
+    """Закрывает все соединения пулов, например перед удалением базы"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for connection_pool in pools:
+        connection_pool.closeall()
+
+
+class PooledDatabase:
+    """Модуль psycopg2, у которого connect() берет соединение из пула"""
+
+    def __init__(self, database, connection_pool, check):
+        self.database = database
+        self.connection_pool = connection_pool
+        self.check = check
+
+    def __getattr__(self, name):
+        return getattr(self.database, name)
+
+    def connect(self, **conn_params):
+        connection = self.connection_pool.getconn()
+        if self.check and not self.is_usable(connection):
+            # Сервер закрыл соединение, пока оно лежало в пуле
+            self.connection_pool.putconn(connection, close=True)
+            connection = self.connection_pool.getconn()
+        return connection
+
+    def is_usable(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+        except self.database.Error:
+            return False
+        return True
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # DROP DATABASE не пройдет, пока пул держит соединения к ней
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_new_connection(self, conn_params):
+        self.Database = PooledDatabase(
+            base.Database,
+            get_pool(conn_params, self.settings_dict["POOL_SIZE"]),
+            self.settings_dict["CONN_HEALTH_CHECKS"],
+        )
+        return super().get_new_connection(conn_params)
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.Database.connection_pool.putconn(
+                    self.connection, close=bool(self.connection.closed)
+                )
@@ -0,0 +1,131 @@
+"""
+Чтение каталога с реплик.
+
+Модели приложений REPLICA_APPS (фильмы, жанры, отзывы, оценки и
+рекомендации) во время запроса читаются с реплик DATABASE_REPLICAS,
+записи и остальные модели идут в основную базу. Реплика выбирается
+один раз на запрос, чтобы он не видел разные моменты репликации.
+
+С основной базы читаются:
+- вне запросов: командам и фоновым потокам важнее свежие данные;
+- внутри транзакции и после записи в том же запросе;
+- DATABASE_REPLICA_PIN_SECONDS после записи: ответ на запрос с записью
+  ставит подписанную cookie, и браузер видит свои изменения, даже
+  если реплика отстает;
+- внутри primary_reads(): так рендерятся страницы, которые кэшируются
+  для всех под версией основной базы, см. movies.conditional.
+"""
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+REPLICA_APPS = {"movies"}
+PIN_COOKIE = "db_primary"
+
+_request_state = ContextVar("replica_request_state", default=None)
+_selection_lock = threading.Lock()
+_counter = itertools.count()
+_last_used = {}
+
+
+def choose_replica(replicas):
+    """Реплика по DATABASE_REPLICA_SELECTION"""
+    with _selection_lock:
+        if settings.DATABASE_REPLICA_SELECTION == "least_recent":
+            alias = min(replicas, key=lambda name: _last_used.get(name, 0))
+        else:
+            alias = replicas[next(_counter) % len(replicas)]
+        _last_used[alias] = time.monotonic()
+    return alias
+
+
+@contextmanager
+def replica_reads(pinned=False):
+    """Чтения внутри блока - чтения одного запроса"""
+    state = {"pinned": pinned, "wrote": False, "replica": None}
+    token = _request_state.set(state)
+    try:
+        yield state
+    finally:
+        _request_state.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Чтения запроса внутри блока идут в основную базу"""
+    state = _request_state.get()
+    if state is None:
+        yield
+        return
+    pinned = state["pinned"]
+    state["pinned"] = True
+    try:
+        yield
+    finally:
+        state["pinned"] = pinned
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        replicas = list(settings.DATABASE_REPLICAS)
+        if (
+            state is None
+            or not replicas
+            or model._meta.app_label not in REPLICA_APPS
+            or state["pinned"]
+            or state["wrote"]
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        if state["replica"] is None:
+            state["replica"] = choose_replica(replicas)
+        return state["replica"]
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None and model._meta.app_label in REPLICA_APPS:
+            state["wrote"] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной базе
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схему реплик приносит репликация
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class PrimaryPinMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = request.get_signed_cookie(
+            PIN_COOKIE,
+            default=None,
+            max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+        )
+        with replica_reads(pinned=pinned is not None) as state:
+            response = self.get_response(request)
+        if state["wrote"] and settings.DATABASE_REPLICAS:
+            response.set_signed_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
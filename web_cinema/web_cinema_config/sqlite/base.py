@@ -0,0 +1,20 @@
+"""
+SQLite, у которого транзакции сразу берут блокировку записи.
+
+Django 4.2 открывает транзакцию отложенным BEGIN: транзакция, которая
+сначала читала, при первой записи получает "database is locked" сразу,
+не дожидаясь busy_timeout, если другой писатель успел закоммитить.
+BEGIN IMMEDIATE берет блокировку в начале и ждет ее по busy_timeout;
+так делает transaction_mode="IMMEDIATE" в Django 5.1. Включается
+вместе с остальным режимом SQLite, см. movies.sqlite.
+"""
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        if settings.SQLITE_TUNING:
+            self.cursor().execute("BEGIN IMMEDIATE")
+        else:
+            super()._start_transaction_under_autocommit()